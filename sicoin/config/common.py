@@ -27,6 +27,20 @@ class Common(Configuration):
     CELERY_TIMEZONE = "America/Argentina/Cordoba"
     CELERY_TASK_TRACK_STARTED = True
     CELERY_TASK_TIME_LIMIT = 30 * 60
+    # Periodic tasks, synced to the database scheduler of django_celery_beat when beat starts
+    CELERY_BEAT_SCHEDULE = {
+        'manage-point-partitions': {
+            'task': 'sicoin.geolocation.tasks.manage_point_partitions',
+            'schedule': timedelta(days=1),
+        },
+        # Buffered WS track points, see INCIDENT_WS_TRACK_POINTS_BUFFERED. For lower latency, run the
+        # drain_track_points_streams command on a dedicated worker as well
+        'drain-track-points-streams': {
+            'task': 'sicoin.geolocation.tasks.drain_track_points_streams',
+            'schedule': timedelta(seconds=10),
+            'options': {'expires': 10},
+        },
+    }
 
     INSTALLED_APPS = (
         'material.admin',
@@ -92,6 +106,9 @@ class Common(Configuration):
         r"^https://tesis-cabal-cugno-moreyra-pr-\d+\.onrender\.com$",
         r"^http://192\.168\.\d+\.\d+:808[01]$",
     ]
+    CORS_EXPOSE_HEADERS = [
+        "X-Points-Cursor",
+    ]
     ROOT_URLCONF = 'sicoin.urls'
     SECRET_KEY = env('DJANGO_SECRET_KEY')
     FIELD_ENCRYPTION_KEYS = [env('FIELD_ENCRYPTION_KEY')]
@@ -326,6 +343,88 @@ class Common(Configuration):
     }
 
     INCIDENT_WS_DATA_GENERATION = False
+    # Persist WS points once on the receiving consumer and broadcast the stored representation,
+    # instead of letting every subscriber of the incident group save its own copy
+    INCIDENT_WS_PERSIST_ON_RECEIVE = strtobool(env('INCIDENT_WS_PERSIST_ON_RECEIVE', default='yes'))
+    # Rows per INSERT statement when a batch of track points is stored
+    TRACK_POINTS_INSERT_PAGE_SIZE = int(env('TRACK_POINTS_INSERT_PAGE_SIZE', default=1000))
+    # Rows fetched per server side cursor round trip (and written per chunk) when streaming point listings
+    POINTS_STREAM_CHUNK_SIZE = int(env('POINTS_STREAM_CHUNK_SIZE', default=2000))
+    # Zoom levels stored for every track once an incident is finalized, and simplification tolerance in pixels
+    TRACK_SIMPLIFICATION_ZOOM_LEVELS = [int(zoom_level) for zoom_level in
+                                        env.list('TRACK_SIMPLIFICATION_ZOOM_LEVELS', default=['8', '12', '16'])]
+    TRACK_SIMPLIFICATION_TOLERANCE_PIXELS = float(env('TRACK_SIMPLIFICATION_TOLERANCE_PIXELS', default=1.0))
+    # Deepest zoom served by the incident vector tiles, and seconds a built tile is kept on the cache
+    INCIDENT_TILES_MAX_ZOOM = int(env('INCIDENT_TILES_MAX_ZOOM', default=22))
+    INCIDENT_TILES_CACHE_TIMEOUT = int(env('INCIDENT_TILES_CACHE_TIMEOUT', default=3600))
+    # Smallest heatmap cell side in degrees, and longest gap between fixes counted as time spent on a cell
+    HEATMAP_MIN_CELL_SIZE = float(env('HEATMAP_MIN_CELL_SIZE', default=0.0001))
+    HEATMAP_MAX_DWELL_SECONDS = int(env('HEATMAP_MAX_DWELL_SECONDS', default=300))
+    # Seconds the incident/resource checks of point ingestion are cached, signals invalidate them on changes
+    INGESTION_AUTHORIZATION_CACHE_TIMEOUT = int(env('INGESTION_AUTHORIZATION_CACHE_TIMEOUT', default=300))
+    # Append WS track points to a Redis Stream per incident and store them in batches from a drain worker
+    # (drain_track_points_streams task or command), instead of inserting every point on the consumer
+    INCIDENT_WS_TRACK_POINTS_BUFFERED = strtobool(env('INCIDENT_WS_TRACK_POINTS_BUFFERED', default='no'))
+    TRACK_POINTS_STREAM_BATCH_SIZE = int(env('TRACK_POINTS_STREAM_BATCH_SIZE', default=500))
+    # Entries pending for longer than this, e.g. of a drain worker that died, are claimed by another one
+    TRACK_POINTS_STREAM_CLAIM_IDLE_MS = int(env('TRACK_POINTS_STREAM_CLAIM_IDLE_MS', default=60000))
+    # Entries that failed to be stored this many times are moved to a dead letters stream, trimmed to about
+    # TRACK_POINTS_STREAM_DEAD_LETTERS_MAX_LENGTH entries
+    TRACK_POINTS_STREAM_MAX_DELIVERIES = int(env('TRACK_POINTS_STREAM_MAX_DELIVERIES', default=5))
+    TRACK_POINTS_STREAM_DEAD_LETTERS_MAX_LENGTH = int(env('TRACK_POINTS_STREAM_DEAD_LETTERS_MAX_LENGTH',
+                                                          default=100000))
+    RESOURCE_REPRESENTATION_CACHE_TIMEOUT = int(env('RESOURCE_REPRESENTATION_CACHE_TIMEOUT', default=300))
+    # Delete the raw track points of finalized incidents once compacted. Listings read compacted tracks, but
+    # tiles and heatmaps of those incidents will no longer show track points
+    TRAJECTORY_COMPACTION_PURGE_RAW_POINTS = strtobool(env('TRAJECTORY_COMPACTION_PURGE_RAW_POINTS', default='no'))
+    # Radius around the incident location considered its scene
+    INCIDENT_SCENE_RADIUS_METERS = float(env('INCIDENT_SCENE_RADIUS_METERS', default=100))
+    # Movement stats: slower segments count as idle time, longer gaps between fixes count as no time at all
+    MOVEMENT_STATS_IDLE_SPEED = float(env('MOVEMENT_STATS_IDLE_SPEED', default=0.5))
+    MOVEMENT_STATS_MAX_GAP_SECONDS = int(env('MOVEMENT_STATS_MAX_GAP_SECONDS', default=300))
+    # Geofence of the incident scene: resources leave it only once farther than its radius plus this margin,
+    # so fixes jittering around the boundary do not flap. Incident locations are reloaded by every process
+    # after GEOFENCE_INCIDENT_REFRESH_SECONDS, along with the inside/outside state of its resources
+    GEOFENCE_HYSTERESIS_METERS = float(env('GEOFENCE_HYSTERESIS_METERS', default=10))
+    GEOFENCE_INCIDENT_REFRESH_SECONDS = int(env('GEOFENCE_INCIDENT_REFRESH_SECONDS', default=300))
+    # Nearest resources dispatch: k listed by default and at most, see incident.dispatch. When
+    # INCIDENT_CREATION_NOTIFY_NEAREST_RESOURCES is above 0 only that many nearest resources are notified of a new
+    # incident, instead of every active resource of the domain
+    DISPATCH_NEAREST_RESOURCES_DEFAULT_K = int(env('DISPATCH_NEAREST_RESOURCES_DEFAULT_K', default=10))
+    DISPATCH_NEAREST_RESOURCES_MAX_K = int(env('DISPATCH_NEAREST_RESOURCES_MAX_K', default=100))
+    INCIDENT_CREATION_NOTIFY_NEAREST_RESOURCES = int(env('INCIDENT_CREATION_NOTIFY_NEAREST_RESOURCES', default=0))
+    # Track points closer than this distance and time to the last accepted one of their resource are dropped on
+    # ingestion, see geolocation.jitter. A distance of 0 disables the filter
+    TRACK_POINTS_FILTER_MIN_DISTANCE_METERS = float(env('TRACK_POINTS_FILTER_MIN_DISTANCE_METERS', default=0))
+    TRACK_POINTS_FILTER_MIN_SECONDS = float(env('TRACK_POINTS_FILTER_MIN_SECONDS', default=30))
+    # Live state of incidents sent to WebSocket subscribers on connect, see incident.live_state. Expires once the
+    # incident receives no messages for INCIDENT_LIVE_STATE_TIMEOUT seconds
+    INCIDENT_LIVE_STATE_MAP_POINTS = int(env('INCIDENT_LIVE_STATE_MAP_POINTS', default=50))
+    INCIDENT_LIVE_STATE_TIMEOUT = int(env('INCIDENT_LIVE_STATE_TIMEOUT', default=7 * 24 * 60 * 60))
+    # Messages to incident WebSocket subscribers are batched in a frame per this interval (milliseconds), keeping
+    # only the newest position of every resource. 0 sends every message as soon as it is received
+    INCIDENT_WS_FLUSH_INTERVAL_MS = int(env('INCIDENT_WS_FLUSH_INTERVAL_MS', default=0))
+    # Token buckets limiting the messages received by incident WebSockets: per connection, and per resource across
+    # connections. Rates in messages per second (0 disables the limit), bursts in messages
+    INCIDENT_WS_CONNECTION_RATE = float(env('INCIDENT_WS_CONNECTION_RATE', default=0))
+    INCIDENT_WS_CONNECTION_BURST = float(env('INCIDENT_WS_CONNECTION_BURST', default=20))
+    INCIDENT_WS_RESOURCE_RATE = float(env('INCIDENT_WS_RESOURCE_RATE', default=0))
+    INCIDENT_WS_RESOURCE_BURST = float(env('INCIDENT_WS_RESOURCE_BURST', default=10))
+    # Binary track points frames (see geolocation.frames) carrying more points are rejected whole
+    INCIDENT_WS_FRAME_MAX_POINTS = int(env('INCIDENT_WS_FRAME_MAX_POINTS', default=500))
+    # Reporting interval recommended to resources, see geolocation.reporting. Resources at the fast speed (meters per
+    # second) or faster get the minimum interval while the incident has up to REPORTING_INTERVAL_FULL_RATE_RESOURCES
+    # active resources and is followed live, otherwise it is longer
+    REPORTING_INTERVAL_MIN_SECONDS = int(env('REPORTING_INTERVAL_MIN_SECONDS', default=2))
+    REPORTING_INTERVAL_MAX_SECONDS = int(env('REPORTING_INTERVAL_MAX_SECONDS', default=60))
+    REPORTING_INTERVAL_FAST_SPEED = float(env('REPORTING_INTERVAL_FAST_SPEED', default=10))
+    REPORTING_INTERVAL_FULL_RATE_RESOURCES = int(env('REPORTING_INTERVAL_FULL_RATE_RESOURCES', default=50))
+    REPORTING_INTERVAL_UNWATCHED_FACTOR = float(env('REPORTING_INTERVAL_UNWATCHED_FACTOR', default=2))
+    REPORTING_INTERVAL_LOAD_CACHE_TIMEOUT = int(env('REPORTING_INTERVAL_LOAD_CACHE_TIMEOUT', default=60))
+    # Monthly partitions of TrackPoint and MapPoint, see geolocation.partitions
+    POINT_PARTITIONS_MONTHS_AHEAD = int(env('POINT_PARTITIONS_MONTHS_AHEAD', default=3))
+    POINT_PARTITIONS_RETENTION_MONTHS = env.int('POINT_PARTITIONS_RETENTION_MONTHS', default=None)
+    POINT_PARTITIONS_DROP_EXPIRED = strtobool(env('POINT_PARTITIONS_DROP_EXPIRED', default='no'))
 
     MATERIAL_ADMIN_SITE = {
         'HEADER': 'SICOIN Internal Administration',  # Admin site header
@@ -0,0 +1 @@
+default_app_config = 'sicoin.geolocation.apps.GeolocationConfig'
@@ -10,3 +10,8 @@ class TrackPointAdmin(admin.OSMGeoAdmin):
 @admin.register(models.MapPoint)
 class MapPointAdmin(admin.OSMGeoAdmin):
     list_display = ("id", "incident", "incident_resource", "location", "time_created", "description_text")
+
+
+@admin.register(models.GeofenceTransition)
+class GeofenceTransitionAdmin(admin.OSMGeoAdmin):
+    list_display = ("id", "incident", "incident_resource", "transition", "distance_meters", "time_created")
@@ -0,0 +1,76 @@
+from typing import Dict
+
+from django.conf import settings
+from django.db import connection
+
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.models import Incident, IncidentResource
+
+
+class MovementStatsCalculator:
+    """
+    Computes the movement stats of every resource of an incident in a single windowed pass over its track
+    points: every point is paired with the previous one of the same resource (LAG) and the segments are
+    aggregated per resource. Track points are stored as Point(lat, lng), so they are flipped to compare them
+    with the incident location. Segments longer than MOVEMENT_STATS_MAX_GAP_SECONDS (a device not reporting)
+    add distance but no idle or on scene time.
+    """
+
+    def __init__(self, incident: Incident):
+        self.incident = incident
+
+    def calculate(self) -> Dict[int, dict]:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH segments AS (
+                    SELECT point.incident_resource_id,
+                           point.time_created,
+                           EXTRACT(EPOCH FROM point.time_created - LAG(point.time_created) OVER resource_track)
+                               AS seconds,
+                           ST_Distance(ST_FlipCoordinates(point.location)::geography,
+                                       ST_FlipCoordinates(LAG(point.location) OVER resource_track)::geography)
+                               AS meters,
+                           ST_DWithin(ST_FlipCoordinates(point.location)::geography,
+                                      incident.location_point::geography, %(scene_radius)s) AS on_scene
+                    FROM {TrackPoint._meta.db_table} point
+                    JOIN {Incident._meta.db_table} incident ON incident.id = point.incident_id
+                    WHERE point.incident_id = %(incident_id)s
+                    WINDOW resource_track AS (PARTITION BY point.incident_resource_id
+                                              ORDER BY point.time_created, point.id)
+                )
+                SELECT incident_resource_id,
+                       COUNT(*),
+                       EXTRACT(EPOCH FROM MAX(time_created) - MIN(time_created)),
+                       COALESCE(SUM(meters), 0),
+                       MAX(meters / seconds) FILTER (WHERE seconds > 0),
+                       COALESCE(SUM(seconds) FILTER (WHERE seconds <= %(max_gap)s
+                                                     AND meters < seconds * %(idle_speed)s), 0),
+                       COALESCE(SUM(seconds) FILTER (WHERE seconds <= %(max_gap)s AND on_scene), 0)
+                FROM segments
+                GROUP BY incident_resource_id
+            """, {'incident_id': self.incident.id,
+                  'scene_radius': settings.INCIDENT_SCENE_RADIUS_METERS,
+                  'max_gap': settings.MOVEMENT_STATS_MAX_GAP_SECONDS,
+                  'idle_speed': settings.MOVEMENT_STATS_IDLE_SPEED})
+
+            movement_stats = {}
+            for incident_resource_id, points_quantity, tracked_seconds, distance, max_speed, idle_seconds, \
+                    on_scene_seconds in cursor.fetchall():
+                movement_stats[incident_resource_id] = {
+                    'points_quantity': points_quantity,
+                    'tracked_seconds': tracked_seconds,
+                    'distance_meters': distance,
+                    'average_speed': distance / tracked_seconds if tracked_seconds else None,
+                    'max_speed': max_speed,
+                    'idle_seconds': idle_seconds,
+                    'on_scene_seconds': on_scene_seconds,
+                }
+            return movement_stats
+
+    def store(self) -> Dict[int, dict]:
+        movement_stats = self.calculate()
+        incident_resources = list(self.incident.incidentresource_set.filter(id__in=movement_stats.keys()))
+        for incident_resource in incident_resources:
+            incident_resource.movement_stats = movement_stats[incident_resource.id]
+        IncidentResource.objects.bulk_update(incident_resources, ['movement_stats'])
+        return movement_stats
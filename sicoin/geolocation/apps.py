@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class GeolocationConfig(AppConfig):
-    name = 'geolocation'
+    name = 'sicoin.geolocation'
+
+    def ready(self):
+        from sicoin.geolocation import signals  # noqa
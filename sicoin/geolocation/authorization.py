@@ -0,0 +1,53 @@
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from sicoin.incident.models import Incident, IncidentResource
+from sicoin.users.models import ResourceProfile
+
+AUTHORIZATION_KEY_PREFIX = 'ingestion_authorization'
+
+
+class IngestionAuthorization(NamedTuple):
+    """What point ingestion checks about an (incident, resource) pair, None fields stand for missing rows"""
+    incident_status: Optional[str]
+    user_is_active: Optional[bool]
+    incident_resource_id: Optional[int]
+
+    @property
+    def incident_exists(self) -> bool:
+        return self.incident_status is not None
+
+    @property
+    def resource_exists(self) -> bool:
+        return self.user_is_active is not None
+
+
+def _get_authorization_key(incident_id, resource_id) -> str:
+    return f'{AUTHORIZATION_KEY_PREFIX}:{incident_id}:{resource_id}'
+
+
+def get_ingestion_authorization(incident_id, resource_id) -> IngestionAuthorization:
+    """
+    Cached, so steady state ingestion does not query the incident, resource, user and incident resource for
+    every point. Entries are invalidated by signals (see geolocation.signals) when any of them changes.
+    """
+    key = _get_authorization_key(incident_id, resource_id)
+    authorization = cache.get(key)
+    if authorization is None:
+        authorization = IngestionAuthorization(
+            incident_status=Incident.objects.filter(id=incident_id).values_list('status', flat=True).first(),
+            user_is_active=ResourceProfile.objects.filter(id=resource_id).values_list(
+                'user__is_active', flat=True).first(),
+            incident_resource_id=IncidentResource.objects.filter(
+                incident_id=incident_id, resource_id=resource_id).values_list('id', flat=True).first())
+        cache.set(key, tuple(authorization), timeout=settings.INGESTION_AUTHORIZATION_CACHE_TIMEOUT)
+    return IngestionAuthorization(*authorization)
+
+
+def invalidate_ingestion_authorization(incident_id='*', resource_id='*'):
+    if incident_id == '*' or resource_id == '*':
+        cache.delete_pattern(_get_authorization_key(incident_id, resource_id))
+    else:
+        cache.delete(_get_authorization_key(incident_id, resource_id))
@@ -0,0 +1,233 @@
+import json
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.contrib.gis.db.models.functions import GeoFunc
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import FloatField
+
+from sicoin.geolocation.models import MapPoint
+from sicoin.geolocation.serializers import RESOURCE_RELATED_FIELDS
+from sicoin.incident.models import IncidentResource
+from sicoin.users.serializers import ListRetrieveResourceProfileSerializer
+
+COMPACT_JSON_MEDIA_TYPE = 'application/vnd.sicoin.points+json'
+COMPACT_BINARY_MEDIA_TYPE = 'application/vnd.sicoin.points+binary'
+
+BINARY_MAGIC = b'SCPT'
+BINARY_VERSION = 1
+# magic, version, header length, points quantity
+BINARY_PREAMBLE = struct.Struct('<4sBII')
+BINARY_ALIGNMENT = 8
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_epoch_milliseconds(date: datetime) -> int:
+    return (date - EPOCH) // timedelta(milliseconds=1)
+
+
+class X(GeoFunc):
+    function = 'ST_X'
+    output_field = FloatField()
+
+
+class Y(GeoFunc):
+    function = 'ST_Y'
+    output_field = FloatField()
+
+
+class CompactPointRow(NamedTuple):
+    incident_resource_id: int
+    time_created: datetime
+    lat: float
+    lng: float
+
+
+class CompactPoints(NamedTuple):
+    """
+    Columnar listing of points: every resource is serialized once on a table, and the points are parallel
+    arrays of resource index (position on that table), latitude, longitude and epoch milliseconds.
+    Comments are only present for map points.
+    """
+    resources: List[dict]
+    resource_index: List[int]
+    lat: List[float]
+    lng: List[float]
+    collected_at: List[int]
+    comments: Optional[List[str]]
+
+    def to_dict(self) -> dict:
+        compact_points = self._asdict()
+        if self.comments is None:
+            del compact_points['comments']
+        return compact_points
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(',', ':'), cls=DjangoJSONEncoder)
+
+    def to_binary(self) -> bytes:
+        """
+        Little endian layout: preamble (BINARY_PREAMBLE), UTF-8 JSON header with the resources table (and
+        comments) padded with spaces to a multiple of 8 bytes, then lat and lng as float64, collected_at as
+        int64 and resource_index as uint32 arrays. Every array starts 8 bytes aligned, so clients can map
+        them with typed arrays without copying.
+        """
+        header = {'resources': self.resources}
+        if self.comments is not None:
+            header['comments'] = self.comments
+        encoded_header = json.dumps(header, separators=(',', ':'), cls=DjangoJSONEncoder).encode()
+        unaligned_length = BINARY_PREAMBLE.size + len(encoded_header)
+        encoded_header += b' ' * (-unaligned_length % BINARY_ALIGNMENT)
+
+        columns = [array('d', self.lat), array('d', self.lng), array('q', self.collected_at),
+                   array('I', self.resource_index)]
+        if sys.byteorder == 'big':
+            for column in columns:
+                column.byteswap()
+        return b''.join([BINARY_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, len(encoded_header),
+                                              len(self.lat)),
+                         encoded_header,
+                         *(column.tobytes() for column in columns)])
+
+    @classmethod
+    def from_binary(cls, data: bytes) -> 'CompactPoints':
+        magic, version, header_length, points_quantity = BINARY_PREAMBLE.unpack_from(data)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError('Not a compact points binary payload')
+        offset = BINARY_PREAMBLE.size
+        header = json.loads(data[offset:offset + header_length])
+        offset += header_length
+
+        columns = []
+        for typecode in ('d', 'd', 'q', 'I'):
+            column = array(typecode)
+            column_length = column.itemsize * points_quantity
+            column.frombytes(data[offset:offset + column_length])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns.append(column.tolist())
+            offset += column_length
+        lat, lng, collected_at, resource_index = columns
+        return cls(header['resources'], resource_index, lat, lng, collected_at, header.get('comments'))
+
+    @classmethod
+    def from_queryset(cls, queryset) -> 'CompactPoints':
+        """
+        Reads only the columns needed, with the coordinates extracted by the database, so no model or
+        geometry is instantiated per point (stored as Point(lat, lng)). Points keep the queryset ordering.
+        """
+        is_map_point = queryset.model is MapPoint
+        fields = ['incident_resource_id', 'time_created', 'lat', 'lng']
+        if is_map_point:
+            fields.append('description_text')
+        rows = list(queryset.annotate(lat=X('location'), lng=Y('location')).values_list(*fields, named=True))
+        return cls.from_rows(rows, is_map_point)
+
+    @classmethod
+    def from_rows(cls, rows: list, is_map_point: bool = False) -> 'CompactPoints':
+        """Rows need incident_resource_id, time_created, lat and lng, and description_text for map points"""
+        incident_resources = IncidentResource.objects.select_related(*RESOURCE_RELATED_FIELDS).in_bulk(
+            {row.incident_resource_id for row in rows})
+        resources = []
+        resource_indexes_by_incident_resource: Dict[int, int] = {}
+        resource_indexes_by_resource: Dict[int, int] = {}
+        for incident_resource_id, incident_resource in incident_resources.items():
+            resource = incident_resource.resource
+            if resource.id not in resource_indexes_by_resource:
+                resource_indexes_by_resource[resource.id] = len(resources)
+                resources.append(ListRetrieveResourceProfileSerializer().to_representation(resource))
+            resource_indexes_by_incident_resource[incident_resource_id] = resource_indexes_by_resource[resource.id]
+
+        compact_points = cls(resources=resources,
+                             resource_index=[resource_indexes_by_incident_resource[row.incident_resource_id]
+                                             for row in rows],
+                             lat=[row.lat for row in rows],
+                             lng=[row.lng for row in rows],
+                             collected_at=[to_epoch_milliseconds(row.time_created) for row in rows],
+                             comments=[row.description_text for row in rows] if is_map_point else None)
+        return compact_points
+
+
+TRAJECTORY_MAGIC = b'SCTJ'
+TRAJECTORY_VERSION = 1
+# magic, version, points quantity
+TRAJECTORY_PREAMBLE = struct.Struct('<4sBI')
+# Coordinates are stored as integers of 1e-7 degrees, about a centimeter
+TRAJECTORY_COORDINATES_SCALE = 10 ** 7
+
+
+def _to_deltas(values: List[int]) -> List[int]:
+    return [value - previous for previous, value in zip([0, *values], values)]
+
+
+def encode_trajectory(xs: List[float], ys: List[float], times: List[int]) -> bytes:
+    """
+    Packs a track as zlib compressed delta arrays: x and y as int32 deltas of 1e-7 degrees and times (epoch
+    milliseconds) as int64 deltas. Consecutive fixes are close in space and time, so deltas are small
+    numbers that compress to a few bytes per point.
+    """
+    columns = [array('i', _to_deltas([round(x * TRAJECTORY_COORDINATES_SCALE) for x in xs])),
+               array('i', _to_deltas([round(y * TRAJECTORY_COORDINATES_SCALE) for y in ys])),
+               array('q', _to_deltas(times))]
+    if sys.byteorder == 'big':
+        for column in columns:
+            column.byteswap()
+    return TRAJECTORY_PREAMBLE.pack(TRAJECTORY_MAGIC, TRAJECTORY_VERSION, len(times)) + \
+        zlib.compress(b''.join(column.tobytes() for column in columns))
+
+
+def decode_trajectory(data: bytes) -> Tuple[List[float], List[float], List[int]]:
+    magic, version, points_quantity = TRAJECTORY_PREAMBLE.unpack_from(data)
+    if magic != TRAJECTORY_MAGIC or version != TRAJECTORY_VERSION:
+        raise ValueError('Not a compacted trajectory')
+    payload = zlib.decompress(data[TRAJECTORY_PREAMBLE.size:])
+
+    columns = []
+    offset = 0
+    for typecode in ('i', 'i', 'q'):
+        column = array(typecode)
+        column_length = column.itemsize * points_quantity
+        column.frombytes(payload[offset:offset + column_length])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        columns.append(list(accumulate(column)))
+        offset += column_length
+    xs, ys, times = columns
+    return ([x / TRAJECTORY_COORDINATES_SCALE for x in xs], [y / TRAJECTORY_COORDINATES_SCALE for y in ys],
+            times)
+
+
+TRACK_POINTS_FRAME_MAGIC = b'SCTF'
+TRACK_POINTS_FRAME_VERSION = 1
+# magic, version
+TRACK_POINTS_FRAME_PREAMBLE = struct.Struct('<4sB')
+# resource id, lat, lng, epoch milliseconds
+TRACK_POINTS_FRAME_POINT = struct.Struct('<Iddq')
+
+
+def encode_track_points_frame(points: List[Tuple[int, float, float, int]]) -> bytes:
+    return TRACK_POINTS_FRAME_PREAMBLE.pack(TRACK_POINTS_FRAME_MAGIC, TRACK_POINTS_FRAME_VERSION) + \
+        b''.join(TRACK_POINTS_FRAME_POINT.pack(*point) for point in points)
+
+
+def decode_track_points_frame(data: bytes) -> Iterator[Tuple[int, float, float, int]]:
+    """
+    Binary WebSocket frame of track points: the preamble, then every point as a fixed width little endian record
+    (TRACK_POINTS_FRAME_POINT), 28 bytes against more than a hundred of its JSON message. Records are unpacked
+    lazily straight from the frame, as (resource id, lat, lng, epoch milliseconds) tuples.
+    """
+    if len(data) < TRACK_POINTS_FRAME_PREAMBLE.size:
+        raise ValueError('Not a track points frame')
+    magic, version = TRACK_POINTS_FRAME_PREAMBLE.unpack_from(data)
+    if magic != TRACK_POINTS_FRAME_MAGIC or version != TRACK_POINTS_FRAME_VERSION:
+        raise ValueError('Not a track points frame')
+    points = memoryview(data)[TRACK_POINTS_FRAME_PREAMBLE.size:]
+    if len(points) % TRACK_POINTS_FRAME_POINT.size:
+        raise ValueError('Truncated track points frame')
+    return TRACK_POINTS_FRAME_POINT.iter_unpack(points)
@@ -0,0 +1,61 @@
+import base64
+import binascii
+import re
+
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+
+class InvalidPointsCursor(Exception):
+    pass
+
+
+class PointsCursor:
+    """
+    Opaque cursor for incremental polling of point listings. Every point carries the id of the transaction
+    that stored it (ingestion_txid, see migration 0008), and the cursor holds the snapshot of transactions
+    taken before a listing is read: points of transactions committed by then were listed, the following
+    poll lists the points of every other transaction. Ids and times are assigned before commit, so unlike
+    them this misses neither fixes uploaded late nor batches committing after newer points were listed.
+    Points committed between the snapshot and the listing query may be listed twice, clients dedupe them
+    by id.
+    """
+
+    _snapshot_regex = re.compile(r'^(\d+):(\d+):(\d+(,\d+)*)?$')
+
+    def __init__(self, snapshot: str):
+        self.snapshot = snapshot
+
+    @property
+    def xmin(self) -> int:
+        return int(self.snapshot.split(':')[0])
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(self.snapshot.encode()).decode()
+
+    @classmethod
+    def decode(cls, value: str) -> 'PointsCursor':
+        try:
+            snapshot = base64.urlsafe_b64decode(value.encode()).decode()
+        except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+            raise InvalidPointsCursor(f'Invalid points cursor {value}') from error
+        if not cls._snapshot_regex.match(snapshot):
+            raise InvalidPointsCursor(f'Invalid points cursor {value}')
+        return cls(snapshot)
+
+    @classmethod
+    def take(cls, using: str = 'default') -> 'PointsCursor':
+        """To be taken before the listing is read"""
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT txid_current_snapshot()::text')
+            return cls(cursor.fetchone()[0])
+
+    def filter_newer(self, queryset):
+        # Transactions older than the snapshot xmin were all committed (or aborted) when it was taken, the
+        # comparison keeps the scan on the (incident, ingestion_txid) index
+        ingestion_txid = f'"{queryset.model._meta.db_table}"."ingestion_txid"'
+        return queryset.annotate(
+            is_newer=RawSQL(f'{ingestion_txid} >= %s AND NOT txid_visible_in_snapshot({ingestion_txid}, %s)',
+                            (self.xmin, self.snapshot), output_field=BooleanField()),
+        ).filter(is_newer=True)
@@ -0,0 +1,124 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from rest_framework_gis.fields import GeometryField
+
+from sicoin.geolocation.authorization import get_ingestion_authorization
+from sicoin.geolocation.codecs import EPOCH, TRACK_POINTS_FRAME_POINT, TRACK_POINTS_FRAME_PREAMBLE, \
+    decode_track_points_frame, to_epoch_milliseconds
+from sicoin.geolocation.geofence import geofence_evaluator
+from sicoin.geolocation.jitter import TrackPointJitterFilter
+from sicoin.geolocation.models import TrackPoint
+from sicoin.geolocation.reporting import ReportingIntervalAdvisor
+from sicoin.geolocation.serializers import get_cached_resource_representation
+from sicoin.geolocation.streams import TrackPointStreamBuffer
+from sicoin.incident.models import Incident
+from sicoin.incident.throttling import get_resource_bucket
+
+# Times from then on do not fit a datetime
+MAX_EPOCH_MILLISECONDS = to_epoch_milliseconds(datetime(9999, 12, 31, tzinfo=timezone.utc))
+
+
+def _is_valid_record(lat: float, lng: float, collected_at: int) -> bool:
+    return math.isfinite(lat) and math.isfinite(lng) and abs(lat) <= 90 and abs(lng) <= 180 and \
+        0 <= collected_at <= MAX_EPOCH_MILLISECONDS
+
+
+class TrackPointFrameIngestor:
+    """
+    Stores the track points of a binary WebSocket frame (see codecs.decode_track_points_frame) with the checks,
+    filtering and side effects of TrackPointSerializer, in a single insertion. Points are built straight from
+    the unpacked records, invalid records (coordinates or time out of range) are skipped. Points of resources
+    not added to the started incident, or whose user is inactive, are dropped, as are the oldest points of a
+    resource beyond its tokens (see INCIDENT_WS_RESOURCE_RATE), counted in throttled_quantity.
+    """
+
+    def __init__(self, incident_id):
+        self.incident_id = int(incident_id)
+        self.reporting_interval_seconds = None
+        self.throttled_quantity = 0
+        # Seconds until the throttled resources have tokens again
+        self.throttled_wait_seconds = 0
+
+    def _get_incident_resource_id(self, resource_id) -> Optional[int]:
+        """Same checks as TrackPointSerializer, None unless the resource was already added to the incident"""
+        authorization = get_ingestion_authorization(self.incident_id, resource_id)
+        if authorization.incident_status != Incident.INCIDENT_STATUS_STARTED or not authorization.user_is_active:
+            return None
+        return authorization.incident_resource_id
+
+    def _build_track_points(self, data: bytes) -> Dict[int, List[TrackPoint]]:
+        points_quantity = (len(data) - TRACK_POINTS_FRAME_PREAMBLE.size) // TRACK_POINTS_FRAME_POINT.size
+        if points_quantity > settings.INCIDENT_WS_FRAME_MAX_POINTS:
+            raise ValueError(f'Track points frame of {points_quantity} points, '
+                             f'up to {settings.INCIDENT_WS_FRAME_MAX_POINTS} allowed')
+
+        track_points_by_resource: Dict[int, List[TrackPoint]] = {}
+        incident_resource_ids: Dict[int, Optional[int]] = {}
+        for resource_id, lat, lng, collected_at in decode_track_points_frame(data):
+            if not _is_valid_record(lat, lng, collected_at):
+                continue
+            if resource_id not in incident_resource_ids:
+                incident_resource_ids[resource_id] = self._get_incident_resource_id(resource_id)
+            if incident_resource_ids[resource_id] is None:
+                continue
+            # Same coordinates order as the JSON messages
+            track_points_by_resource.setdefault(resource_id, []).append(TrackPoint(
+                incident_id=self.incident_id,
+                incident_resource_id=incident_resource_ids[resource_id],
+                location=Point(lat, lng, srid=4326),
+                time_created=EPOCH + timedelta(milliseconds=collected_at)))
+        return track_points_by_resource
+
+    def _take_tokens(self, resource_id, track_points: List[TrackPoint]) -> List[TrackPoint]:
+        """
+        Takes a token of the resource for every point, newest first: points received one by one beyond the
+        rate are coalesced into the newest one, so the oldest are the ones dropped here
+        """
+        if not settings.INCIDENT_WS_RESOURCE_RATE:
+            return track_points
+        resource_bucket = get_resource_bucket(resource_id)
+        track_points = sorted(track_points, key=lambda track_point: track_point.time_created, reverse=True)
+        for index, track_point in enumerate(track_points):
+            wait_seconds = resource_bucket.take()
+            if wait_seconds:
+                self.throttled_quantity += len(track_points) - index
+                self.throttled_wait_seconds = max(self.throttled_wait_seconds, wait_seconds)
+                return track_points[:index]
+        return track_points
+
+    def ingest(self, data: bytes) -> List[dict]:
+        """Returns the representation of every point stored (or buffered), see TrackPointSerializer.buffer"""
+        track_points_by_resource = self._build_track_points(data)
+        resource_ids = {}
+        received_track_points = []
+        for resource_id, track_points in track_points_by_resource.items():
+            track_points = self._take_tokens(resource_id, track_points)
+            if not track_points:
+                continue
+            resource_ids[track_points[0].incident_resource_id] = resource_id
+            received_track_points += track_points
+            self.reporting_interval_seconds = ReportingIntervalAdvisor(
+                self.incident_id, track_points[0].incident_resource_id).recommend(track_points)
+
+        accepted_track_points = TrackPointJitterFilter().filter(received_track_points)
+        if settings.INCIDENT_WS_TRACK_POINTS_BUFFERED:
+            stream_buffer = TrackPointStreamBuffer()
+            for track_point in accepted_track_points:
+                stream_buffer.append(track_point)
+            stored_track_points = accepted_track_points
+        else:
+            with transaction.atomic():
+                stored_track_points = TrackPoint.objects.insert_ignoring_duplicates(accepted_track_points)
+                geofence_evaluator.evaluate(stored_track_points)
+
+        return [{
+            'location': GeometryField().to_representation(track_point.location),
+            'collected_at': track_point.time_created.isoformat(),
+            'internal_type': 'TrackPoint',  # We use this field for future usage on WS
+            'resource': get_cached_resource_representation(resource_ids[track_point.incident_resource_id]),
+        } for track_point in stored_track_points]
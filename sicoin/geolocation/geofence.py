@@ -0,0 +1,176 @@
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from rest_framework_gis.fields import GeometryField
+
+from sicoin.geolocation.models import GeofenceTransition, TrackPoint
+from sicoin.incident.live_state import IncidentLiveState
+from sicoin.incident.models import Incident
+
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def haversine_distance(lng1: float, lat1: float, lng2: float, lat2: float) -> float:
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def get_lng_lat(location: Point) -> Tuple[float, float]:
+    """Of a track or map point location, stored as Point(lat, lng) unlike the location of incidents"""
+    return location.y, location.x
+
+
+class ResourceGeofenceState:
+    __slots__ = ('is_inside', 'time_created', 'transitions_quantity')
+
+    def __init__(self, is_inside: bool, time_created: Optional[datetime], transitions_quantity: int):
+        self.is_inside = is_inside
+        # Time of the newest fix evaluated, older ones arriving later are ignored
+        self.time_created = time_created
+        self.transitions_quantity = transitions_quantity
+
+
+class IncidentGeofence:
+    def __init__(self, center: Optional[Tuple[float, float]]):
+        self.center = center
+        self.expires_at = time.monotonic() + settings.GEOFENCE_INCIDENT_REFRESH_SECONDS
+        self.resource_states: Dict[int, ResourceGeofenceState] = {}
+
+
+class GeofenceEvaluator:
+    """
+    Detects resources entering and leaving the scene of their incident (INCIDENT_SCENE_RADIUS_METERS around
+    its location) as track points are ingested. The incident location and the inside/outside state of every
+    resource are kept in process memory, so evaluating a fix is a distance calculation: the database is
+    only queried to load an incident or a resource seen for the first time (the state is seeded from its
+    last recorded transition) and to record transitions.
+    Transitions are numbered per resource and unique by number, so one detected by several processes is
+    recorded once; the state of a resource whose transition was already recorded is reloaded.
+    Transitions are broadcast to the incident channel group once committed.
+    """
+
+    def __init__(self):
+        self._incident_geofences: Dict[int, IncidentGeofence] = {}
+        # Consumers evaluate from a pool of threads. Only held while reading or changing the states, never
+        # across queries
+        self._lock = threading.Lock()
+
+    def _get_incident_geofence(self, incident_id: int) -> IncidentGeofence:
+        with self._lock:
+            incident_geofence = self._incident_geofences.get(incident_id)
+        if incident_geofence is not None and incident_geofence.expires_at > time.monotonic():
+            return incident_geofence
+
+        location_point = Incident.objects.filter(id=incident_id, status=Incident.INCIDENT_STATUS_STARTED) \
+            .values_list('location_point', flat=True).first()
+        loaded_incident_geofence = IncidentGeofence((location_point.x, location_point.y) if location_point else None)
+        with self._lock:
+            incident_geofence = self._incident_geofences.get(incident_id)
+            now = time.monotonic()
+            if incident_geofence is not None and incident_geofence.expires_at > now:
+                # Loaded by another thread meanwhile
+                return incident_geofence
+            # Geofences of incidents no longer receiving points are dropped along with the expired one
+            self._incident_geofences = {geofence_incident_id: geofence
+                                        for geofence_incident_id, geofence in self._incident_geofences.items()
+                                        if geofence.expires_at > now}
+            self._incident_geofences[incident_id] = loaded_incident_geofence
+        return loaded_incident_geofence
+
+    def _get_resource_state(self, incident_geofence: IncidentGeofence,
+                            incident_resource_id: int) -> ResourceGeofenceState:
+        with self._lock:
+            resource_state = incident_geofence.resource_states.get(incident_resource_id)
+        if resource_state is not None:
+            return resource_state
+
+        last_transition = GeofenceTransition.objects.filter(incident_resource_id=incident_resource_id) \
+            .order_by('-number').values_list('transition', 'time_created', 'number').first()
+        if last_transition is None:
+            resource_state = ResourceGeofenceState(is_inside=False, time_created=None, transitions_quantity=0)
+        else:
+            resource_state = ResourceGeofenceState(
+                is_inside=last_transition[0] == GeofenceTransition.TRANSITION_ENTERED,
+                time_created=last_transition[1],
+                transitions_quantity=last_transition[2])
+        with self._lock:
+            return incident_geofence.resource_states.setdefault(incident_resource_id, resource_state)
+
+    def _forget_resource_states(self, transitions: List[GeofenceTransition]):
+        with self._lock:
+            for incident_geofence in self._incident_geofences.values():
+                for transition in transitions:
+                    incident_geofence.resource_states.pop(transition.incident_resource_id, None)
+
+    def _detect_transitions(self, track_points: List[TrackPoint]) -> List[GeofenceTransition]:
+        transitions = []
+        for track_point in sorted(track_points, key=lambda track_point: track_point.time_created):
+            incident_geofence = self._get_incident_geofence(track_point.incident_id)
+            if incident_geofence.center is None:
+                continue
+            resource_state = self._get_resource_state(incident_geofence, track_point.incident_resource_id)
+            distance = haversine_distance(*incident_geofence.center, *get_lng_lat(track_point.location))
+            radius = settings.INCIDENT_SCENE_RADIUS_METERS
+
+            with self._lock:
+                if resource_state.time_created is not None and track_point.time_created <= resource_state.time_created:
+                    continue
+                if resource_state.is_inside:
+                    radius += settings.GEOFENCE_HYSTERESIS_METERS
+                is_inside = distance <= radius
+                resource_state.time_created = track_point.time_created
+                if is_inside == resource_state.is_inside:
+                    continue
+                resource_state.is_inside = is_inside
+                resource_state.transitions_quantity += 1
+                number = resource_state.transitions_quantity
+
+            transitions.append(GeofenceTransition(
+                incident_id=track_point.incident_id,
+                incident_resource_id=track_point.incident_resource_id,
+                transition=GeofenceTransition.TRANSITION_ENTERED if is_inside else GeofenceTransition.TRANSITION_EXITED,
+                number=number,
+                location=track_point.location,
+                distance_meters=distance,
+                time_created=track_point.time_created))
+        return transitions
+
+    @staticmethod
+    def to_representation(transition: GeofenceTransition) -> dict:
+        return {
+            'incident_resource_id': transition.incident_resource_id,
+            'transition': transition.transition,
+            'location': GeometryField().to_representation(transition.location),
+            'distance_meters': transition.distance_meters,
+            'collected_at': transition.time_created.isoformat(),
+        }
+
+    @staticmethod
+    def _send_transitions(transitions: List[GeofenceTransition]):
+        for transition in transitions:
+            IncidentLiveState(transition.incident_id).publish({
+                'type': 'geofence_transition',
+                'data': GeofenceEvaluator.to_representation(transition),
+            })
+
+    def evaluate(self, track_points: List[TrackPoint]) -> List[GeofenceTransition]:
+        """Evaluates the given newly stored track points, records and broadcasts the transitions they make"""
+        transitions = self._detect_transitions(track_points)
+        if not transitions:
+            return []
+        inserted_transitions = GeofenceTransition.objects.insert_ignoring_recorded(transitions)
+        if len(inserted_transitions) < len(transitions):
+            # Another process got further than this one, its states are reloaded from the recorded transitions
+            self._forget_resource_states([transition for transition in transitions if transition.id is None])
+        transaction.on_commit(lambda: self._send_transitions(inserted_transitions))
+        return inserted_transitions
+
+
+geofence_evaluator = GeofenceEvaluator()
@@ -0,0 +1,56 @@
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.models import Incident
+
+
+class HeatmapCell(NamedTuple):
+    lat: float
+    lng: float
+    points_quantity: int
+    dwell_seconds: float
+    resource_id: Optional[int]
+
+
+class TrackPointHeatmap:
+    """
+    Aggregates the track points of an incident on a grid (ST_SnapToGrid, points are stored as Point(lat, lng))
+    in the database, counting the points of every cell and the time resources spent on it. The dwell time of a
+    point is the time until the next point of the same resource, capped to HEATMAP_MAX_DWELL_SECONDS so a
+    device that stopped reporting does not pile up hours on its last cell.
+    """
+
+    def __init__(self, incident: Incident):
+        self.incident = incident
+
+    def aggregate(self, cell_size: float, per_resource: bool = False,
+                  track_points_queryset=None) -> List[HeatmapCell]:
+        if track_points_queryset is None:
+            track_points_queryset = TrackPoint.objects.filter(incident=self.incident)
+        points_query = track_points_queryset.order_by().annotate(
+            resource_id=F('incident_resource__resource_id')
+        ).values('id', 'incident_resource_id', 'resource_id', 'location', 'time_created').query
+        # Compiled as a subquery so the location is selected as a geometry and not cast for Python
+        points_query.subquery = True
+        points_sql, points_params = points_query.sql_with_params()
+
+        resource_column = 'cells.resource_id' if per_resource else 'NULL::integer'
+        group_by_resource = ', cells.resource_id' if per_resource else ''
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT cells.lat, cells.lng, COUNT(*), '
+                           f'SUM(LEAST(COALESCE(cells.dwell_seconds, 0), %s)), {resource_column} '
+                           f'FROM (SELECT ST_X(ST_SnapToGrid(points.location, %s)) AS lat, '
+                           f'             ST_Y(ST_SnapToGrid(points.location, %s)) AS lng, '
+                           f'             points.resource_id, '
+                           f'             EXTRACT(EPOCH FROM LEAD(points.time_created) OVER ('
+                           f'                 PARTITION BY points.incident_resource_id '
+                           f'                 ORDER BY points.time_created, points.id) - points.time_created) '
+                           f'             AS dwell_seconds '
+                           f'      FROM ({points_sql}) points) cells '
+                           f'GROUP BY cells.lat, cells.lng{group_by_resource}',
+                           [settings.HEATMAP_MAX_DWELL_SECONDS, cell_size, cell_size, *points_params])
+            return [HeatmapCell(*row) for row in cursor.fetchall()]
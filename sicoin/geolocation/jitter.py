@@ -0,0 +1,60 @@
+from typing import List
+
+from django.conf import settings
+from django.core.cache import cache
+
+from sicoin.geolocation.geofence import get_lng_lat, haversine_distance
+from sicoin.geolocation.models import TrackPoint
+from sicoin.metrics import increment_counter
+
+FILTERED_TRACK_POINTS_COUNTER = 'track_points.filtered'
+
+
+def _get_last_accepted_key(incident_resource_id) -> str:
+    return f'track_points_last_accepted:{incident_resource_id}'
+
+
+class TrackPointJitterFilter:
+    """
+    Drops track points closer than TRACK_POINTS_FILTER_MIN_DISTANCE_METERS and TRACK_POINTS_FILTER_MIN_SECONDS
+    to the last accepted one of their incident resource, the fixes phones keep reporting while standing still.
+    The last accepted point of every incident resource is kept in the cache, shared by HTTP and WebSocket
+    ingestion, only while it can still filter anything. Points older than it (late uploads) are accepted
+    without moving it. Disabled while the minimum distance is 0.
+    """
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return settings.TRACK_POINTS_FILTER_MIN_DISTANCE_METERS > 0 and settings.TRACK_POINTS_FILTER_MIN_SECONDS > 0
+
+    def _is_jitter(self, track_point: TrackPoint, last_accepted: tuple) -> bool:
+        lng, lat, timestamp = last_accepted
+        elapsed_seconds = track_point.time_created.timestamp() - timestamp
+        return 0 <= elapsed_seconds < settings.TRACK_POINTS_FILTER_MIN_SECONDS and \
+            haversine_distance(lng, lat, *get_lng_lat(track_point.location)) < \
+            settings.TRACK_POINTS_FILTER_MIN_DISTANCE_METERS
+
+    def filter(self, track_points: List[TrackPoint]) -> List[TrackPoint]:
+        """Returns the accepted track points, ordered by time"""
+        track_points = sorted(track_points, key=lambda track_point: track_point.time_created)
+        if not self.is_enabled() or not track_points:
+            return track_points
+
+        last_accepted_points = cache.get_many({_get_last_accepted_key(track_point.incident_resource_id)
+                                               for track_point in track_points})
+        moved_last_accepted_points = {}
+        accepted_track_points = []
+        for track_point in track_points:
+            key = _get_last_accepted_key(track_point.incident_resource_id)
+            last_accepted = last_accepted_points.get(key)
+            if last_accepted is not None and self._is_jitter(track_point, last_accepted):
+                continue
+            accepted_track_points.append(track_point)
+            if last_accepted is None or last_accepted[2] <= track_point.time_created.timestamp():
+                last_accepted_points[key] = moved_last_accepted_points[key] = \
+                    (*get_lng_lat(track_point.location), track_point.time_created.timestamp())
+
+        if moved_last_accepted_points:
+            cache.set_many(moved_last_accepted_points, timeout=int(settings.TRACK_POINTS_FILTER_MIN_SECONDS) + 1)
+        increment_counter(FILTERED_TRACK_POINTS_COUNTER, len(track_points) - len(accepted_track_points))
+        return accepted_track_points
@@ -0,0 +1,30 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from sicoin.geolocation.streams import TrackPointStreamDrainer
+
+
+class Command(BaseCommand):
+    help = 'Stores the track points buffered on the incident Redis Streams, draining them until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer-name', default=f'{socket.gethostname()}-{os.getpid()}',
+                            help='Name of this worker on the consumer group, unique among running workers')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait after a round that found nothing to store')
+        parser.add_argument('--once', action='store_true', default=False,
+                            help='Drain a single round and exit')
+
+    def handle(self, *args, **options):
+        drainer = TrackPointStreamDrainer(options['consumer_name'])
+        while True:
+            stored_quantity = drainer.drain()
+            if stored_quantity:
+                self.stdout.write(self.style.SUCCESS(f'Stored {stored_quantity} buffered track points'))
+            if options['once']:
+                return
+            if not stored_quantity:
+                time.sleep(options['interval'])
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from sicoin.domain_config.models import IncidentType
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.incident.models import Incident, IncidentResource
+from sicoin.users.models import ResourceProfile
+
+
+class RollbackBenchmark(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seeds a synthetic dataset and prints the query plans of the point and incident listings with and ' \
+           'without the indexes declared on the models. Everything runs inside a transaction that is rolled ' \
+           'back; dropping the indexes locks the tables meanwhile, so do not run it against a live database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incidents', type=int, default=20, help='Amount of incidents to seed')
+        parser.add_argument('--resources', type=int, default=5, help='Amount of resources per incident')
+        parser.add_argument('--points', type=int, default=2000,
+                            help='Amount of track points (and a tenth of map points) per resource')
+
+    def _seed_incident(self, incident_type, resources, points_quantity):
+        incident = Incident.objects.create(domain_config=incident_type.domain_config, incident_type=incident_type,
+                                           reference='Index benchmark', location_point=Point(-64.18, -31.42))
+        first_point_time = timezone.now() - timedelta(seconds=2 * points_quantity)
+        with connection.cursor() as cursor:
+            for resource in resources:
+                incident_resource = IncidentResource.objects.create(incident=incident, resource=resource)
+                for model, quantity in ((TrackPoint, points_quantity), (MapPoint, points_quantity // 10)):
+                    description_column = ', description_text' if model is MapPoint else ''
+                    description_value = ", 'benchmark'" if model is MapPoint else ''
+                    cursor.execute(
+                        f'INSERT INTO {model._meta.db_table} '
+                        f'(incident_id, incident_resource_id, location, time_created{description_column}) '
+                        f'SELECT %s, %s, ST_SetSRID(ST_MakePoint(-31.42 + random() / 100, '
+                        f'-64.18 + random() / 100), 4326), %s + step * interval \'2 seconds\'{description_value} '
+                        f'FROM generate_series(1, %s) step',
+                        [incident.id, incident_resource.id, first_point_time, quantity])
+        return incident
+
+    def _get_benchmarked_querysets(self, incident, resource):
+        last_hour = (timezone.now() - timedelta(hours=1), timezone.now())
+        return {
+            'Track points of incident': TrackPoint.objects.filter(incident=incident),
+            'Track points of incident and resource in the last hour': TrackPoint.objects.filter(
+                incident=incident, incident_resource__resource_id=resource.id, time_created__range=last_hour),
+            'Map points of incident': MapPoint.objects.filter(incident=incident),
+            'Map points of incident in the last hour': MapPoint.objects.filter(
+                incident=incident, time_created__range=last_hour),
+            'Started incidents by type': Incident.objects.filter(status=Incident.INCIDENT_STATUS_STARTED,
+                                                                 incident_type=incident.incident_type),
+        }
+
+    def _print_plans(self, title, querysets):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in querysets.items():
+            self.stdout.write(self.style.SUCCESS(name))
+            self.stdout.write(queryset.explain(analyze=True, buffers=True))
+
+    def handle(self, *args, **options):
+        incident_type = IncidentType.objects.first()
+        resources = list(ResourceProfile.objects.all()[:options['resources']])
+        if incident_type is None or not resources:
+            raise CommandError('At least an incident type and a resource are needed, load a fixture first')
+
+        try:
+            with transaction.atomic():
+                incidents = [self._seed_incident(incident_type, resources, options['points'])
+                             for _ in range(options['incidents'])]
+                with connection.cursor() as cursor:
+                    for model in (TrackPoint, MapPoint, Incident):
+                        cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+                querysets = self._get_benchmarked_querysets(incidents[-1], resources[-1])
+                self._print_plans('With indexes', querysets)
+
+                with connection.cursor() as cursor:
+                    for model in (TrackPoint, MapPoint, Incident):
+                        for index in model._meta.indexes:
+                            cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+                self._print_plans('Without indexes', querysets)
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            self.stdout.write(self.style.SUCCESS('Benchmark data and dropped indexes rolled back'))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.geolocation.partitions import PointPartitionManager
+
+
+class Command(BaseCommand):
+    help = 'Creates the upcoming monthly partitions of the TrackPoint and MapPoint tables, ' \
+           'and detaches or drops the ones older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.POINT_PARTITIONS_MONTHS_AHEAD,
+                            help='Amount of months ahead of the current one to create partitions for')
+        parser.add_argument('--retention-months', type=int, default=settings.POINT_PARTITIONS_RETENTION_MONTHS,
+                            help='Partitions older than this amount of months are expired, '
+                                 'nothing is expired if not set')
+        parser.add_argument('--drop', action='store_true', default=False,
+                            help='Drop expired partitions instead of only detaching them')
+
+    def handle(self, *args, **options):
+        for model in (TrackPoint, MapPoint):
+            partition_manager = PointPartitionManager(model._meta.db_table)
+
+            for partition_name in partition_manager.create_future_partitions(options['months_ahead']):
+                self.stdout.write(self.style.SUCCESS(f'Created partition {partition_name}'))
+
+            if options['retention_months'] is None:
+                continue
+
+            for partition_name in partition_manager.expire_partitions(options['retention_months'],
+                                                                      drop=options['drop']):
+                self.stdout.write(self.style.WARNING(f'{"Dropped" if options["drop"] else "Detached"} '
+                                                     f'expired partition {partition_name}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sicoin.geolocation.jitter import FILTERED_TRACK_POINTS_COUNTER
+from sicoin.incident.consumers import THROTTLED_COALESCED_COUNTER, THROTTLED_DROPPED_COUNTER
+from sicoin.metrics import get_counters
+
+COUNTERS = (FILTERED_TRACK_POINTS_COUNTER, THROTTLED_DROPPED_COUNTER, THROTTLED_COALESCED_COUNTER)
+
+
+class Command(BaseCommand):
+    help = 'Shows the counters of track points filtered as jitter and of WebSocket messages dropped or ' \
+           'coalesced while throttled, totals of every process since the cache was last cleared'
+
+    def add_arguments(self, parser):
+        parser.add_argument('counters', nargs='*', help=f'Counters to show, all if none given: {", ".join(COUNTERS)}')
+
+    def handle(self, *args, **options):
+        unknown_counters = set(options['counters']) - set(COUNTERS)
+        if unknown_counters:
+            raise CommandError(f'Unknown counters: {", ".join(sorted(unknown_counters))}')
+        for name, value in get_counters(*(options['counters'] or COUNTERS)).items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0004_auto_20210509_1620'),
+    ]
+
+    operations = [
+        # Retried uploads already stored the same fix several times, keep the first copy only
+        migrations.RunSQL(
+            sql='DELETE FROM geolocation_trackpoint duplicated USING geolocation_trackpoint original '
+                'WHERE duplicated.incident_resource_id = original.incident_resource_id '
+                'AND duplicated.time_created = original.time_created '
+                'AND duplicated.id > original.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='trackpoint',
+            constraint=models.UniqueConstraint(fields=('incident_resource', 'time_created'),
+                                               name='Unique track point by incident resource and time'),
+        ),
+    ]
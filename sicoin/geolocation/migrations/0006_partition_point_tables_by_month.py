@@ -0,0 +1,126 @@
+from django.db import migrations
+
+TRACK_POINT_COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('geolocation_trackpoint_id_seq'::regclass),
+    location geometry(Point, 4326) NOT NULL,
+    time_created timestamp with time zone NOT NULL,
+    incident_id integer NOT NULL
+        REFERENCES incident_incident (id) DEFERRABLE INITIALLY DEFERRED,
+    incident_resource_id integer NOT NULL
+        REFERENCES incident_incidentresource (id) DEFERRABLE INITIALLY DEFERRED,
+    CONSTRAINT "Unique track point by incident resource and time" UNIQUE (incident_resource_id, time_created)
+"""
+
+MAP_POINT_COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('geolocation_mappoint_id_seq'::regclass),
+    location geometry(Point, 4326) NOT NULL,
+    time_created timestamp with time zone NOT NULL,
+    incident_id integer NOT NULL
+        REFERENCES incident_incident (id) DEFERRABLE INITIALLY DEFERRED,
+    incident_resource_id integer NOT NULL
+        REFERENCES incident_incidentresource (id) DEFERRABLE INITIALLY DEFERRED,
+    description_text text NOT NULL
+"""
+
+# Rows are copied by column name, the old tables hold the same columns in the order their migrations added them
+TRACK_POINT_COLUMN_NAMES = 'id, location, time_created, incident_id, incident_resource_id'
+MAP_POINT_COLUMN_NAMES = 'id, location, time_created, incident_id, incident_resource_id, description_text'
+
+TRACK_POINT_UNIQUE_CONSTRAINTS = ['Unique track point by incident resource and time']
+
+
+def rename_constraints_sql(table, constraints):
+    # Constraints backed by an index share the schema namespace, renaming them frees their names for the new table
+    return '\n'.join(f'ALTER TABLE {table} RENAME CONSTRAINT "{constraint}" TO "{table}_constraint_{index}";'
+                     for index, constraint in enumerate(constraints))
+
+
+def partition_table_sql(table, columns, column_names, unique_constraints=()):
+    """
+    Recreates the table partitioned by range of time_created, with a monthly partition for every month holding
+    data plus the next two, and a default partition for out of range rows (e.g. devices with a skewed clock).
+    Partitioned tables require the partition key on every unique constraint, so the primary key becomes
+    (id, time_created); ids keep coming from the same sequence.
+    """
+    old_table = f'{table}_unpartitioned'
+    return f"""
+        ALTER TABLE {table} RENAME TO {old_table};
+        {rename_constraints_sql(old_table, [f'{table}_pkey', *unique_constraints])}
+
+        CREATE TABLE {table} (
+            {columns},
+            PRIMARY KEY (id, time_created)
+        ) PARTITION BY RANGE (time_created);
+        CREATE INDEX {table}_incident_id_partitioned ON {table} (incident_id);
+        CREATE INDEX {table}_incident_resource_id_partitioned ON {table} (incident_resource_id);
+        CREATE INDEX {table}_location_partitioned ON {table} USING GIST (location);
+        CREATE TABLE {table}_default PARTITION OF {table} DEFAULT;
+
+        DO $$
+        DECLARE
+            month_start timestamp with time zone;
+        BEGIN
+            FOR month_start IN
+                SELECT generate_series(bounds.first_month, bounds.last_month, interval '1 month')
+                FROM (SELECT date_trunc('month', COALESCE(MIN(time_created), now())) AS first_month,
+                             date_trunc('month', now()) + interval '2 months' AS last_month
+                      FROM {old_table}) bounds
+            LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                               '{table}_p' || to_char(month_start, 'YYYYMM'),
+                               month_start, month_start + interval '1 month');
+            END LOOP;
+        END $$;
+
+        INSERT INTO {table} ({column_names}) SELECT {column_names} FROM {old_table};
+        ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id;
+        DROP TABLE {old_table};
+    """
+
+
+def unpartition_table_sql(table, columns, column_names, unique_constraints=()):
+    old_table = f'{table}_partitioned'
+    return f"""
+        ALTER TABLE {table} RENAME TO {old_table};
+        {rename_constraints_sql(old_table, [f'{table}_pkey', *unique_constraints])}
+
+        CREATE TABLE {table} (
+            {columns},
+            PRIMARY KEY (id)
+        );
+        CREATE INDEX {table}_incident_id ON {table} (incident_id);
+        CREATE INDEX {table}_incident_resource_id ON {table} (incident_resource_id);
+        CREATE INDEX {table}_location ON {table} USING GIST (location);
+
+        INSERT INTO {table} ({column_names}) SELECT {column_names} FROM {old_table};
+        ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id;
+        DROP TABLE {old_table};
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0005_trackpoint_unique_incident_resource_time'),
+        ('incident', '0012_auto_20210228_0451'),
+    ]
+
+    # Database only: the models keep describing the tables as Django manages them. The primary key is
+    # (id, time_created) in the database but stays id in the migration state, Django cannot represent
+    # composite keys and ids are unique anyway (single sequence), so never alter the id field of these models.
+    # The foreign key and location indexes are recreated under other names (*_partitioned), fields keep
+    # db_index, Django looks indexes up by column when altering them.
+    operations = [
+        migrations.SeparateDatabaseAndState(database_operations=[
+            migrations.RunSQL(
+                sql=partition_table_sql('geolocation_trackpoint', TRACK_POINT_COLUMNS, TRACK_POINT_COLUMN_NAMES,
+                                        TRACK_POINT_UNIQUE_CONSTRAINTS),
+                reverse_sql=unpartition_table_sql('geolocation_trackpoint', TRACK_POINT_COLUMNS,
+                                                  TRACK_POINT_COLUMN_NAMES, TRACK_POINT_UNIQUE_CONSTRAINTS),
+            ),
+            migrations.RunSQL(
+                sql=partition_table_sql('geolocation_mappoint', MAP_POINT_COLUMNS, MAP_POINT_COLUMN_NAMES),
+                reverse_sql=unpartition_table_sql('geolocation_mappoint', MAP_POINT_COLUMNS, MAP_POINT_COLUMN_NAMES),
+            ),
+        ]),
+    ]
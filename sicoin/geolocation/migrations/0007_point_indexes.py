@@ -0,0 +1,81 @@
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0006_partition_point_tables_by_month'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trackpoint',
+            index=models.Index(fields=['incident', 'time_created'], name='trackpoint_incident_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trackpoint',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['time_created'],
+                                                            name='trackpoint_time_created_brin'),
+        ),
+        migrations.AddIndex(
+            model_name='mappoint',
+            index=models.Index(fields=['incident', 'time_created'], name='mappoint_incident_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mappoint',
+            index=models.Index(fields=['incident_resource', 'time_created'], name='mappoint_resource_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mappoint',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['time_created'],
+                                                            name='mappoint_time_created_brin'),
+        ),
+        # Single column foreign key indexes are now prefixes of the composite ones, dropping them saves
+        # an index update per inserted point. 0006 created them under other names, so they are dropped by name
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='trackpoint',
+                    name='incident',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                            to='incident.Incident'),
+                ),
+                migrations.AlterField(
+                    model_name='trackpoint',
+                    name='incident_resource',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                            to='incident.IncidentResource'),
+                ),
+                migrations.AlterField(
+                    model_name='mappoint',
+                    name='incident',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                            to='incident.Incident'),
+                ),
+                migrations.AlterField(
+                    model_name='mappoint',
+                    name='incident_resource',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                            to='incident.IncidentResource'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql='DROP INDEX geolocation_trackpoint_incident_id_partitioned;'
+                        'DROP INDEX geolocation_trackpoint_incident_resource_id_partitioned;'
+                        'DROP INDEX geolocation_mappoint_incident_id_partitioned;'
+                        'DROP INDEX geolocation_mappoint_incident_resource_id_partitioned;',
+                    reverse_sql='CREATE INDEX geolocation_trackpoint_incident_id_partitioned '
+                                'ON geolocation_trackpoint (incident_id);'
+                                'CREATE INDEX geolocation_trackpoint_incident_resource_id_partitioned '
+                                'ON geolocation_trackpoint (incident_resource_id);'
+                                'CREATE INDEX geolocation_mappoint_incident_id_partitioned '
+                                'ON geolocation_mappoint (incident_id);'
+                                'CREATE INDEX geolocation_mappoint_incident_resource_id_partitioned '
+                                'ON geolocation_mappoint (incident_resource_id);',
+                ),
+            ],
+        ),
+    ]
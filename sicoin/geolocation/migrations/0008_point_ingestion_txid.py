@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def add_ingestion_txid_sql(table):
+    # Rows stored before the column existed were committed long ago, 0 orders them before any cursor.
+    # Not a model field: the default is only applied when inserts leave the column out, as the ORM does
+    return f"""
+        ALTER TABLE {table} ADD COLUMN ingestion_txid bigint NOT NULL DEFAULT 0;
+        ALTER TABLE {table} ALTER COLUMN ingestion_txid SET DEFAULT txid_current();
+        CREATE INDEX {table}_incident_ingestion_txid ON {table} (incident_id, ingestion_txid);
+    """
+
+
+def drop_ingestion_txid_sql(table):
+    return f'ALTER TABLE {table} DROP COLUMN ingestion_txid;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0007_point_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=add_ingestion_txid_sql('geolocation_trackpoint'),
+            reverse_sql=drop_ingestion_txid_sql('geolocation_trackpoint'),
+        ),
+        migrations.RunSQL(
+            sql=add_ingestion_txid_sql('geolocation_mappoint'),
+            reverse_sql=drop_ingestion_txid_sql('geolocation_mappoint'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incident', '0013_incident_status_type_idx'),
+        ('geolocation', '0008_point_ingestion_txid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimplifiedTrack',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom_level', models.PositiveSmallIntegerField()),
+                ('line', django.contrib.gis.db.models.fields.LineStringField(srid=4326)),
+                ('points_quantity', models.PositiveIntegerField()),
+                ('incident_resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                        to='incident.IncidentResource')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='simplifiedtrack',
+            constraint=models.UniqueConstraint(fields=('incident_resource', 'zoom_level'),
+                                               name='Unique simplified track by incident resource and zoom level'),
+        ),
+    ]
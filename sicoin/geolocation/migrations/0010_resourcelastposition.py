@@ -0,0 +1,42 @@
+import django.contrib.gis.db.models.fields
+import django.contrib.gis.geos.point
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incident', '0013_incident_status_type_idx'),
+        ('geolocation', '0009_simplifiedtrack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceLastPosition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', django.contrib.gis.db.models.fields.PointField(
+                    default=django.contrib.gis.geos.point.Point(0.0, 0.0), srid=4326)),
+                ('time_created', models.DateTimeField()),
+                ('incident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                               to='incident.Incident')),
+                ('incident_resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE,
+                                                           related_name='last_position',
+                                                           to='incident.IncidentResource')),
+            ],
+            options={
+                'ordering': ['time_created'],
+                'abstract': False,
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO geolocation_resourcelastposition (incident_resource_id, incident_id, location, time_created)
+                SELECT DISTINCT ON (incident_resource_id) incident_resource_id, incident_id, location, time_created
+                FROM geolocation_trackpoint
+                ORDER BY incident_resource_id, time_created DESC, id DESC;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
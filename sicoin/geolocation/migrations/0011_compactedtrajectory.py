@@ -0,0 +1,26 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incident', '0013_incident_status_type_idx'),
+        ('geolocation', '0010_resourcelastposition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompactedTrajectory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points_quantity', models.PositiveIntegerField()),
+                ('first_time_created', models.DateTimeField()),
+                ('last_time_created', models.DateTimeField()),
+                ('encoded_points', models.BinaryField()),
+                ('incident_resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE,
+                                                           related_name='compacted_trajectory',
+                                                           to='incident.IncidentResource')),
+            ],
+        ),
+    ]
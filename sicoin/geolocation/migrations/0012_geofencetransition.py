@@ -0,0 +1,42 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incident', '0014_incidentresource_movement_stats'),
+        ('geolocation', '0011_compactedtrajectory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeofenceTransition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transition', models.CharField(choices=[('Entered', 'Entered'), ('Exited', 'Exited')],
+                                                max_length=255)),
+                ('number', models.PositiveIntegerField()),
+                ('location', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+                ('distance_meters', models.FloatField()),
+                ('time_created', models.DateTimeField()),
+                ('incident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                               to='incident.Incident')),
+                ('incident_resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                        to='incident.IncidentResource')),
+            ],
+            options={
+                'ordering': ['time_created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='geofencetransition',
+            index=models.Index(fields=['incident_resource', 'time_created'], name='geofence_resource_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='geofencetransition',
+            constraint=models.UniqueConstraint(fields=('incident_resource', 'number'),
+                                               name='Unique geofence transition by incident resource and number'),
+        ),
+    ]
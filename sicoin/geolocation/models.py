@@ -1,10 +1,19 @@
+from typing import List
+
+from django.conf import settings
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import Point
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import connections, transaction
+from psycopg2.extras import execute_values
 
+from sicoin.geolocation.versions import bump_incident_points_version
 from sicoin.incident.models import Incident, IncidentResource
+from sicoin.users.models import ResourceProfile
 
 
 class BasePointInTime(models.Model):
+    # Stored as Point(lat, lng), the order clients send coordinates in, unlike Incident.location_point
     location = models.PointField(default=Point(0.0, 0.0))
     time_created = models.DateTimeField()
 
@@ -13,12 +22,235 @@ class BasePointInTime(models.Model):
         ordering = ['time_created']
 
 
+class PointManager(models.Manager):
+
+    def _get_location_wkt(self, location: Point) -> str:
+        srid = self.model._meta.get_field('location').srid
+        if location.srid and location.srid != srid:
+            location = location.transform(srid, clone=True)
+        return location.wkt
+
+    def _get_location_template(self) -> str:
+        return f"ST_SetSRID(ST_GeomFromText(%s), {self.model._meta.get_field('location').srid})"
+
+
+class TrackPointManager(PointManager):
+
+    def insert_ignoring_duplicates(self, track_points: List['TrackPoint']) -> List['TrackPoint']:
+        """
+        Inserts the given unsaved track points with ON CONFLICT DO NOTHING, so retried uploads of an
+        already stored fix (same incident resource and time) are skipped without a read before the write.
+        Returns the track points actually inserted, with their ids set.
+        """
+        if not track_points:
+            return []
+
+        query = f'INSERT INTO {self.model._meta.db_table} ' \
+                f'(incident_id, incident_resource_id, location, time_created) VALUES %s ' \
+                f'ON CONFLICT (incident_resource_id, time_created) DO NOTHING ' \
+                f'RETURNING id, incident_resource_id, time_created'
+        template = f'(%s, %s, {self._get_location_template()}, %s)'
+        rows = [(track_point.incident_id, track_point.incident_resource_id,
+                 self._get_location_wkt(track_point.location), track_point.time_created)
+                for track_point in track_points]
+
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            inserted_rows = execute_values(cursor.cursor, query, rows, template=template,
+                                           page_size=settings.TRACK_POINTS_INSERT_PAGE_SIZE, fetch=True)
+            inserted_track_points = self._get_inserted_track_points(track_points, inserted_rows)
+            ResourceLastPosition.objects.db_manager(self.db).upsert_from_track_points(inserted_track_points)
+        for incident_id in {track_point.incident_id for track_point in inserted_track_points}:
+            # Once visible to other connections, or a tile built meanwhile would be cached under the new version
+            transaction.on_commit(lambda incident_id=incident_id: bump_incident_points_version(incident_id),
+                                  using=self.db)
+        return inserted_track_points
+
+    @staticmethod
+    def _get_inserted_track_points(track_points, inserted_rows):
+        inserted_ids = {(incident_resource_id, time_created): track_point_id
+                        for track_point_id, incident_resource_id, time_created in inserted_rows}
+        inserted_track_points = []
+        for track_point in track_points:
+            track_point_id = inserted_ids.pop((track_point.incident_resource_id, track_point.time_created), None)
+            if track_point_id is not None:
+                track_point.id = track_point_id
+                inserted_track_points.append(track_point)
+        return inserted_track_points
+
+
+class ResourceLastPositionManager(PointManager):
+
+    def upsert_from_track_points(self, track_points: List['TrackPoint']):
+        """
+        Moves the last position of every incident resource to its newest given track point, unless an even
+        newer one is already stored (points may arrive out of order from buffered uploads). The positions
+        actually moved also move the last known location of their resources, in the same statement, flipped to
+        Point(lng, lat) as the locations of incidents.
+        """
+        newest_track_points = {}
+        for track_point in track_points:
+            newest_track_point = newest_track_points.get(track_point.incident_resource_id)
+            if newest_track_point is None or newest_track_point.time_created < track_point.time_created:
+                newest_track_points[track_point.incident_resource_id] = track_point
+        if not newest_track_points:
+            return
+
+        table = self.model._meta.db_table
+        query = f'WITH moved AS (' \
+                f'INSERT INTO {table} (incident_resource_id, incident_id, location, time_created) VALUES %s ' \
+                f'ON CONFLICT (incident_resource_id) DO UPDATE ' \
+                f'SET location = EXCLUDED.location, time_created = EXCLUDED.time_created ' \
+                f'WHERE {table}.time_created < EXCLUDED.time_created ' \
+                f'RETURNING incident_resource_id, location, time_created) ' \
+                f'UPDATE {ResourceProfile._meta.db_table} resource ' \
+                f'SET last_known_location = ST_FlipCoordinates(moved.location), ' \
+                f'last_known_location_at = moved.time_created ' \
+                f'FROM moved JOIN {IncidentResource._meta.db_table} incident_resource ' \
+                f'ON incident_resource.id = moved.incident_resource_id ' \
+                f'WHERE resource.id = incident_resource.resource_id ' \
+                f'AND (resource.last_known_location_at IS NULL OR resource.last_known_location_at < moved.time_created)'
+        template = f'(%s, %s, {self._get_location_template()}, %s)'
+        rows = [(track_point.incident_resource_id, track_point.incident_id,
+                 self._get_location_wkt(track_point.location), track_point.time_created)
+                for track_point in newest_track_points.values()]
+        with connections[self.db].cursor() as cursor:
+            execute_values(cursor.cursor, query, rows, template=template,
+                           page_size=settings.TRACK_POINTS_INSERT_PAGE_SIZE)
+
+
 class TrackPoint(BasePointInTime):
-    incident = models.ForeignKey(Incident, on_delete=models.PROTECT)
-    incident_resource = models.ForeignKey(IncidentResource, on_delete=models.PROTECT)
+    """
+    Partitioned by month of time_created, with (id, time_created) as primary key in the database only, see
+    migration 0006 and geolocation.partitions
+    """
+    # Served by the composite index and unique constraint below
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, db_index=False)
+    incident_resource = models.ForeignKey(IncidentResource, on_delete=models.PROTECT, db_index=False)
+
+    objects = TrackPointManager()
+
+    class Meta(BasePointInTime.Meta):
+        constraints = [
+            # Also serves lookups by (incident_resource, time_created)
+            models.UniqueConstraint(fields=['incident_resource', 'time_created'],
+                                    name="Unique track point by incident resource and time")
+        ]
+        indexes = [
+            models.Index(fields=['incident', 'time_created'], name='trackpoint_incident_time_idx'),
+            BrinIndex(fields=['time_created'], name='trackpoint_time_created_brin'),
+        ]
 
 
 class MapPoint(BasePointInTime):
-    incident = models.ForeignKey(Incident, on_delete=models.PROTECT)
-    incident_resource = models.ForeignKey(IncidentResource, on_delete=models.PROTECT)
+    """Partitioned as TrackPoint"""
+    # Served by the composite indexes below
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, db_index=False)
+    incident_resource = models.ForeignKey(IncidentResource, on_delete=models.PROTECT, db_index=False)
     description_text = models.TextField()
+
+    class Meta(BasePointInTime.Meta):
+        indexes = [
+            models.Index(fields=['incident', 'time_created'], name='mappoint_incident_time_idx'),
+            models.Index(fields=['incident_resource', 'time_created'], name='mappoint_resource_time_idx'),
+            BrinIndex(fields=['time_created'], name='mappoint_time_created_brin'),
+        ]
+
+
+class SimplifiedTrack(models.Model):
+    """Track of an incident resource simplified for a zoom level, precomputed once the incident is finalized"""
+    incident_resource = models.ForeignKey(IncidentResource, on_delete=models.CASCADE)
+    zoom_level = models.PositiveSmallIntegerField()
+    line = models.LineStringField()
+    points_quantity = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['incident_resource', 'zoom_level'],
+                                    name="Unique simplified track by incident resource and zoom level")
+        ]
+
+
+class ResourceLastPosition(BasePointInTime):
+    """Newest track point of an incident resource, kept up to date on every track point insertion"""
+    incident = models.ForeignKey(Incident, on_delete=models.CASCADE)
+    incident_resource = models.OneToOneField(IncidentResource, on_delete=models.CASCADE,
+                                             related_name='last_position')
+
+    objects = ResourceLastPositionManager()
+
+
+class CompactedTrajectory(models.Model):
+    """Whole track of an incident resource encoded by geolocation.codecs.encode_trajectory"""
+    incident_resource = models.OneToOneField(IncidentResource, on_delete=models.CASCADE,
+                                             related_name='compacted_trajectory')
+    points_quantity = models.PositiveIntegerField()
+    first_time_created = models.DateTimeField()
+    last_time_created = models.DateTimeField()
+    encoded_points = models.BinaryField()
+
+
+class GeofenceTransitionManager(PointManager):
+
+    def insert_ignoring_recorded(self, transitions: List['GeofenceTransition']) -> List['GeofenceTransition']:
+        """
+        Inserts the given unsaved transitions with ON CONFLICT DO NOTHING on their number, so a transition
+        another process already recorded (from a state older than its own) is skipped atomically. Returns the
+        transitions actually inserted, with their ids set.
+        """
+        if not transitions:
+            return []
+
+        query = f'INSERT INTO {self.model._meta.db_table} ' \
+                f'(incident_id, incident_resource_id, transition, number, location, distance_meters, ' \
+                f'time_created) VALUES %s ' \
+                f'ON CONFLICT (incident_resource_id, number) DO NOTHING ' \
+                f'RETURNING id, incident_resource_id, number'
+        template = f'(%s, %s, %s, %s, {self._get_location_template()}, %s, %s)'
+        rows = [(transition.incident_id, transition.incident_resource_id, transition.transition, transition.number,
+                 self._get_location_wkt(transition.location), transition.distance_meters, transition.time_created)
+                for transition in transitions]
+
+        with connections[self.db].cursor() as cursor:
+            inserted_rows = execute_values(cursor.cursor, query, rows, template=template, fetch=True)
+        inserted_ids = {(incident_resource_id, number): transition_id
+                        for transition_id, incident_resource_id, number in inserted_rows}
+        inserted_transitions = []
+        for transition in transitions:
+            transition_id = inserted_ids.get((transition.incident_resource_id, transition.number))
+            if transition_id is not None:
+                transition.id = transition_id
+                inserted_transitions.append(transition)
+        return inserted_transitions
+
+
+class GeofenceTransition(models.Model):
+    """Entry or exit of an incident resource to the incident scene, detected by geolocation.geofence"""
+    TRANSITION_ENTERED = "Entered"
+    TRANSITION_EXITED = "Exited"
+    TRANSITIONS = (
+        (TRANSITION_ENTERED, TRANSITION_ENTERED),
+        (TRANSITION_EXITED, TRANSITION_EXITED),
+    )
+
+    incident = models.ForeignKey(Incident, on_delete=models.CASCADE)
+    incident_resource = models.ForeignKey(IncidentResource, on_delete=models.CASCADE)
+    transition = models.CharField(max_length=255, choices=TRANSITIONS)
+    # Position among the transitions of the incident resource, from 1. Transitions alternate, so processes
+    # detecting the same one from the same recorded state give it the same number
+    number = models.PositiveIntegerField()
+    location = models.PointField()
+    distance_meters = models.FloatField()
+    # Time of the fix that crossed the scene boundary
+    time_created = models.DateTimeField()
+
+    objects = GeofenceTransitionManager()
+
+    class Meta:
+        ordering = ['time_created']
+        constraints = [
+            models.UniqueConstraint(fields=['incident_resource', 'number'],
+                                    name="Unique geofence transition by incident resource and number")
+        ]
+        indexes = [
+            models.Index(fields=['incident_resource', 'time_created'], name='geofence_resource_time_idx'),
+        ]
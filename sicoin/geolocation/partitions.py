@@ -0,0 +1,110 @@
+import logging
+import re
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from django.db import connection, transaction
+
+
+class PointPartitionManager:
+    """
+    Manages the monthly range partitions (by time_created) of a point table. Each partition is named
+    <table>_pYYYYMM and holds [first day of the month, first day of next month) in UTC, rows outside of
+    every monthly partition land on <table>_default.
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.default_partition_name = f'{table_name}_default'
+        self._partition_name_regex = re.compile(rf'^{re.escape(table_name)}_p(\d{{4}})(\d{{2}})$')
+
+    @staticmethod
+    def get_month_start(date: datetime, months_offset: int = 0) -> datetime:
+        month_index = date.year * 12 + date.month - 1 + months_offset
+        return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+    def get_partition_name(self, month_start: datetime) -> str:
+        return f'{self.table_name}_p{month_start:%Y%m}'
+
+    def get_monthly_partitions(self) -> List[datetime]:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT child.relname FROM pg_inherits '
+                           'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+                           'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                           'WHERE parent.relname = %s', [self.table_name])
+            partition_names = [row[0] for row in cursor.fetchall()]
+
+        month_starts = []
+        for partition_name in partition_names:
+            match = self._partition_name_regex.match(partition_name)
+            if match:
+                month_starts.append(datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc))
+        return sorted(month_starts)
+
+    def _default_partition_has_rows(self, cursor, month_start: datetime, month_end: datetime) -> bool:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {connection.ops.quote_name(self.default_partition_name)} '
+                       f'WHERE time_created >= %s AND time_created < %s)', [month_start, month_end])
+        return cursor.fetchone()[0]
+
+    def create_partition(self, month_start: datetime) -> bool:
+        if month_start in self.get_monthly_partitions():
+            return False
+
+        month_end = self.get_month_start(month_start, 1)
+        table = connection.ops.quote_name(self.table_name)
+        default_partition = connection.ops.quote_name(self.default_partition_name)
+        partition = connection.ops.quote_name(self.get_partition_name(month_start))
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            rows_on_default_partition = self._default_partition_has_rows(cursor, month_start, month_end)
+            if rows_on_default_partition:
+                # Postgres refuses to create a partition for rows already held by the default one,
+                # so they are moved to the new partition while the default one is detached
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default_partition}')
+
+            cursor.execute(f'CREATE TABLE {partition} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+                           [month_start, month_end])
+
+            if rows_on_default_partition:
+                cursor.execute(f'INSERT INTO {table} SELECT * FROM {default_partition} '
+                               f'WHERE time_created >= %s AND time_created < %s', [month_start, month_end])
+                cursor.execute(f'DELETE FROM {default_partition} WHERE time_created >= %s AND time_created < %s',
+                               [month_start, month_end])
+                cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {default_partition} DEFAULT')
+
+        logging.info(f'Created partition {self.get_partition_name(month_start)} of {self.table_name}')
+        return True
+
+    def create_future_partitions(self, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+        now = now or datetime.now(timezone.utc)
+        created_partitions = []
+        for months_offset in range(0, months_ahead + 1):
+            month_start = self.get_month_start(now, months_offset)
+            if self.create_partition(month_start):
+                created_partitions.append(self.get_partition_name(month_start))
+        return created_partitions
+
+    def expire_partitions(self, retention_months: int, drop: bool = False,
+                          now: Optional[datetime] = None) -> List[str]:
+        """
+        Detaches (or drops) every monthly partition entirely older than the retention window. Detached
+        partitions are kept as plain tables so they can be archived before being dropped by hand.
+        """
+        now = now or datetime.now(timezone.utc)
+        oldest_kept_month_start = self.get_month_start(now, -retention_months)
+        table = connection.ops.quote_name(self.table_name)
+
+        expired_partitions = []
+        for month_start in self.get_monthly_partitions():
+            if month_start >= oldest_kept_month_start:
+                continue
+
+            partition_name = self.get_partition_name(month_start)
+            partition = connection.ops.quote_name(partition_name)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {partition}')
+                if drop:
+                    cursor.execute(f'DROP TABLE {partition}')
+            logging.info(f'{"Dropped" if drop else "Detached"} partition {partition_name} of {self.table_name}')
+            expired_partitions.append(partition_name)
+        return expired_partitions
@@ -0,0 +1,30 @@
+from rest_framework.renderers import BaseRenderer
+
+from sicoin.geolocation.codecs import COMPACT_BINARY_MEDIA_TYPE, COMPACT_JSON_MEDIA_TYPE, CompactPoints
+
+
+class CompactPointsRenderer(BaseRenderer):
+    """
+    Renders CompactPoints (see geolocation.codecs). Listed on the renderers of point listings so their content
+    negotiation accepts the compact media types, and picked from request.accepted_renderer.
+    """
+    charset = None
+
+    def render(self, data: CompactPoints, accepted_media_type=None, renderer_context=None) -> bytes:
+        raise NotImplementedError
+
+
+class CompactPointsJSONRenderer(CompactPointsRenderer):
+    media_type = COMPACT_JSON_MEDIA_TYPE
+    format = 'compact-json'
+
+    def render(self, data: CompactPoints, accepted_media_type=None, renderer_context=None) -> bytes:
+        return data.to_json().encode()
+
+
+class CompactPointsBinaryRenderer(CompactPointsRenderer):
+    media_type = COMPACT_BINARY_MEDIA_TYPE
+    format = 'compact-binary'
+
+    def render(self, data: CompactPoints, accepted_media_type=None, renderer_context=None) -> bytes:
+        return data.to_binary()
@@ -0,0 +1,84 @@
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from sicoin.geolocation.geofence import get_lng_lat, haversine_distance
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.live_state import IncidentLiveState
+from sicoin.incident.models import IncidentResource
+
+
+def _get_incident_load_key(incident_id) -> str:
+    return f'reporting_incident_load:{incident_id}'
+
+
+def _get_last_fixes_key(incident_resource_id) -> str:
+    return f'reporting_last_fixes:{incident_resource_id}'
+
+
+class ReportingIntervalAdvisor:
+    """
+    Recommends how often (seconds) a resource should report its position, from REPORTING_INTERVAL_MIN_SECONDS
+    to REPORTING_INTERVAL_MAX_SECONDS:
+    - by speed: resources at REPORTING_INTERVAL_FAST_SPEED or faster get the minimum, and stationary ones
+      (below MOVEMENT_STATS_IDLE_SPEED) or carried by a container resource (which reports for them) the maximum
+    - stretched by incident load, proportionally to the active resources above
+      REPORTING_INTERVAL_FULL_RATE_RESOURCES
+    - stretched by REPORTING_INTERVAL_UNWATCHED_FACTOR while nobody follows the incident live (WebSocket
+      subscribers other than the reporting phones)
+    Speed comes from the last fixes received of the resource, kept in the cache, and the load of the incident is
+    cached for REPORTING_INTERVAL_LOAD_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self, incident_id, incident_resource_id):
+        self.incident_id = incident_id
+        self.incident_resource_id = incident_resource_id
+
+    def _get_incident_load(self) -> dict:
+        key = _get_incident_load_key(self.incident_id)
+        incident_load = cache.get(key)
+        if incident_load is None:
+            active_incident_resources = IncidentResource.objects.filter(incident_id=self.incident_id,
+                                                                        exited_from_incident_at__isnull=True)
+            incident_load = {
+                'active_resources_quantity': active_incident_resources.count(),
+                'contained_incident_resource_ids': list(active_incident_resources.filter(
+                    container_resource__isnull=False).values_list('id', flat=True)),
+            }
+            cache.set(key, incident_load, timeout=settings.REPORTING_INTERVAL_LOAD_CACHE_TIMEOUT)
+        return incident_load
+
+    def _get_speed(self, track_points: List[TrackPoint]) -> Optional[float]:
+        """
+        Meters per second between the newest two fixes known, None if unknown. The newest two are kept, so
+        fixes received again (retries) or late do not hide the speed.
+        """
+        key = _get_last_fixes_key(self.incident_resource_id)
+        fixes_by_time = {time: (lng, lat, time) for lng, lat, time in cache.get(key, [])}
+        for track_point in track_points:
+            time = track_point.time_created.timestamp()
+            fixes_by_time[time] = (*get_lng_lat(track_point.location), time)
+        fixes = [fixes_by_time[time] for time in sorted(fixes_by_time)[-2:]]
+        if fixes:
+            cache.set(key, fixes, timeout=settings.REPORTING_INTERVAL_MAX_SECONDS * 2)
+        if len(fixes) < 2:
+            return None
+
+        (previous_lng, previous_lat, previous_time), (lng, lat, time) = fixes
+        return haversine_distance(previous_lng, previous_lat, lng, lat) / (time - previous_time)
+
+    def recommend(self, track_points: List[TrackPoint]) -> int:
+        """Given the track points just received from the resource"""
+        minimum, maximum = settings.REPORTING_INTERVAL_MIN_SECONDS, settings.REPORTING_INTERVAL_MAX_SECONDS
+        incident_load = self._get_incident_load()
+        speed = self._get_speed(track_points)
+
+        if self.incident_resource_id in incident_load['contained_incident_resource_ids'] or speed is None or \
+                speed < settings.MOVEMENT_STATS_IDLE_SPEED:
+            return maximum
+        interval = maximum - (maximum - minimum) * min(speed / settings.REPORTING_INTERVAL_FAST_SPEED, 1)
+        interval *= max(1, incident_load['active_resources_quantity'] / settings.REPORTING_INTERVAL_FULL_RATE_RESOURCES)
+        if not IncidentLiveState(self.incident_id).get_subscribers_quantity():
+            interval *= settings.REPORTING_INTERVAL_UNWATCHED_FACTOR
+        return round(min(max(interval, minimum), maximum))
@@ -1,46 +1,121 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework_gis.fields import GeometryField
 
-from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.geolocation.authorization import IngestionAuthorization, get_ingestion_authorization
+from sicoin.geolocation.geofence import geofence_evaluator
+from sicoin.geolocation.jitter import TrackPointJitterFilter
+from sicoin.geolocation.models import MapPoint, ResourceLastPosition, SimplifiedTrack, TrackPoint
+from sicoin.geolocation.reporting import ReportingIntervalAdvisor
+from sicoin.geolocation.streams import TrackPointStreamBuffer
+from sicoin.geolocation.versions import bump_incident_points_version
+from sicoin.incident.live_state import IncidentLiveState
 from sicoin.incident.models import Incident, IncidentResource
 from sicoin.users.models import ResourceProfile
 from sicoin.users.serializers import ListRetrieveResourceProfileSerializer
 
+# Relations walked by ListRetrieveResourceProfileSerializer, to be fetched along with the serialized instances
+RESOURCE_RELATED_FIELDS = ('resource__user', 'resource__domain', 'resource__type')
+INCIDENT_RESOURCE_RELATED_FIELDS = tuple(f'incident_resource__{field}' for field in RESOURCE_RELATED_FIELDS)
+
+
+def _get_resource_representation_key(resource_id) -> str:
+    return f'resource_representation:{resource_id}'
+
+
+def get_cached_resource_representation(resource_id) -> dict:
+    key = _get_resource_representation_key(resource_id)
+    resource_representation = cache.get(key)
+    if resource_representation is None:
+        resource = ResourceProfile.objects.select_related('user', 'domain', 'type').get(id=resource_id)
+        resource_representation = ListRetrieveResourceProfileSerializer().to_representation(resource)
+        cache.set(key, resource_representation, timeout=settings.RESOURCE_REPRESENTATION_CACHE_TIMEOUT)
+    return resource_representation
+
+
+def invalidate_cached_resource_representation(resource_id):
+    cache.delete(_get_resource_representation_key(resource_id))
+
+
+def get_cached_track_point_representation(track_point: TrackPoint, resource_id) -> dict:
+    """Same as TrackPointSerializer.to_representation, built without querying the database"""
+    return {
+        'location': GeometryField().to_representation(track_point.location),
+        'collected_at': track_point.time_created.isoformat(),
+        'internal_type': 'TrackPoint',  # We use this field for future usage on WS
+        'resource': get_cached_resource_representation(resource_id),
+    }
+
+
+class ResourceRepresentationMixin:
+    """
+    Serializes every resource once per serializer instance, listings share a single instance for all
+    their points and most of them belong to a handful of resources
+    """
+
+    def get_resource_representation(self, resource: ResourceProfile) -> dict:
+        if not hasattr(self, '_resource_representations'):
+            self._resource_representations = {}
+        if resource.id not in self._resource_representations:
+            self._resource_representations[resource.id] = \
+                ListRetrieveResourceProfileSerializer().to_representation(resource)
+        return self._resource_representations[resource.id]
+
+
+class BasePointSerializer(ResourceRepresentationMixin, serializers.Serializer):
+    def get_ingestion_authorization(self) -> IngestionAuthorization:
+        if not hasattr(self, '_ingestion_authorization'):
+            self._ingestion_authorization = get_ingestion_authorization(self.context.get('incident_id'),
+                                                                        self.context.get('resource_id'))
+        return self._ingestion_authorization
 
-class BasePointSerializer(serializers.Serializer):
     def _validate_incident_resource_already_created(self):
-        try:
-            IncidentResource.objects.get(
-                incident_id=self.context.get('incident_id'),
-                resource_id=self.context.get('resource_id'))
-        except IncidentResource.DoesNotExist:
+        if self.get_ingestion_authorization().incident_resource_id is None:
             raise serializers.ValidationError(
                 {'resource_id': f"Resource with id: {self.context.get('resource_id')} is not "
                                 f"related to Incident with id:{self.context.get('incident_id')}"})
 
-    def _validate_incident_resource_exists(self):
-        try:
-            incident = Incident.objects.get(id=self.context.get('incident_id'))
-        except Incident.DoesNotExist:
+    def _validate_incident_exists(self):
+        if not self.get_ingestion_authorization().incident_exists:
             raise serializers.ValidationError(
                 {'incident_id': f"Incident with id: {self.context.get('incident_id')} does not exist"})
 
-        if incident.status != incident.INCIDENT_STATUS_STARTED:
-            raise serializers.ValidationError(
-                {'incident_id': f"Incident with id: {self.context.get('incident_id')} "
-                                f"is not at Created state"})
-
-        try:
-            resource = ResourceProfile.objects.get(id=self.context.get('resource_id'))
-        except ResourceProfile.DoesNotExist:
+    def _validate_resource_exists_and_is_active(self):
+        authorization = self.get_ingestion_authorization()
+        if not authorization.resource_exists:
             raise serializers.ValidationError(
                 {'resource_id': f"Resource with id: {self.context.get('resource_id')} does not exist"})
 
-        if not resource.user.is_active:
+        if not authorization.user_is_active:
             raise serializers.ValidationError(
                 {'resource_id': f"User related to Resource with id: "
                                 f"{self.context.get('resource_id')} is not active"})
 
+    def _validate_incident_resource_exists(self):
+        self._validate_incident_exists()
+
+        if self.get_ingestion_authorization().incident_status != Incident.INCIDENT_STATUS_STARTED:
+            raise serializers.ValidationError(
+                {'incident_id': f"Incident with id: {self.context.get('incident_id')} "
+                                f"is not at Created state"})
+
+        self._validate_resource_exists_and_is_active()
+
+    def _record_live_state_on_commit(self, **state):
+        """
+        Applies the stored points to the live state of the incident (see incident.live_state) once committed,
+        so WebSocket subscribers connecting later get them in their snapshot. Skipped when the context sets
+        record_live_state to False, as WebSocket consumers do: they record the points along with their broadcast.
+        """
+        if not self.context.get('record_live_state', True):
+            return
+        incident_id = self.context.get('incident_id')
+        transaction.on_commit(lambda: IncidentLiveState(incident_id).record(**state))
+
 
 class MapPointSerializer(BasePointSerializer):
     location = GeometryField()
@@ -56,13 +131,19 @@ class MapPointSerializer(BasePointSerializer):
     def create(self, validated_data):
         map_point = MapPoint()
         map_point.incident_id = self.context.get('incident_id')
-        map_point.incident_resource = IncidentResource.objects.get(
-            incident_id=self.context.get('incident_id'),
-            resource_id=self.context.get('resource_id'))
+        map_point.incident_resource_id = self.get_ingestion_authorization().incident_resource_id
         map_point.description_text = validated_data.get('comment')
         map_point.location = validated_data.get('location')
         map_point.time_created = validated_data.get('time_created')
         map_point.save()
+        transaction.on_commit(lambda: bump_incident_points_version(map_point.incident_id))
+        self._record_live_state_on_commit(map_point={
+            'location': GeometryField().to_representation(map_point.location),
+            'collected_at': map_point.time_created.isoformat(),
+            'internal_type': 'MapPoint',  # We use this field for future usage on WS
+            'resource': get_cached_resource_representation(self.context.get('resource_id')),
+            'comment': map_point.description_text
+        })
         return map_point
 
     def to_representation(self, instance: MapPoint):
@@ -70,7 +151,7 @@ class MapPointSerializer(BasePointSerializer):
             'location': GeometryField().to_representation(instance.location),
             'collected_at': instance.time_created.isoformat(),
             'internal_type': 'MapPoint',  # We use this field for future usage on WS
-            'resource': ListRetrieveResourceProfileSerializer().to_representation(instance.incident_resource.resource),
+            'resource': self.get_resource_representation(instance.incident_resource.resource),
             'comment': instance.description_text
         }
 
@@ -85,59 +166,94 @@ class TrackPointSerializer(BasePointSerializer):
         self._validate_incident_resource_already_created()
         return data
 
-    def _check_if_track_point_already_created(self, incident_id, resource_id, time_created):
-        track_points = TrackPoint.objects.filter(time_created=time_created, incident_id=incident_id,
-                                                 incident_resource_id=resource_id)
-        if track_points.count():
-            return True
-        return False
-
-    def create(self, validated_data):
+    def _build_track_point(self, validated_data) -> TrackPoint:
         track_point = TrackPoint()
         track_point.incident_id = self.context.get('incident_id')
-        track_point.incident_resource = IncidentResource.objects.get(
-            incident_id=self.context.get('incident_id'),
-            resource_id=self.context.get('resource_id'))
+        track_point.incident_resource_id = self.get_ingestion_authorization().incident_resource_id
         track_point.location = validated_data.get('location')
         track_point.time_created = validated_data.get('time_created')
-        track_point.save()
         return track_point
 
+    def _recommend_reporting_interval(self, track_point: TrackPoint):
+        self.reporting_interval_seconds = ReportingIntervalAdvisor(
+            track_point.incident_id, track_point.incident_resource_id).recommend([track_point])
+
+    def create(self, validated_data):
+        track_point = self._build_track_point(validated_data)
+        self._recommend_reporting_interval(track_point)
+        self.is_filtered = not TrackPointJitterFilter().filter([track_point])
+        if self.is_filtered:
+            self.is_duplicated = False
+            return track_point
+        inserted_track_points = TrackPoint.objects.insert_ignoring_duplicates([track_point])
+        self.is_duplicated = not inserted_track_points
+        geofence_evaluator.evaluate(inserted_track_points)
+        if inserted_track_points:
+            self._record_live_state_on_commit(
+                track_point=get_cached_track_point_representation(track_point, self.context.get('resource_id')))
+        return track_point
+
+    def buffer(self) -> Optional[dict]:
+        """
+        Appends the validated track point to the incident stream instead of storing it, see
+        geolocation.streams. Returns its representation, built without querying the database, or None if
+        the jitter filter dropped it.
+        """
+        track_point = self._build_track_point(self.validated_data)
+        self._recommend_reporting_interval(track_point)
+        if not TrackPointJitterFilter().filter([track_point]):
+            return None
+        TrackPointStreamBuffer().append(track_point)
+        return get_cached_track_point_representation(track_point, self.context.get('resource_id'))
+
     def to_representation(self, instance: TrackPoint):
         return {
             'location': GeometryField().to_representation(instance.location),
             'collected_at': instance.time_created.isoformat(),
             'internal_type': 'TrackPoint',  # We use this field for future usage on WS
-            'resource': ListRetrieveResourceProfileSerializer().to_representation(instance.incident_resource.resource),
+            'resource': self.get_resource_representation(instance.incident_resource.resource),
         }
 
 
-class TrackPointCreateIncidentResourceSerializer(TrackPointSerializer):
+class LenientListSerializer(serializers.ListSerializer):
+    """
+    List serializer that drops invalid items instead of failing the whole list, as mobile clients
+    upload buffered batches where a single malformed point should not discard the rest
+    """
 
-    def validate(self, data):
-        try:
-            Incident.objects.get(id=self.context.get('incident_id'))
-        except Incident.DoesNotExist:
-            raise serializers.ValidationError(
-                {'incident_id': f"Incident with id: {self.context.get('incident_id')} does not exist"})
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
 
-        try:
-            resource = ResourceProfile.objects.get(id=self.context.get('resource_id'))
-        except ResourceProfile.DoesNotExist:
-            raise serializers.ValidationError(
-                {'resource_id': f"Resource with id: {self.context.get('resource_id')} does not exist"})
+        accepted_items = []
+        for item in data:
+            try:
+                accepted_items.append(self.child.run_validation(item))
+            except serializers.ValidationError:
+                continue
+        return accepted_items
 
-        if not resource.user.is_active:
-            raise serializers.ValidationError(
-                {'resource_id': f"User related to Resource with id: "
-                                f"{self.context.get('resource_id')} is not active"})
-        return data
+
+class TrackPointDataSerializer(serializers.Serializer):
+    location = GeometryField()
+    time_created = serializers.DateTimeField()
+
+    class Meta:
+        list_serializer_class = LenientListSerializer
 
 
 class TrackPointListSerializer(BasePointSerializer):
-    track_points = TrackPointCreateIncidentResourceSerializer(many=True)
+    track_points = TrackPointDataSerializer(many=True)
+
+    def _validate_incident_and_resource_exist(self):
+        self._validate_incident_exists()
+        self._validate_resource_exists_and_is_active()
 
     def validate(self, data):
+        # Incident and resource are shared by the whole batch, so they are validated once
+        self._validate_incident_and_resource_exist()
+        received_track_points = self.initial_data.get('track_points') or []
+        self.rejected_track_points_quantity = len(received_track_points) - len(data.get('track_points', []))
         return data
 
     def to_representation(self, instance: TrackPoint):
@@ -145,21 +261,55 @@ class TrackPointListSerializer(BasePointSerializer):
             'location': GeometryField().to_representation(instance.location),
             'collected_at': instance.time_created.isoformat(),
             'internal_type': 'TrackPoint',  # We use this field for future usage on WS
-            'resource': ListRetrieveResourceProfileSerializer().to_representation(instance.incident_resource.resource),
+            'resource': self.get_resource_representation(instance.incident_resource.resource),
         }
 
     def create(self, validated_data):
         track_points = validated_data.pop('track_points', [])
-        track_point_instances = []
-        for serialized_track_point in track_points:
-            track_point = TrackPoint()
-            track_point.incident_id = self.context.get('incident_id')
-            track_point.incident_resource = IncidentResource.objects.get_or_create(
-                incident_id=self.context.get('incident_id'),
-                resource_id=self.context.get('resource_id'))[0]
-            track_point.location = serialized_track_point.get('location')
-            track_point.time_created = serialized_track_point.get('time_created')
-            track_point.save()
-            track_point_instances.append(track_point)
-
-        return track_point_instances
+        with transaction.atomic():
+            incident_resource_id = self.get_ingestion_authorization().incident_resource_id
+            if incident_resource_id is None:
+                incident_resource_id = IncidentResource.objects.get_or_create(
+                    incident_id=self.context.get('incident_id'),
+                    resource_id=self.context.get('resource_id'))[0].id
+            track_point_instances = [
+                TrackPoint(incident_id=self.context.get('incident_id'),
+                           incident_resource_id=incident_resource_id,
+                           location=serialized_track_point.get('location'),
+                           time_created=serialized_track_point.get('time_created'))
+                for serialized_track_point in track_points
+            ]
+            self.reporting_interval_seconds = ReportingIntervalAdvisor(
+                self.context.get('incident_id'), incident_resource_id).recommend(track_point_instances)
+            accepted_track_points = TrackPointJitterFilter().filter(track_point_instances)
+            inserted_track_points = TrackPoint.objects.insert_ignoring_duplicates(accepted_track_points)
+            geofence_evaluator.evaluate(inserted_track_points)
+            if inserted_track_points:
+                self._record_live_state_on_commit(track_points=[
+                    get_cached_track_point_representation(track_point, self.context.get('resource_id'))
+                    for track_point in inserted_track_points])
+
+        self.filtered_track_points_quantity = len(track_point_instances) - len(accepted_track_points)
+        self.duplicated_track_points_quantity = len(accepted_track_points) - len(inserted_track_points)
+        return inserted_track_points
+
+
+class SimplifiedTrackSerializer(ResourceRepresentationMixin, serializers.Serializer):
+    def to_representation(self, instance: SimplifiedTrack):
+        return {
+            'location': GeometryField().to_representation(instance.line),
+            'zoom_level': instance.zoom_level,
+            'points_quantity': instance.points_quantity,
+            'internal_type': 'SimplifiedTrack',
+            'resource': self.get_resource_representation(instance.incident_resource.resource),
+        }
+
+
+class ResourceLastPositionSerializer(ResourceRepresentationMixin, serializers.Serializer):
+    def to_representation(self, instance: ResourceLastPosition):
+        return {
+            'location': GeometryField().to_representation(instance.location),
+            'collected_at': instance.time_created.isoformat(),
+            'internal_type': 'ResourceLastPosition',
+            'resource': self.get_resource_representation(instance.incident_resource.resource),
+        }
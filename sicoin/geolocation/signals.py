@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from sicoin.geolocation import authorization, serializers
+from sicoin.incident.models import Incident, IncidentResource
+from sicoin.users.models import ResourceProfile, User
+
+
+def invalidate_ingestion_authorization(**kwargs):
+    # After the commit, or a concurrent ingestion could cache the rows being replaced again
+    transaction.on_commit(lambda: authorization.invalidate_ingestion_authorization(**kwargs))
+
+
+@receiver(post_save, sender=Incident)
+@receiver(post_delete, sender=Incident)
+def invalidate_incident_ingestion_authorization(sender, instance, **kwargs):
+    invalidate_ingestion_authorization(incident_id=instance.id)
+
+
+@receiver(post_save, sender=IncidentResource)
+@receiver(post_delete, sender=IncidentResource)
+def invalidate_incident_resource_ingestion_authorization(sender, instance, **kwargs):
+    invalidate_ingestion_authorization(incident_id=instance.incident_id, resource_id=instance.resource_id)
+
+
+@receiver(post_save, sender=ResourceProfile)
+@receiver(post_delete, sender=ResourceProfile)
+def invalidate_resource_ingestion_authorization(sender, instance, **kwargs):
+    invalidate_ingestion_authorization(resource_id=instance.id)
+    transaction.on_commit(lambda: serializers.invalidate_cached_resource_representation(instance.id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_ingestion_authorization(sender, instance, created=False, **kwargs):
+    # Activation and deactivation of resource users, also part of their representation
+    if not created:
+        for resource_id in ResourceProfile.objects.filter(user=instance).values_list('id', flat=True):
+            invalidate_ingestion_authorization(resource_id=resource_id)
+            transaction.on_commit(
+                lambda resource_id=resource_id: serializers.invalidate_cached_resource_representation(resource_id))
@@ -0,0 +1,81 @@
+import math
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import connection, transaction
+
+from sicoin.geolocation.models import SimplifiedTrack, TrackPoint
+from sicoin.incident.models import Incident
+
+TILE_SIZE_IN_PIXELS = 256
+
+
+class SimplifiedLine(NamedTuple):
+    incident_resource_id: int
+    line: GEOSGeometry
+    points_quantity: int
+
+
+def get_tolerance_for_zoom_level(zoom_level: float) -> float:
+    """Degrees covered by TRACK_SIMPLIFICATION_TOLERANCE_PIXELS pixels at the given web map zoom level"""
+    degrees_per_pixel = 360 / (TILE_SIZE_IN_PIXELS * 2 ** zoom_level)
+    return degrees_per_pixel * settings.TRACK_SIMPLIFICATION_TOLERANCE_PIXELS
+
+
+def get_zoom_level_for_tolerance(tolerance: float) -> float:
+    return math.log2(360 * settings.TRACK_SIMPLIFICATION_TOLERANCE_PIXELS / (TILE_SIZE_IN_PIXELS * tolerance))
+
+
+class TrackSimplifier:
+    """
+    Reduces the track of every resource of an incident to a Douglas-Peucker simplified polyline (ST_Simplify),
+    computed by the database so only the reduced lines leave it
+    """
+
+    def __init__(self, incident: Incident):
+        self.incident = incident
+
+    def simplify(self, tolerance: float, track_points_queryset=None) -> List[SimplifiedLine]:
+        if track_points_queryset is None:
+            track_points_queryset = TrackPoint.objects.filter(incident=self.incident)
+        points_query = track_points_queryset.order_by().values(
+            'id', 'incident_resource_id', 'location', 'time_created').query
+        # Compiled as a subquery so the location is selected as a geometry and not cast for Python
+        points_query.subquery = True
+        points_sql, points_params = points_query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT points.incident_resource_id, '
+                           f'ST_AsEWKB(ST_Simplify(ST_MakeLine(points.location ORDER BY points.time_created, '
+                           f'points.id), %s)), COUNT(*) '
+                           f'FROM ({points_sql}) points '
+                           f'GROUP BY points.incident_resource_id '
+                           f'HAVING COUNT(*) > 1', [tolerance, *points_params])
+            # Tracks collapsed by the simplification (e.g. a resource that never moved) come back as NULL
+            return [SimplifiedLine(incident_resource_id, GEOSGeometry(bytes(line)), points_quantity)
+                    for incident_resource_id, line, points_quantity in cursor.fetchall() if line is not None]
+
+    def store_simplified_tracks(self) -> List[SimplifiedTrack]:
+        simplified_tracks = []
+        for zoom_level in settings.TRACK_SIMPLIFICATION_ZOOM_LEVELS:
+            for simplified_line in self.simplify(get_tolerance_for_zoom_level(zoom_level)):
+                simplified_tracks.append(SimplifiedTrack(incident_resource_id=simplified_line.incident_resource_id,
+                                                         zoom_level=zoom_level,
+                                                         line=simplified_line.line,
+                                                         points_quantity=simplified_line.points_quantity))
+        with transaction.atomic():
+            SimplifiedTrack.objects.filter(incident_resource__incident=self.incident).delete()
+            SimplifiedTrack.objects.bulk_create(simplified_tracks)
+        return simplified_tracks
+
+    @staticmethod
+    def get_stored_zoom_level(zoom_level: float) -> Optional[int]:
+        """The coarsest stored level still detailed enough for the requested zoom, or the finest one"""
+        stored_zoom_levels = sorted(settings.TRACK_SIMPLIFICATION_ZOOM_LEVELS)
+        if not stored_zoom_levels:
+            return None
+        for stored_zoom_level in stored_zoom_levels:
+            if stored_zoom_level >= zoom_level:
+                return stored_zoom_level
+        return stored_zoom_levels[-1]
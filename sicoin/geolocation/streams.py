@@ -0,0 +1,208 @@
+import logging
+from typing import List, Tuple
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import DatabaseError, transaction
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from sicoin.geolocation.geofence import geofence_evaluator
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.models import Incident
+
+STREAM_KEY_PREFIX = 'track_points_stream'
+# Set holding the key of every stream that may have entries left to drain
+STREAM_KEYS_KEY = 'track_points_streams'
+CONSUMER_GROUP = 'track_points_drain'
+# Entries that could not be stored after TRACK_POINTS_STREAM_MAX_DELIVERIES attempts, of every incident
+DEAD_LETTERS_STREAM_KEY = 'track_points_stream_dead_letters'
+
+REMOVE_EMPTY_STREAM_SCRIPT = """
+if redis.call('XLEN', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[1])
+    redis.call('SREM', KEYS[2], KEYS[1])
+end
+"""
+
+
+class TrackPointsStillBuffered(Exception):
+    pass
+
+
+def get_stream_key(incident_id) -> str:
+    return f'{STREAM_KEY_PREFIX}:{incident_id}'
+
+
+class TrackPointStreamBuffer:
+    """
+    Write behind buffer for track points received by WebSocket: validated points are appended to a Redis
+    Stream per incident and stored later, in batches, by TrackPointStreamDrainer
+    """
+
+    _streams_with_group = set()
+
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+
+    def _ensure_consumer_group(self, stream_key: str):
+        if stream_key in self._streams_with_group:
+            return
+        try:
+            self.redis.xgroup_create(stream_key, CONSUMER_GROUP, id='0', mkstream=True)
+        except ResponseError as error:
+            if 'BUSYGROUP' not in str(error):
+                raise
+        self._streams_with_group.add(stream_key)
+
+    def append(self, track_point: TrackPoint) -> str:
+        stream_key = get_stream_key(track_point.incident_id)
+        self._ensure_consumer_group(stream_key)
+        entry_id = self.redis.xadd(stream_key, {
+            'incident_id': track_point.incident_id,
+            'incident_resource_id': track_point.incident_resource_id,
+            'location': track_point.location.ewkt,
+            'time_created': track_point.time_created.isoformat(),
+        })
+        self.redis.sadd(STREAM_KEYS_KEY, stream_key)
+        return entry_id
+
+
+class TrackPointStreamDrainer:
+    """
+    Stores the buffered track points with consumer group semantics: entries are acknowledged (and deleted)
+    only after their batch is inserted, and entries left pending by a dead consumer for longer than
+    TRACK_POINTS_STREAM_CLAIM_IDLE_MS are claimed and stored again. Insertion ignores duplicates, so a batch
+    stored twice because its consumer died before acknowledging it is harmless.
+    A batch that fails is stored entry by entry, so an entry that can never be stored (e.g. of a deleted
+    incident resource) does not hold back the others. It is left pending, and moved to the dead letters
+    stream once delivered TRACK_POINTS_STREAM_MAX_DELIVERIES times.
+    """
+
+    def __init__(self, consumer_name: str):
+        self.consumer_name = consumer_name
+        self.redis = get_redis_connection('default')
+
+    @staticmethod
+    def _to_track_point(fields: dict) -> TrackPoint:
+        fields = {key.decode(): value.decode() for key, value in fields.items()}
+        return TrackPoint(incident_id=int(fields['incident_id']),
+                          incident_resource_id=int(fields['incident_resource_id']),
+                          location=GEOSGeometry(fields['location']),
+                          time_created=parse_datetime(fields['time_created']))
+
+    def _move_to_dead_letters(self, stream_key: str, entries: List[Tuple[bytes, dict]], deliveries: dict):
+        pipeline = self.redis.pipeline(transaction=True)
+        for entry_id, fields in entries:
+            if fields:
+                pipeline.xadd(DEAD_LETTERS_STREAM_KEY,
+                              {**fields, 'stream_key': stream_key, 'entry_id': entry_id,
+                               'deliveries': deliveries[entry_id]},
+                              maxlen=settings.TRACK_POINTS_STREAM_DEAD_LETTERS_MAX_LENGTH, approximate=True)
+        entry_ids = [entry_id for entry_id, _ in entries]
+        pipeline.xack(stream_key, CONSUMER_GROUP, *entry_ids)
+        pipeline.xdel(stream_key, *entry_ids)
+        pipeline.execute()
+        logging.warning(f'Moved {len(entries)} entries of {stream_key} to {DEAD_LETTERS_STREAM_KEY}')
+
+    def _claim_stale_entries(self, stream_key: str) -> List[Tuple[bytes, dict]]:
+        # XPENDING extended form, redis-py signatures for it changed between releases
+        pending_entries = self.redis.execute_command('XPENDING', stream_key, CONSUMER_GROUP, '-', '+',
+                                                     settings.TRACK_POINTS_STREAM_BATCH_SIZE)
+        stale_entries_deliveries = {entry_id: deliveries
+                                    for entry_id, _consumer, idle_milliseconds, deliveries in pending_entries
+                                    if idle_milliseconds >= settings.TRACK_POINTS_STREAM_CLAIM_IDLE_MS}
+        if not stale_entries_deliveries:
+            return []
+        claimed_entries = self.redis.xclaim(stream_key, CONSUMER_GROUP, self.consumer_name,
+                                            settings.TRACK_POINTS_STREAM_CLAIM_IDLE_MS,
+                                            list(stale_entries_deliveries))
+
+        entries, dead_entries = [], []
+        for entry_id, fields in claimed_entries:
+            if stale_entries_deliveries.get(entry_id, 0) >= settings.TRACK_POINTS_STREAM_MAX_DELIVERIES:
+                dead_entries.append((entry_id, fields))
+            else:
+                entries.append((entry_id, fields))
+        if dead_entries:
+            self._move_to_dead_letters(stream_key, dead_entries, stale_entries_deliveries)
+        return entries
+
+    def _read_new_entries(self, stream_key: str) -> List[Tuple[bytes, dict]]:
+        try:
+            streams = self.redis.xreadgroup(CONSUMER_GROUP, self.consumer_name, {stream_key: '>'},
+                                            count=settings.TRACK_POINTS_STREAM_BATCH_SIZE)
+        except ResponseError as error:
+            if 'NOGROUP' not in str(error):
+                raise
+            # Stream removed once drained and created again by a late append, without the group
+            self.redis.xgroup_create(stream_key, CONSUMER_GROUP, id='0', mkstream=True)
+            return []
+        return streams[0][1] if streams else []
+
+    def _insert_entries(self, stream_key: str, entries: List[Tuple[bytes, dict]]):
+        with transaction.atomic():
+            inserted_track_points = TrackPoint.objects.insert_ignoring_duplicates(
+                [self._to_track_point(fields) for _, fields in entries])
+            geofence_evaluator.evaluate(inserted_track_points)
+        entry_ids = [entry_id for entry_id, _ in entries]
+        self.redis.xack(stream_key, CONSUMER_GROUP, *entry_ids)
+        self.redis.xdel(stream_key, *entry_ids)
+
+    def _store_entries(self, stream_key: str, entries: List[Tuple[bytes, dict]]) -> int:
+        # Claimed entries already deleted by another consumer come back without fields
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries:
+            return 0
+        try:
+            self._insert_entries(stream_key, entries)
+            return len(entries)
+        except (DatabaseError, ValueError):
+            if len(entries) == 1:
+                logging.exception(f'Error storing entry {entries[0][0]} of {stream_key}, left pending')
+                return 0
+            logging.exception(f'Error storing a batch of {stream_key}, storing its entries one by one')
+        return sum(self._store_entries(stream_key, [entry]) for entry in entries)
+
+    def _remove_if_finished(self, stream_key: str):
+        """Streams of incidents no longer started will not grow, they are removed once empty"""
+        incident_id = stream_key.split(':', 1)[1]
+        if Incident.objects.filter(id=incident_id, status=Incident.INCIDENT_STATUS_STARTED).exists():
+            return
+        # Atomic, so an entry appended meanwhile is never deleted along with the stream
+        self.redis.eval(REMOVE_EMPTY_STREAM_SCRIPT, 2, stream_key, STREAM_KEYS_KEY)
+
+    def drain_stream(self, stream_key: str) -> int:
+        stored_quantity = self._store_entries(stream_key, self._claim_stale_entries(stream_key))
+        while True:
+            entries = self._read_new_entries(stream_key)
+            if not entries:
+                break
+            stored_quantity += self._store_entries(stream_key, entries)
+        self._remove_if_finished(stream_key)
+        return stored_quantity
+
+    def drain_incident(self, incident_id) -> int:
+        """
+        Stores every point buffered for the incident, raises TrackPointsStillBuffered if some are left: pending
+        on another drain worker, or failing until moved to the dead letters
+        """
+        stream_key = get_stream_key(incident_id)
+        if not self.redis.exists(stream_key):
+            return 0
+        stored_quantity = self.drain_stream(stream_key)
+        if self.redis.xlen(stream_key):
+            raise TrackPointsStillBuffered(f'Track points of incident {incident_id} are still buffered')
+        return stored_quantity
+
+    def drain(self) -> int:
+        stored_quantity = 0
+        for stream_key in self.redis.smembers(STREAM_KEYS_KEY):
+            stream_key = stream_key.decode()
+            try:
+                stored_quantity += self.drain_stream(stream_key)
+            except Exception:
+                # A failing stream must not stop the others, its entries stay pending to be claimed later
+                logging.exception(f'Error draining {stream_key}')
+        return stored_quantity
@@ -0,0 +1,65 @@
+import os
+import socket
+
+from django.conf import settings
+
+from sicoin.celery import app
+from sicoin.geolocation.analytics import MovementStatsCalculator
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.geolocation.partitions import PointPartitionManager
+from sicoin.geolocation.simplification import TrackSimplifier
+from sicoin.geolocation.streams import TrackPointStreamDrainer, TrackPointsStillBuffered
+from sicoin.geolocation.trajectories import TrajectoryCompactor
+from sicoin.incident.models import Incident
+
+
+@app.task(bind=True)
+def manage_point_partitions(self):
+    for model in (TrackPoint, MapPoint):
+        partition_manager = PointPartitionManager(model._meta.db_table)
+        partition_manager.create_future_partitions(settings.POINT_PARTITIONS_MONTHS_AHEAD)
+        if settings.POINT_PARTITIONS_RETENTION_MONTHS is not None:
+            partition_manager.expire_partitions(settings.POINT_PARTITIONS_RETENTION_MONTHS,
+                                                drop=settings.POINT_PARTITIONS_DROP_EXPIRED)
+        print(f'Successfully managed partitions of {model._meta.db_table}')
+
+
+@app.task(bind=True)
+def store_simplified_incident_tracks(self, incident_id):
+    incident = Incident.objects.get(id=incident_id)
+    simplified_tracks = TrackSimplifier(incident).store_simplified_tracks()
+    print(f'Stored {len(simplified_tracks)} simplified tracks for incident {incident_id}')
+
+
+def get_drain_consumer_name() -> str:
+    return f'celery-{socket.gethostname()}-{os.getpid()}'
+
+
+@app.task(bind=True)
+def drain_track_points_streams(self):
+    stored_quantity = TrackPointStreamDrainer(get_drain_consumer_name()).drain()
+    print(f'Stored {stored_quantity} buffered track points')
+
+
+@app.task(bind=True, max_retries=settings.TRACK_POINTS_STREAM_MAX_DELIVERIES + 1)
+def drain_incident_track_points(self, incident_id):
+    try:
+        stored_quantity = TrackPointStreamDrainer(get_drain_consumer_name()).drain_incident(incident_id)
+    except TrackPointsStillBuffered as still_buffered:
+        # Left pending entries are claimed (or moved to the dead letters) once idle for this long
+        raise self.retry(exc=still_buffered, countdown=settings.TRACK_POINTS_STREAM_CLAIM_IDLE_MS / 1000)
+    print(f'Stored {stored_quantity} buffered track points for incident {incident_id}')
+
+
+@app.task(bind=True)
+def compact_incident_trajectories(self, incident_id):
+    incident = Incident.objects.get(id=incident_id)
+    compacted_trajectories = TrajectoryCompactor(incident).compact()
+    print(f'Compacted {len(compacted_trajectories)} trajectories for incident {incident_id}')
+
+
+@app.task(bind=True)
+def store_incident_movement_stats(self, incident_id):
+    incident = Incident.objects.get(id=incident_id)
+    movement_stats = MovementStatsCalculator(incident).store()
+    print(f'Stored movement stats of {len(movement_stats)} resources for incident {incident_id}')
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from nose.tools import eq_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.analytics import MovementStatsCalculator
+from sicoin.geolocation.authorization import invalidate_ingestion_authorization
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+METERS_BY_LATITUDE_DEGREE = 111195.08
+
+
+@override_settings(INCIDENT_SCENE_RADIUS_METERS=50, MOVEMENT_STATS_MAX_GAP_SECONDS=60, MOVEMENT_STATS_IDLE_SPEED=0.5)
+class TestMovementStatsCalculator(TestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        self.idle_incident_resource = IncidentResourceFactory(incident=self.incident)
+        now = timezone.now()
+        center = self.incident.location_point
+        # Stored as Point(lat, lng). Idle on scene for 10 seconds, 200 meters north at 10 meters per second,
+        # then a device not reporting
+        TrackPoint.objects.bulk_create([
+            TrackPoint(incident=self.incident, incident_resource=self.incident_resource,
+                       location=Point(center.y + meters / METERS_BY_LATITUDE_DEGREE, center.x),
+                       time_created=now + timedelta(seconds=seconds))
+            for meters, seconds in [(0, 0), (0, 10), (100, 20), (200, 30), (200, 130)]
+        ])
+
+    def _round(self, movement_stats):
+        return {key: round(value, 1) if isinstance(value, float) else value for key, value in movement_stats.items()}
+
+    def test_calculated_per_resource(self):
+        movement_stats = MovementStatsCalculator(self.incident).calculate()
+
+        eq_(list(movement_stats.keys()), [self.incident_resource.id])
+        movement_stats = movement_stats[self.incident_resource.id]
+        eq_((movement_stats['points_quantity'], movement_stats['tracked_seconds']), (5, 130))
+        self.assertAlmostEqual(movement_stats['distance_meters'], 200, delta=1)
+        self.assertAlmostEqual(movement_stats['average_speed'], 200 / 130, delta=0.01)
+        self.assertAlmostEqual(movement_stats['max_speed'], 10, delta=0.1)
+
+    def test_gaps_without_idle_or_on_scene_time(self):
+        movement_stats = MovementStatsCalculator(self.incident).calculate()[self.incident_resource.id]
+
+        eq_((movement_stats['idle_seconds'], movement_stats['on_scene_seconds']), (10, 10))
+
+    def test_single_fix(self):
+        TrackPoint.objects.create(incident=self.incident, incident_resource=self.idle_incident_resource,
+                                  location=self.incident.location_point, time_created=timezone.now())
+
+        movement_stats = MovementStatsCalculator(self.incident).calculate()[self.idle_incident_resource.id]
+
+        eq_(movement_stats, {'points_quantity': 1, 'tracked_seconds': 0, 'distance_meters': 0, 'average_speed': None,
+                             'max_speed': None, 'idle_seconds': 0, 'on_scene_seconds': 0})
+
+    def test_stored(self):
+        movement_stats = MovementStatsCalculator(self.incident).store()
+
+        self.incident_resource.refresh_from_db()
+        self.idle_incident_resource.refresh_from_db()
+        eq_(self._round(self.incident_resource.movement_stats), self._round(movement_stats[self.incident_resource.id]))
+        eq_(self.idle_incident_resource.movement_stats, {})
+
+
+@override_settings(INCIDENT_SCENE_RADIUS_METERS=50, MOVEMENT_STATS_MAX_GAP_SECONDS=60, MOVEMENT_STATS_IDLE_SPEED=0.5)
+class TestMovementStatsOfUploadedTrackPoints(APITestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        # Cached checks are only invalidated once committed, never within a test case
+        invalidate_ingestion_authorization(incident_id=self.incident.id)
+
+    def test_calculated_from_uploaded_coordinates(self):
+        """Uploaded as clients send them, [lat, lng]: from 200 meters north of the incident to its location"""
+        center = self.incident.location_point
+        response = self.client.post(
+            f'/api/v1/incidents/{self.incident.id}/resources/{self.incident_resource.resource_id}/track-points/',
+            {'track_points': [{'location': {'type': 'Point',
+                                            'coordinates': [center.y + meters / METERS_BY_LATITUDE_DEGREE, center.x]},
+                               'time_created': f'2021-03-24T22:12:{seconds:02d}Z'}
+                              for meters, seconds in [(200, 0), (100, 10), (0, 20), (0, 30)]]}, format='json')
+        eq_(response.status_code, status.HTTP_200_OK)
+
+        movement_stats = MovementStatsCalculator(self.incident).calculate()[self.incident_resource.id]
+
+        self.assertAlmostEqual(movement_stats['distance_meters'], 200, delta=1)
+        eq_((movement_stats['idle_seconds'], movement_stats['on_scene_seconds']), (10, 20))
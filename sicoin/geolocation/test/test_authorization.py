@@ -0,0 +1,71 @@
+from django.test import TransactionTestCase
+from nose.tools import eq_
+
+from sicoin.geolocation.authorization import get_ingestion_authorization, invalidate_ingestion_authorization
+from sicoin.incident.models import Incident, IncidentResource
+from sicoin.incident.test.factories import IncidentFactory, IncidentResourceFactory, ResourceProfileFactory
+
+
+class TestIngestionAuthorization(TransactionTestCase):
+    """
+    Invalidation follows commits, every write commits on its own here
+    """
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident_id = self.incident_resource.incident_id
+        self.resource_id = self.incident_resource.resource_id
+        invalidate_ingestion_authorization(incident_id=self.incident_id)
+
+    def test_checks(self):
+        authorization = get_ingestion_authorization(self.incident_id, self.resource_id)
+
+        eq_(authorization, (Incident.INCIDENT_STATUS_STARTED, True, self.incident_resource.id))
+        eq_((authorization.incident_exists, authorization.resource_exists), (True, True))
+
+    def test_missing_rows(self):
+        authorization = get_ingestion_authorization(999999, 999999)
+
+        eq_(authorization, (None, None, None))
+        eq_((authorization.incident_exists, authorization.resource_exists), (False, False))
+
+    def test_cached(self):
+        get_ingestion_authorization(self.incident_id, self.resource_id)
+
+        with self.assertNumQueries(0):
+            get_ingestion_authorization(self.incident_id, self.resource_id)
+
+    def test_invalidated_by_incident_status(self):
+        get_ingestion_authorization(self.incident_id, self.resource_id)
+        incident = Incident.objects.get(id=self.incident_id)
+        incident.status = Incident.INCIDENT_STATUS_FINALIZED
+        incident.save()
+
+        eq_(get_ingestion_authorization(self.incident_id, self.resource_id).incident_status,
+            Incident.INCIDENT_STATUS_FINALIZED)
+
+    def test_invalidated_by_user_deactivation(self):
+        get_ingestion_authorization(self.incident_id, self.resource_id)
+        user = self.incident_resource.resource.user
+        user.is_active = False
+        user.save()
+
+        eq_(get_ingestion_authorization(self.incident_id, self.resource_id).user_is_active, False)
+
+    def test_invalidated_by_resource_joining_incident(self):
+        incident = IncidentFactory(domain_config=self.incident_resource.incident.domain_config)
+        eq_(get_ingestion_authorization(incident.id, self.resource_id).incident_resource_id, None)
+
+        incident_resource = IncidentResource.objects.create(incident=incident, resource_id=self.resource_id)
+
+        eq_(get_ingestion_authorization(incident.id, self.resource_id).incident_resource_id, incident_resource.id)
+
+    def test_other_resources_kept(self):
+        other_resource = ResourceProfileFactory(domain=self.incident_resource.incident.domain_config)
+        get_ingestion_authorization(self.incident_id, other_resource.id)
+        get_ingestion_authorization(self.incident_id, self.resource_id)
+
+        invalidate_ingestion_authorization(resource_id=other_resource.id)
+
+        with self.assertNumQueries(0):
+            get_ingestion_authorization(self.incident_id, self.resource_id)
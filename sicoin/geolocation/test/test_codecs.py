@@ -0,0 +1,90 @@
+import json
+
+from django.test import SimpleTestCase
+from nose.tools import eq_, ok_, raises
+
+from sicoin.geolocation.codecs import BINARY_ALIGNMENT, BINARY_PREAMBLE, TRACK_POINTS_FRAME_POINT, \
+    TRAJECTORY_PREAMBLE, CompactPoints, decode_track_points_frame, decode_trajectory, encode_track_points_frame, \
+    encode_trajectory
+
+
+class TestCompactPoints(SimpleTestCase):
+
+    def setUp(self):
+        self.compact_points = CompactPoints(resources=[{'id': 7}, {'id': 9}],
+                                            resource_index=[0, 1, 0],
+                                            lat=[-31.42, -31.4201, -31.4202],
+                                            lng=[-64.18, -64.1801, -64.1802],
+                                            collected_at=[1700000000000, 1700000001000, 1700000002000],
+                                            comments=None)
+
+    def test_binary_round_trip(self):
+        eq_(CompactPoints.from_binary(self.compact_points.to_binary()), self.compact_points)
+
+    def test_binary_round_trip_with_comments(self):
+        compact_points = self.compact_points._replace(comments=['Fire', 'Water', 'Smoke'])
+        eq_(CompactPoints.from_binary(compact_points.to_binary()), compact_points)
+
+    def test_binary_columns_are_aligned(self):
+        data = self.compact_points.to_binary()
+        _, _, header_length, _ = BINARY_PREAMBLE.unpack_from(data)
+
+        eq_((BINARY_PREAMBLE.size + header_length) % BINARY_ALIGNMENT, 0)
+
+    def test_json_omits_comments_of_track_points(self):
+        eq_(json.loads(self.compact_points.to_json()), {
+            'resources': [{'id': 7}, {'id': 9}],
+            'resource_index': [0, 1, 0],
+            'lat': [-31.42, -31.4201, -31.4202],
+            'lng': [-64.18, -64.1801, -64.1802],
+            'collected_at': [1700000000000, 1700000001000, 1700000002000],
+        })
+
+    @raises(ValueError)
+    def test_from_binary_rejects_other_payloads(self):
+        CompactPoints.from_binary(b'\x00' * BINARY_PREAMBLE.size)
+
+
+class TestTrajectoryCodec(SimpleTestCase):
+
+    def test_round_trip(self):
+        xs = [-64.1800001, -64.18005, -64.1799]
+        ys = [-31.4200001, -31.42002, -31.4199]
+        times = [1700000000000, 1700000001500, 1700000001400]
+
+        decoded_xs, decoded_ys, decoded_times = decode_trajectory(encode_trajectory(xs, ys, times))
+
+        eq_(decoded_times, times)
+        for decoded, original in zip(decoded_xs + decoded_ys, xs + ys):
+            ok_(abs(decoded - original) < 1e-7)
+
+    def test_empty_trajectory(self):
+        eq_(decode_trajectory(encode_trajectory([], [], [])), ([], [], []))
+
+    @raises(ValueError)
+    def test_decode_rejects_other_payloads(self):
+        decode_trajectory(b'\x00' * TRAJECTORY_PREAMBLE.size)
+
+
+class TestTrackPointsFrameCodec(SimpleTestCase):
+
+    def test_round_trip(self):
+        points = [(1, -31.42, -64.18, 1700000000000), (2, -31.4201, -64.1801, 1700000001500)]
+
+        frame = encode_track_points_frame(points)
+
+        eq_(list(decode_track_points_frame(frame)), points)
+
+    def test_empty_frame(self):
+        eq_(list(decode_track_points_frame(encode_track_points_frame([]))), [])
+
+    @raises(ValueError)
+    def test_decode_rejects_other_payloads(self):
+        decode_track_points_frame(b'SCTJ\x01')
+
+    @raises(ValueError)
+    def test_decode_rejects_truncated_frames(self):
+        decode_track_points_frame(encode_track_points_frame([(1, -31.42, -64.18, 1700000000000)])[:-1])
+
+    def test_point_record_width(self):
+        eq_(TRACK_POINTS_FRAME_POINT.size, 28)
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test import SimpleTestCase
+from django.utils import timezone
+from nose.tools import eq_, ok_, raises
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from sicoin.geolocation.cursors import InvalidPointsCursor, PointsCursor
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+class TestPointsCursorEncoding(SimpleTestCase):
+
+    def test_encode_decode(self):
+        cursor = PointsCursor('100:104:101,103')
+        eq_(PointsCursor.decode(cursor.encode()).snapshot, '100:104:101,103')
+        eq_(cursor.xmin, 100)
+
+    @raises(InvalidPointsCursor)
+    def test_decode_invalid_cursor(self):
+        PointsCursor.decode('not a cursor')
+
+    @raises(InvalidPointsCursor)
+    def test_decode_invalid_snapshot(self):
+        PointsCursor.decode(PointsCursor('100:104:a').encode())
+
+
+class TestPointsCursorPolling(APITransactionTestCase):
+    """
+    Every insert commits on its own, as the cursor follows committed transactions.
+    """
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.url = f'/api/v1/incidents/{self.incident_resource.incident_id}/track-points/'
+        self.now = timezone.now().replace(microsecond=0)
+
+    def _create_track_point(self, time_created):
+        return TrackPoint.objects.create(incident=self.incident_resource.incident,
+                                         incident_resource=self.incident_resource,
+                                         location=Point(-31.42, -64.18), time_created=time_created)
+
+    def _poll(self, since=None):
+        response = self.client.get(self.url, {'since': since} if since else {})
+        eq_(response.status_code, status.HTTP_200_OK)
+        return [point['collected_at'] for point in response.json()], response['X-Points-Cursor']
+
+    def test_poll_lists_only_points_stored_after_the_cursor(self):
+        self._create_track_point(self.now - timedelta(seconds=20))
+        collected_at, cursor = self._poll()
+        eq_(len(collected_at), 1)
+
+        self._create_track_point(self.now - timedelta(seconds=10))
+        collected_at, cursor = self._poll(cursor)
+        eq_(collected_at, [(self.now - timedelta(seconds=10)).isoformat()])
+
+        collected_at, _ = self._poll(cursor)
+        eq_(collected_at, [])
+
+    def test_poll_lists_late_fixes(self):
+        self._create_track_point(self.now)
+        _, cursor = self._poll()
+
+        # Buffered fixes of a device coming back online, older than the ones already listed
+        self._create_track_point(self.now - timedelta(hours=2))
+        collected_at, _ = self._poll(cursor)
+
+        eq_(collected_at, [(self.now - timedelta(hours=2)).isoformat()])
+
+    def test_poll_lists_points_committed_after_newer_ones(self):
+        other_connection = connection.copy()
+        try:
+            other_connection.set_autocommit(False)
+            with other_connection.cursor() as cursor:
+                cursor.execute(f'INSERT INTO {TrackPoint._meta.db_table} '
+                               f'(incident_id, incident_resource_id, location, time_created) '
+                               f'VALUES (%s, %s, ST_SetSRID(ST_MakePoint(-31.42, -64.18), 4326), %s)',
+                               [self.incident_resource.incident_id, self.incident_resource.id,
+                                self.now - timedelta(seconds=5)])
+            # Stored with a higher id, but committed first
+            self._create_track_point(self.now)
+            collected_at, cursor = self._poll()
+            eq_(collected_at, [self.now.isoformat()])
+
+            other_connection.commit()
+        finally:
+            other_connection.close()
+
+        collected_at, _ = self._poll(cursor)
+        eq_(collected_at, [(self.now - timedelta(seconds=5)).isoformat()])
+
+    def test_poll_with_invalid_cursor(self):
+        response = self.client.get(self.url, {'since': 'not a cursor'})
+
+        eq_(response.status_code, status.HTTP_400_BAD_REQUEST)
+        ok_('Invalid points cursor' in response.json()['message'])
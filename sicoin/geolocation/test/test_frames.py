@@ -0,0 +1,101 @@
+import json
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+from nose.tools import eq_, raises
+
+from sicoin.geolocation.codecs import COMPACT_JSON_MEDIA_TYPE, encode_track_points_frame, to_epoch_milliseconds
+from sicoin.geolocation.frames import TrackPointFrameIngestor
+from sicoin.geolocation.authorization import invalidate_ingestion_authorization
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.models import IncidentResource
+from sicoin.incident.test.factories import IncidentResourceFactory, ResourceProfileFactory
+
+
+@override_settings(INCIDENT_WS_TRACK_POINTS_BUFFERED=False, INCIDENT_WS_RESOURCE_RATE=0,
+                   TRACK_POINTS_FILTER_MIN_DISTANCE_METERS=0)
+class TestTrackPointFrameIngestor(TestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        self.resource_id = self.incident_resource.resource_id
+        # Cached checks are only invalidated once committed, never within a test case
+        invalidate_ingestion_authorization(incident_id=self.incident.id)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def _get_record(self, seconds, lat=-31.42, lng=-64.18, resource_id=None):
+        return (resource_id or self.resource_id, lat, lng,
+                to_epoch_milliseconds(self.now + timedelta(seconds=seconds)))
+
+    def _ingest(self, records):
+        frame_ingestor = TrackPointFrameIngestor(self.incident.id)
+        return frame_ingestor, frame_ingestor.ingest(encode_track_points_frame(records))
+
+    def _get_stored_times(self):
+        return [(track_point.time_created - self.now).total_seconds()
+                for track_point in TrackPoint.objects.filter(incident=self.incident).order_by('time_created')]
+
+    def test_stored_and_represented(self):
+        _, track_points_repr = self._ingest([self._get_record(0), self._get_record(10)])
+
+        eq_(self._get_stored_times(), [0, 10])
+        eq_([track_point_repr['resource']['id'] for track_point_repr in track_points_repr],
+            [self.resource_id, self.resource_id])
+
+    def test_listed_with_same_coordinates(self):
+        self._ingest([self._get_record(0, lat=-31.42, lng=-64.18)])
+
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/track-points/',
+                                   HTTP_ACCEPT=COMPACT_JSON_MEDIA_TYPE)
+
+        compact_points = json.loads(response.content)
+        eq_((compact_points['lat'], compact_points['lng']), ([-31.42], [-64.18]))
+
+    def test_invalid_records_skipped(self):
+        self._ingest([
+            self._get_record(0, lat=float('nan')),
+            self._get_record(1, lng=float('inf')),
+            self._get_record(2, lat=90.5),
+            self._get_record(3, lng=-180.5),
+            (self.resource_id, -31.42, -64.18, -1),
+            (self.resource_id, -31.42, -64.18, 2 ** 62),
+            self._get_record(10),
+        ])
+
+        eq_(self._get_stored_times(), [10])
+
+    def test_points_of_resources_outside_incident_dropped(self):
+        resource = ResourceProfileFactory(domain=self.incident.domain_config)
+
+        _, track_points_repr = self._ingest([self._get_record(0, resource_id=resource.id), self._get_record(10)])
+
+        eq_(self._get_stored_times(), [10])
+        eq_(len(track_points_repr), 1)
+        eq_(IncidentResource.objects.filter(incident=self.incident, resource=resource).exists(), False)
+
+    def test_points_of_inactive_resources_dropped(self):
+        self.incident_resource.resource.user.is_active = False
+        self.incident_resource.resource.user.save()
+        invalidate_ingestion_authorization(resource_id=self.resource_id)
+
+        self._ingest([self._get_record(0)])
+
+        eq_(self._get_stored_times(), [])
+
+    @override_settings(INCIDENT_WS_FRAME_MAX_POINTS=2)
+    @raises(ValueError)
+    def test_too_many_points_rejected(self):
+        self._ingest([self._get_record(seconds) for seconds in range(3)])
+
+    @override_settings(INCIDENT_WS_RESOURCE_RATE=0.001, INCIDENT_WS_RESOURCE_BURST=2)
+    def test_oldest_points_beyond_resource_tokens_dropped(self):
+        get_redis_connection('default').delete(f'incident_ws_resource_bucket:{self.resource_id}')
+
+        frame_ingestor, _ = self._ingest([self._get_record(seconds) for seconds in range(3)])
+
+        eq_(self._get_stored_times(), [1, 2])
+        eq_(frame_ingestor.throttled_quantity, 1)
+        eq_(frame_ingestor.throttled_wait_seconds > 0, True)
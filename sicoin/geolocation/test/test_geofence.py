@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from nose.tools import eq_, ok_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.authorization import invalidate_ingestion_authorization
+from sicoin.geolocation.geofence import GeofenceEvaluator, get_lng_lat, haversine_distance
+from sicoin.geolocation.models import GeofenceTransition, TrackPoint
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+METERS_BY_LATITUDE_DEGREE = 111195.08
+
+
+class TestHaversineDistance(SimpleTestCase):
+
+    def test_latitude_degree(self):
+        ok_(abs(haversine_distance(-64.18, -31, -64.18, -32) - METERS_BY_LATITUDE_DEGREE) < 1)
+
+    def test_same_point(self):
+        eq_(haversine_distance(-64.18, -31.42, -64.18, -31.42), 0)
+
+    def test_stored_point_coordinates(self):
+        eq_(get_lng_lat(Point(-31.42, -64.18)), (-64.18, -31.42))
+
+
+@override_settings(INCIDENT_SCENE_RADIUS_METERS=100, GEOFENCE_HYSTERESIS_METERS=10)
+class TestGeofenceEvaluator(TestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        self.now = timezone.now()
+
+    def _create_track_points(self, meters_and_seconds):
+        """Fixes north of the incident location, at the given distances, stored as Point(lat, lng)"""
+        center = self.incident.location_point
+        return TrackPoint.objects.insert_ignoring_duplicates([
+            TrackPoint(incident=self.incident, incident_resource=self.incident_resource,
+                       location=Point(center.y + meters / METERS_BY_LATITUDE_DEGREE, center.x),
+                       time_created=self.now + timedelta(seconds=seconds))
+            for meters, seconds in meters_and_seconds
+        ])
+
+    def _get_recorded_transitions(self):
+        return list(GeofenceTransition.objects.filter(incident_resource=self.incident_resource)
+                    .order_by('number').values_list('transition', 'number'))
+
+    def test_entered_and_exited(self):
+        transitions = GeofenceEvaluator().evaluate(self._create_track_points([(500, 0), (50, 10), (300, 20)]))
+
+        eq_([(transition.transition, transition.number) for transition in transitions],
+            [(GeofenceTransition.TRANSITION_ENTERED, 1), (GeofenceTransition.TRANSITION_EXITED, 2)])
+        eq_(self._get_recorded_transitions(),
+            [(GeofenceTransition.TRANSITION_ENTERED, 1), (GeofenceTransition.TRANSITION_EXITED, 2)])
+
+    def test_hysteresis(self):
+        geofence_evaluator = GeofenceEvaluator()
+        geofence_evaluator.evaluate(self._create_track_points([(50, 0)]))
+
+        eq_(geofence_evaluator.evaluate(self._create_track_points([(105, 10)])), [])
+        eq_(len(geofence_evaluator.evaluate(self._create_track_points([(115, 20)]))), 1)
+
+    def test_older_fixes_ignored(self):
+        geofence_evaluator = GeofenceEvaluator()
+        geofence_evaluator.evaluate(self._create_track_points([(50, 10)]))
+
+        eq_(geofence_evaluator.evaluate(self._create_track_points([(500, 0)])), [])
+
+    def test_state_seeded_from_recorded_transitions(self):
+        GeofenceEvaluator().evaluate(self._create_track_points([(50, 0)]))
+
+        transitions = GeofenceEvaluator().evaluate(self._create_track_points([(30, 10), (300, 20)]))
+
+        eq_([(transition.transition, transition.number) for transition in transitions],
+            [(GeofenceTransition.TRANSITION_EXITED, 2)])
+
+    def test_transition_recorded_by_another_process(self):
+        geofence_evaluator, other_geofence_evaluator = GeofenceEvaluator(), GeofenceEvaluator()
+        eq_(geofence_evaluator.evaluate(self._create_track_points([(500, 0)])), [])
+        eq_(other_geofence_evaluator.evaluate(self._create_track_points([(500, 5)])), [])
+
+        eq_(len(other_geofence_evaluator.evaluate(self._create_track_points([(50, 10)]))), 1)
+        eq_(geofence_evaluator.evaluate(self._create_track_points([(40, 15)])), [])
+        transitions = geofence_evaluator.evaluate(self._create_track_points([(300, 20)]))
+
+        eq_([(transition.transition, transition.number) for transition in transitions],
+            [(GeofenceTransition.TRANSITION_EXITED, 2)])
+        eq_(self._get_recorded_transitions(),
+            [(GeofenceTransition.TRANSITION_ENTERED, 1), (GeofenceTransition.TRANSITION_EXITED, 2)])
+
+
+@override_settings(INCIDENT_SCENE_RADIUS_METERS=100, GEOFENCE_HYSTERESIS_METERS=10)
+class TestGeofenceOfUploadedTrackPoints(APITestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        # Cached checks are only invalidated once committed, never within a test case
+        invalidate_ingestion_authorization(incident_id=self.incident.id)
+
+    def test_entered_from_uploaded_coordinates(self):
+        """Uploaded as clients send them, [lat, lng]: from 500 meters north of the incident to 50 meters"""
+        center = self.incident.location_point
+        for meters, seconds in [(500, 0), (50, 10)]:
+            lat = center.y + meters / METERS_BY_LATITUDE_DEGREE
+            response = self.client.post(
+                f'/api/v1/incidents/{self.incident.id}/resources/{self.incident_resource.resource_id}/track-point/',
+                {'location': {'type': 'Point', 'coordinates': [lat, center.x]},
+                 'time_created': f'2021-03-24T22:12:{seconds:02d}Z'}, format='json')
+            eq_(response.status_code, status.HTTP_200_OK)
+
+        eq_(list(GeofenceTransition.objects.filter(incident_resource=self.incident_resource)
+                 .values_list('transition', flat=True)), [GeofenceTransition.TRANSITION_ENTERED])
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from nose.tools import eq_
+
+from sicoin.geolocation.heatmap import TrackPointHeatmap
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+@override_settings(HEATMAP_MAX_DWELL_SECONDS=300)
+class TestTrackPointHeatmap(TestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        self.now = timezone.now()
+
+    def _create_track_points(self, lat_lngs_and_seconds):
+        TrackPoint.objects.bulk_create([
+            TrackPoint(incident=self.incident, incident_resource=self.incident_resource, location=Point(*lat_lng),
+                       time_created=self.now + timedelta(seconds=seconds))
+            for lat_lng, seconds in lat_lngs_and_seconds
+        ])
+
+    def _get_dwell_seconds_by_cell(self):
+        return {(cell.lat, cell.lng): (cell.points_quantity, cell.dwell_seconds)
+                for cell in TrackPointHeatmap(self.incident).aggregate(1)}
+
+    def test_dwell_seconds_until_next_fix(self):
+        self._create_track_points([((10, 10), 0), ((10, 10), 20), ((20, 20), 50)])
+
+        eq_(self._get_dwell_seconds_by_cell(), {(10, 10): (2, 50), (20, 20): (1, 0)})
+
+    def test_dwell_seconds_capped(self):
+        self._create_track_points([((10, 10), 0), ((20, 20), 3600)])
+
+        eq_(self._get_dwell_seconds_by_cell(), {(10, 10): (1, 300), (20, 20): (1, 0)})
+
+    def test_cells_by_latitude_and_longitude(self):
+        self._create_track_points([((-31.42, -64.18), 0)])
+
+        eq_(self._get_dwell_seconds_by_cell(), {(-31, -64): (1, 0)})
@@ -0,0 +1,43 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from nose.tools import eq_, ok_
+
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.incident.models import Incident
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+def _get_index_names(model):
+    with connection.cursor() as cursor:
+        return {name for name, constraint in connection.introspection.get_constraints(
+            cursor, model._meta.db_table).items() if constraint['index']}
+
+
+class TestPointIndexes(TestCase):
+
+    def test_model_indexes_created(self):
+        for model in (TrackPoint, MapPoint, Incident):
+            index_names = _get_index_names(model)
+            for index in model._meta.indexes:
+                ok_(index.name in index_names, f'{index.name} missing on {model._meta.db_table}')
+
+    def test_single_column_foreign_key_indexes_dropped(self):
+        for model in (TrackPoint, MapPoint):
+            table = model._meta.db_table
+            eq_(_get_index_names(model) & {f'{table}_incident_id_partitioned',
+                                           f'{table}_incident_resource_id_partitioned'}, set())
+
+    def test_explain_point_queries_rolled_back(self):
+        IncidentResourceFactory()
+        incidents_quantity = Incident.objects.count()
+        output = StringIO()
+
+        call_command('explain_point_queries', incidents=1, resources=1, points=20, stdout=output)
+
+        ok_('Without indexes' in output.getvalue())
+        eq_(Incident.objects.count(), incidents_quantity)
+        eq_(TrackPoint.objects.count(), 0)
+        self.test_model_indexes_created()
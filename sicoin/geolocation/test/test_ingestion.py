@@ -0,0 +1,103 @@
+import json
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from nose.tools import eq_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.authorization import invalidate_ingestion_authorization
+from sicoin.geolocation.models import TrackPoint
+from sicoin.incident.models import IncidentResource
+from sicoin.incident.test.factories import IncidentResourceFactory, ResourceProfileFactory
+
+
+def _get_track_point(seconds, lng=-64.18):
+    return {'location': {'type': 'Point', 'coordinates': [-31.42, lng]},
+            'time_created': f'2021-03-24T22:12:{seconds:02d}Z'}
+
+
+class TestCreateTrackPoints(APITestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        # Cached checks are only invalidated once committed, never within a test case
+        invalidate_ingestion_authorization(incident_id=self.incident.id)
+
+    def _post(self, track_points, resource_id=None):
+        resource_id = resource_id or self.incident_resource.resource_id
+        return self.client.post(f'/api/v1/incidents/{self.incident.id}/resources/{resource_id}/track-points/',
+                                {'track_points': track_points}, format='json')
+
+    def test_batch_stored(self):
+        response = self._post([_get_track_point(seconds) for seconds in range(3)])
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        eq_(json.loads(response.content)['accepted'], 3)
+        eq_(TrackPoint.objects.filter(incident_resource=self.incident_resource).count(), 3)
+
+    def test_malformed_points_rejected(self):
+        response = self._post([_get_track_point(0), {'location': 'nowhere', 'time_created': 'never'},
+                               {'time_created': '2021-03-24T22:12:30Z'}])
+
+        content = json.loads(response.content)
+        eq_((content['accepted'], content['rejected']), (1, 2))
+        eq_(TrackPoint.objects.filter(incident_resource=self.incident_resource).count(), 1)
+
+    def test_resource_joins_incident(self):
+        resource = ResourceProfileFactory(domain=self.incident.domain_config)
+
+        response = self._post([_get_track_point(0)], resource_id=resource.id)
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        incident_resource = IncidentResource.objects.get(incident=self.incident, resource=resource)
+        eq_(TrackPoint.objects.filter(incident_resource=incident_resource).count(), 1)
+
+    def test_unknown_resource(self):
+        eq_(self._post([_get_track_point(0)], resource_id=999999).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestTrackPointDeduplication(APITestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        invalidate_ingestion_authorization(incident_id=self.incident_resource.incident_id)
+        self.url = f'/api/v1/incidents/{self.incident_resource.incident_id}/resources/' \
+                   f'{self.incident_resource.resource_id}/'
+
+    def _get_stored_quantity(self):
+        return TrackPoint.objects.filter(incident_resource=self.incident_resource).count()
+
+    def test_retried_track_point(self):
+        for duplicated in (0, 1):
+            response = self.client.post(f'{self.url}track-point/', _get_track_point(0), format='json')
+            eq_(json.loads(response.content)['duplicated'], duplicated)
+
+        eq_(self._get_stored_quantity(), 1)
+
+    def test_retried_batch(self):
+        self.client.post(f'{self.url}track-points/', {'track_points': [_get_track_point(0)]}, format='json')
+
+        response = self.client.post(f'{self.url}track-points/',
+                                    {'track_points': [_get_track_point(0), _get_track_point(10)]}, format='json')
+
+        content = json.loads(response.content)
+        eq_((content['accepted'], content['duplicated']), (1, 1))
+        eq_(self._get_stored_quantity(), 2)
+
+    def test_insert_ignoring_duplicates_returns_inserted(self):
+        first, second = [TrackPoint(incident_id=self.incident_resource.incident_id,
+                                    incident_resource=self.incident_resource,
+                                    location=Point(-31.42, -64.18), time_created=time_created)
+                         for time_created in (timezone.now(), timezone.now() + timedelta(seconds=1))]
+        TrackPoint.objects.insert_ignoring_duplicates([first])
+        retried_first = TrackPoint(incident_id=first.incident_id, incident_resource=self.incident_resource,
+                                   location=first.location, time_created=first.time_created)
+
+        inserted_track_points = TrackPoint.objects.insert_ignoring_duplicates([retried_first, second])
+
+        eq_(inserted_track_points, [second])
+        eq_(retried_first.id, None)
+        eq_(self._get_stored_quantity(), 2)
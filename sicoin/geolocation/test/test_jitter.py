@@ -0,0 +1,67 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from nose.tools import eq_
+
+from sicoin.geolocation.jitter import FILTERED_TRACK_POINTS_COUNTER, TrackPointJitterFilter, \
+    _get_last_accepted_key
+from sicoin.geolocation.models import TrackPoint
+from sicoin.metrics import _get_counter_key, get_counters
+
+METERS_BY_LATITUDE_DEGREE = 111195.08
+INCIDENT_RESOURCE_ID = 987654321
+
+
+@override_settings(TRACK_POINTS_FILTER_MIN_DISTANCE_METERS=10, TRACK_POINTS_FILTER_MIN_SECONDS=30)
+class TestTrackPointJitterFilter(SimpleTestCase):
+
+    def setUp(self):
+        cache.delete_many([_get_last_accepted_key(INCIDENT_RESOURCE_ID),
+                           _get_counter_key(FILTERED_TRACK_POINTS_COUNTER)])
+        self.now = timezone.now()
+
+    def _get_track_points(self, meters_and_seconds):
+        """Fixes north of a fixed location, at the given distances, as Point(lat, lng)"""
+        return [TrackPoint(incident_resource_id=INCIDENT_RESOURCE_ID,
+                           location=Point(-31.42 + meters / METERS_BY_LATITUDE_DEGREE, -64.18),
+                           time_created=self.now + timedelta(seconds=seconds))
+                for meters, seconds in meters_and_seconds]
+
+    def _get_seconds(self, track_points):
+        return [(track_point.time_created - self.now).total_seconds() for track_point in track_points]
+
+    def test_close_fixes_dropped(self):
+        track_points = self._get_track_points([(0, 0), (5, 10), (20, 20), (25, 40)])
+
+        eq_(self._get_seconds(TrackPointJitterFilter().filter(track_points)), [0, 20, 40])
+        eq_(get_counters(FILTERED_TRACK_POINTS_COUNTER), {FILTERED_TRACK_POINTS_COUNTER: 1})
+
+    def test_last_accepted_shared_between_calls(self):
+        TrackPointJitterFilter().filter(self._get_track_points([(0, 0)]))
+
+        eq_(TrackPointJitterFilter().filter(self._get_track_points([(5, 10)])), [])
+
+    def test_late_fixes_accepted_without_moving_last_accepted(self):
+        TrackPointJitterFilter().filter(self._get_track_points([(0, 20)]))
+
+        eq_(self._get_seconds(TrackPointJitterFilter().filter(self._get_track_points([(1, 10)]))), [10])
+        eq_(TrackPointJitterFilter().filter(self._get_track_points([(5, 30)])), [])
+
+    @override_settings(TRACK_POINTS_FILTER_MIN_DISTANCE_METERS=0)
+    def test_disabled(self):
+        track_points = self._get_track_points([(0, 10), (0, 0)])
+
+        eq_(self._get_seconds(TrackPointJitterFilter().filter(track_points)), [0, 10])
+
+    def test_show_metrics(self):
+        TrackPointJitterFilter().filter(self._get_track_points([(0, 0), (1, 1), (2, 2)]))
+        output = StringIO()
+
+        call_command('show_metrics', FILTERED_TRACK_POINTS_COUNTER, stdout=output)
+
+        eq_(output.getvalue(), f'{FILTERED_TRACK_POINTS_COUNTER}: 2\n')
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from nose.tools import eq_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.models import ResourceLastPosition, TrackPoint
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+class TestResourceLastPosition(APITestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        self.now = timezone.now().replace(microsecond=0)
+
+    def _insert(self, lngs_and_seconds, incident_resource=None):
+        incident_resource = incident_resource or self.incident_resource
+        TrackPoint.objects.insert_ignoring_duplicates([
+            TrackPoint(incident_id=self.incident.id, incident_resource=incident_resource,
+                       location=Point(lng, -31.42), time_created=self.now + timedelta(seconds=seconds))
+            for lng, seconds in lngs_and_seconds
+        ])
+
+    def _get_last_position(self):
+        last_position = ResourceLastPosition.objects.get(incident_resource=self.incident_resource)
+        return last_position.location.x, (last_position.time_created - self.now).total_seconds()
+
+    def test_newest_track_point(self):
+        self._insert([(-64.1, 10), (-64.2, 0)])
+
+        eq_(self._get_last_position(), (-64.1, 10))
+
+    def test_late_track_points_do_not_rewind(self):
+        self._insert([(-64.1, 10)])
+        self._insert([(-64.2, 0)])
+
+        eq_(self._get_last_position(), (-64.1, 10))
+
+    def test_moves_forward(self):
+        self._insert([(-64.1, 10)])
+        self._insert([(-64.2, 20)])
+
+        eq_(self._get_last_position(), (-64.2, 20))
+
+    def test_latest_positions_listing(self):
+        other_incident_resource = IncidentResourceFactory(incident=self.incident)
+        self._insert([(-64.1, 10), (-64.2, 0)])
+        self._insert([(-64.3, 5)], incident_resource=other_incident_resource)
+
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/positions/latest/')
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        eq_(sorted((position['resource']['id'], position['location']['coordinates'][0])
+                   for position in response.json()),
+            sorted([(self.incident_resource.resource_id, -64.1), (other_incident_resource.resource_id, -64.3)]))
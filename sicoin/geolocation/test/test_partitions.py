@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test import TestCase
+from nose.tools import eq_, ok_
+
+from sicoin.geolocation.models import TrackPoint
+from sicoin.geolocation.partitions import PointPartitionManager
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+class TestPointPartitionManager(TestCase):
+
+    def setUp(self):
+        self.partition_manager = PointPartitionManager(TrackPoint._meta.db_table)
+        self.incident_resource = IncidentResourceFactory()
+
+    def _count_rows(self, table_name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table_name)}')
+            return cursor.fetchone()[0]
+
+    def _create_track_point(self, time_created):
+        return TrackPoint.objects.create(incident=self.incident_resource.incident,
+                                         incident_resource=self.incident_resource,
+                                         location=Point(-31.42, -64.18), time_created=time_created)
+
+    def test_create_partition(self):
+        month_start = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+        ok_(self.partition_manager.create_partition(month_start))
+
+        ok_(month_start in self.partition_manager.get_monthly_partitions())
+        eq_(self.partition_manager.create_partition(month_start), False)
+
+    def test_create_partition_moves_rows_out_of_default_partition(self):
+        month_start = datetime(2100, 2, 1, tzinfo=timezone.utc)
+        track_point = self._create_track_point(datetime(2100, 2, 10, tzinfo=timezone.utc))
+        default_partition_rows = self._count_rows(self.partition_manager.default_partition_name)
+
+        self.partition_manager.create_partition(month_start)
+
+        eq_(self._count_rows(self.partition_manager.default_partition_name), default_partition_rows - 1)
+        eq_(self._count_rows(self.partition_manager.get_partition_name(month_start)), 1)
+        eq_(TrackPoint.objects.get(id=track_point.id).time_created, track_point.time_created)
+
+    def test_create_future_partitions(self):
+        now = datetime(2100, 3, 15, tzinfo=timezone.utc)
+
+        created_partitions = self.partition_manager.create_future_partitions(2, now=now)
+
+        eq_(created_partitions, [f'{TrackPoint._meta.db_table}_p210003', f'{TrackPoint._meta.db_table}_p210004',
+                                 f'{TrackPoint._meta.db_table}_p210005'])
+        eq_(self.partition_manager.create_future_partitions(2, now=now), [])
+
+    def test_expire_partitions(self):
+        expired_month_start = datetime(1990, 1, 1, tzinfo=timezone.utc)
+        kept_month_start = datetime(1990, 3, 1, tzinfo=timezone.utc)
+        self.partition_manager.create_partition(expired_month_start)
+        self.partition_manager.create_partition(kept_month_start)
+        self._create_track_point(datetime(1990, 1, 10, tzinfo=timezone.utc))
+
+        expired_partitions = self.partition_manager.expire_partitions(1, now=datetime(1990, 4, 1, tzinfo=timezone.utc))
+
+        eq_(expired_partitions, [self.partition_manager.get_partition_name(expired_month_start)])
+        month_starts = self.partition_manager.get_monthly_partitions()
+        ok_(expired_month_start not in month_starts)
+        ok_(kept_month_start in month_starts)
+        # Detached partitions are kept as plain tables, along with their rows
+        eq_(self._count_rows(self.partition_manager.get_partition_name(expired_month_start)), 1)
+        eq_(TrackPoint.objects.filter(time_created__year=1990).count(), 0)
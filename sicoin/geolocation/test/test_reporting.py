@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from nose.tools import eq_
+
+from sicoin.geolocation.models import TrackPoint
+from sicoin.geolocation.reporting import ReportingIntervalAdvisor, _get_incident_load_key, _get_last_fixes_key
+from sicoin.incident.live_state import IncidentLiveState
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+METERS_BY_LATITUDE_DEGREE = 111195.08
+
+
+@override_settings(REPORTING_INTERVAL_MIN_SECONDS=2, REPORTING_INTERVAL_MAX_SECONDS=60,
+                   REPORTING_INTERVAL_FAST_SPEED=10, REPORTING_INTERVAL_FULL_RATE_RESOURCES=50,
+                   REPORTING_INTERVAL_UNWATCHED_FACTOR=2, MOVEMENT_STATS_IDLE_SPEED=0.5)
+class TestReportingIntervalAdvisor(TestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        self.now = timezone.now()
+        self.live_state = IncidentLiveState(self.incident.id)
+        self.live_state.redis.delete(self.live_state._get_subscribers_key())
+        cache.delete_many([_get_incident_load_key(self.incident.id), _get_last_fixes_key(self.incident_resource.id)])
+        # Followed live unless the test says otherwise
+        self.live_state.add_subscriber()
+
+    def _recommend(self, meters_and_seconds):
+        """Fixes north of the incident location, at the given distances, as Point(lat, lng)"""
+        center = self.incident.location_point
+        return ReportingIntervalAdvisor(self.incident.id, self.incident_resource.id).recommend([
+            TrackPoint(incident=self.incident, incident_resource=self.incident_resource,
+                       location=Point(center.y + meters / METERS_BY_LATITUDE_DEGREE, center.x),
+                       time_created=self.now + timedelta(seconds=seconds))
+            for meters, seconds in meters_and_seconds
+        ])
+
+    def test_unknown_speed(self):
+        eq_(self._recommend([(0, 0)]), 60)
+
+    def test_stationary(self):
+        eq_(self._recommend([(0, 0), (1, 10)]), 60)
+
+    def test_fast(self):
+        eq_(self._recommend([(0, 0), (100, 10)]), 2)
+
+    def test_proportional_to_speed(self):
+        eq_(self._recommend([(0, 0), (50, 10)]), 31)
+
+    def test_speed_from_fixes_received_before(self):
+        self._recommend([(0, 0)])
+
+        eq_(self._recommend([(100, 10)]), 2)
+
+    def test_speed_kept_from_retried_fixes(self):
+        self._recommend([(0, 0), (100, 10)])
+
+        eq_(self._recommend([(0, 0)]), 2)
+
+    def test_unwatched(self):
+        self.live_state.remove_subscriber()
+
+        eq_(self._recommend([(0, 0), (100, 10)]), 4)
+
+    @override_settings(REPORTING_INTERVAL_FULL_RATE_RESOURCES=1)
+    def test_stretched_by_load(self):
+        IncidentResourceFactory(incident=self.incident)
+
+        eq_(self._recommend([(0, 0), (100, 10)]), 4)
+
+    def test_capped(self):
+        self.live_state.remove_subscriber()
+
+        eq_(self._recommend([(0, 0), (10, 10)]), 60)
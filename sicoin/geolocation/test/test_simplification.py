@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from nose.tools import eq_, ok_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.models import SimplifiedTrack, TrackPoint
+from sicoin.geolocation.simplification import TrackSimplifier, get_tolerance_for_zoom_level, \
+    get_zoom_level_for_tolerance
+from sicoin.incident.models import Incident
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+@override_settings(TRACK_SIMPLIFICATION_ZOOM_LEVELS=[8, 12, 16], TRACK_SIMPLIFICATION_TOLERANCE_PIXELS=1.0)
+class TestZoomLevels(SimpleTestCase):
+
+    def test_tolerance_for_zoom_level(self):
+        eq_(get_tolerance_for_zoom_level(0), 360 / 256)
+        eq_(get_tolerance_for_zoom_level(1), 180 / 256)
+
+    def test_zoom_level_for_tolerance(self):
+        for zoom_level in (0, 8, 12.5):
+            ok_(abs(get_zoom_level_for_tolerance(get_tolerance_for_zoom_level(zoom_level)) - zoom_level) < 1e-9)
+
+    def test_stored_zoom_level(self):
+        eq_([TrackSimplifier.get_stored_zoom_level(zoom_level) for zoom_level in (3, 8, 10.5, 20)], [8, 8, 12, 16])
+
+    @override_settings(TRACK_SIMPLIFICATION_ZOOM_LEVELS=[])
+    def test_no_stored_zoom_levels(self):
+        eq_(TrackSimplifier.get_stored_zoom_level(10), None)
+
+
+@override_settings(TRACK_SIMPLIFICATION_ZOOM_LEVELS=[8, 12, 16], TRACK_SIMPLIFICATION_TOLERANCE_PIXELS=1.0)
+class TestTrackSimplifier(APITestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        now = timezone.now()
+        # A straight track, then a detour of 0.01 degrees
+        TrackPoint.objects.bulk_create([
+            TrackPoint(incident=self.incident, incident_resource=self.incident_resource,
+                       location=Point(-31.42 + (0.01 if index == 5 else 0), -64.18 + index / 1000),
+                       time_created=now + timedelta(seconds=index))
+            for index in range(10)
+        ])
+        # Resources with a single fix have no track
+        TrackPoint.objects.create(incident=self.incident, incident_resource=IncidentResourceFactory(
+            incident=self.incident), location=Point(-31.42, -64.18), time_created=now)
+
+    def _simplify(self, zoom_level):
+        simplified_lines = TrackSimplifier(self.incident).simplify(get_tolerance_for_zoom_level(zoom_level))
+        eq_([simplified_line.incident_resource_id for simplified_line in simplified_lines],
+            [self.incident_resource.id])
+        eq_(simplified_lines[0].points_quantity, 10)
+        return simplified_lines[0].line
+
+    def test_detour_kept_when_zoomed_in(self):
+        eq_(len(self._simplify(16).coords), 5)
+
+    def test_detour_dropped_when_zoomed_out(self):
+        eq_(len(self._simplify(4).coords), 2)
+
+    def test_stored_simplified_tracks(self):
+        TrackSimplifier(self.incident).store_simplified_tracks()
+
+        eq_(sorted(SimplifiedTrack.objects.filter(incident_resource=self.incident_resource)
+                   .values_list('zoom_level', flat=True)), [8, 12, 16])
+
+    def test_listing_by_zoom(self):
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/track-points/', {'zoom': 16})
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        simplified_tracks = response.json()
+        eq_([(track['zoom_level'], track['points_quantity']) for track in simplified_tracks], [(None, 10)])
+
+    def test_listing_of_finalized_incident_stored(self):
+        TrackSimplifier(self.incident).store_simplified_tracks()
+        Incident.objects.filter(id=self.incident.id).update(status=Incident.INCIDENT_STATUS_FINALIZED)
+
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/track-points/', {'zoom': 10})
+
+        eq_([track['zoom_level'] for track in response.json()], [12])
+
+    def test_invalid_tolerance(self):
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/track-points/', {'tolerance': 0})
+
+        eq_(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+from nose.tools import eq_, raises
+
+from sicoin.geolocation.models import TrackPoint
+from sicoin.geolocation.streams import CONSUMER_GROUP, DEAD_LETTERS_STREAM_KEY, TrackPointStreamBuffer, \
+    TrackPointStreamDrainer, TrackPointsStillBuffered, get_stream_key
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+@override_settings(TRACK_POINTS_STREAM_CLAIM_IDLE_MS=0, TRACK_POINTS_STREAM_MAX_DELIVERIES=2)
+class TestTrackPointStreamDrainer(TransactionTestCase):
+    """
+    Foreign keys are checked on commit, so every batch commits on its own.
+    """
+
+    def setUp(self):
+        self.redis = get_redis_connection('default')
+        self.incident_resource = IncidentResourceFactory()
+        self.stream_key = get_stream_key(self.incident_resource.incident_id)
+        self.redis.delete(self.stream_key, DEAD_LETTERS_STREAM_KEY)
+        TrackPointStreamBuffer._streams_with_group.discard(self.stream_key)
+        self.drainer = TrackPointStreamDrainer('test-drainer')
+        self.now = timezone.now()
+
+    def tearDown(self):
+        self.redis.delete(self.stream_key, DEAD_LETTERS_STREAM_KEY)
+        self.redis.srem('track_points_streams', self.stream_key)
+
+    def _append(self, seconds, incident_resource_id=None):
+        TrackPointStreamBuffer().append(TrackPoint(
+            incident_id=self.incident_resource.incident_id,
+            incident_resource_id=incident_resource_id or self.incident_resource.id,
+            location=Point(-31.42, -64.18), time_created=self.now + timedelta(seconds=seconds)))
+
+    def _get_pending_quantity(self):
+        return self.redis.xpending(self.stream_key, CONSUMER_GROUP)['pending']
+
+    def test_drain_stores_buffered_points(self):
+        self._append(0)
+        self._append(1)
+
+        eq_(self.drainer.drain_stream(self.stream_key), 2)
+
+        eq_(TrackPoint.objects.filter(incident_resource=self.incident_resource).count(), 2)
+        eq_(self.redis.xlen(self.stream_key), 0)
+        eq_(self._get_pending_quantity(), 0)
+
+    def test_failing_entry_does_not_hold_back_its_batch(self):
+        self._append(0)
+        # Of an incident resource that does not exist, its insert always fails
+        self._append(1, incident_resource_id=self.incident_resource.id + 1000)
+        self._append(2)
+
+        eq_(self.drainer.drain_stream(self.stream_key), 2)
+
+        eq_(TrackPoint.objects.filter(incident_resource=self.incident_resource).count(), 2)
+        eq_(self._get_pending_quantity(), 1)
+
+    def test_failing_entry_moved_to_dead_letters(self):
+        self._append(0, incident_resource_id=self.incident_resource.id + 1000)
+
+        # Delivered once when read and once more when claimed, then moved
+        for _ in range(3):
+            eq_(self.drainer.drain_stream(self.stream_key), 0)
+
+        eq_(self._get_pending_quantity(), 0)
+        eq_(self.redis.xlen(self.stream_key), 0)
+        dead_letters = self.redis.xrange(DEAD_LETTERS_STREAM_KEY)
+        eq_(len(dead_letters), 1)
+        _, fields = dead_letters[0]
+        eq_(fields[b'stream_key'], self.stream_key.encode())
+        eq_(fields[b'incident_resource_id'], str(self.incident_resource.id + 1000).encode())
+        eq_(fields[b'deliveries'], b'2')
+
+    def test_drain_incident(self):
+        self._append(0)
+
+        eq_(self.drainer.drain_incident(self.incident_resource.incident_id), 1)
+
+        eq_(TrackPoint.objects.filter(incident_resource=self.incident_resource).count(), 1)
+
+    @raises(TrackPointsStillBuffered)
+    @override_settings(TRACK_POINTS_STREAM_CLAIM_IDLE_MS=60000)
+    def test_drain_incident_with_points_pending_on_another_worker(self):
+        self._append(0)
+        self.redis.xreadgroup(CONSUMER_GROUP, 'other-drainer', {self.stream_key: '>'})
+
+        self.drainer.drain_incident(self.incident_resource.incident_id)
@@ -0,0 +1,68 @@
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.utils import timezone
+from nose.tools import eq_, ok_, raises
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.models import TrackPoint
+from sicoin.geolocation.tiles import WEB_MERCATOR_HALF_SIDE, InvalidTile, get_tile_envelope
+from sicoin.geolocation.versions import _get_incident_points_version_key, bump_incident_points_version
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+class TestTileEnvelope(SimpleTestCase):
+
+    def test_whole_world(self):
+        eq_(get_tile_envelope(0, 0, 0),
+            (-WEB_MERCATOR_HALF_SIDE, -WEB_MERCATOR_HALF_SIDE, WEB_MERCATOR_HALF_SIDE, WEB_MERCATOR_HALF_SIDE))
+
+    def test_quarter(self):
+        eq_(get_tile_envelope(1, 1, 1), (0, -WEB_MERCATOR_HALF_SIDE, WEB_MERCATOR_HALF_SIDE, 0))
+
+    @raises(InvalidTile)
+    def test_tile_out_of_zoom_level(self):
+        get_tile_envelope(1, 2, 0)
+
+    @raises(InvalidTile)
+    def test_zoom_level_too_deep(self):
+        with self.settings(INCIDENT_TILES_MAX_ZOOM=10):
+            get_tile_envelope(11, 0, 0)
+
+
+class TestGetIncidentTile(APITestCase):
+
+    def setUp(self):
+        incident_resource = IncidentResourceFactory()
+        self.incident = incident_resource.incident
+        cache.delete(_get_incident_points_version_key(self.incident.id))
+        self.track_point = TrackPoint.objects.create(incident=self.incident, incident_resource=incident_resource,
+                                                     location=Point(-31.42, -64.18), time_created=timezone.now())
+
+    def _get(self, z, x, y):
+        return self.client.get(f'/api/v1/incidents/{self.incident.id}/tiles/{z}/{x}/{y}.mvt')
+
+    def test_tile_with_points(self):
+        response = self._get(3, 2, 4)
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        eq_(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        ok_(b'track_points' in response.content)
+
+    def test_empty_tile(self):
+        # North east quarter, the points are in the south west one
+        eq_(self._get(1, 1, 0).status_code, status.HTTP_204_NO_CONTENT)
+        # Where the points would be with their latitude and longitude swapped
+        eq_(self._get(3, 3, 5).status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_invalid_tile(self):
+        eq_(self._get(1, 5, 0).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_until_points_change(self):
+        self._get(0, 0, 0)
+        TrackPoint.objects.all().delete()
+
+        eq_(self._get(0, 0, 0).status_code, status.HTTP_200_OK)
+        bump_incident_points_version(self.incident.id)
+        eq_(self._get(0, 0, 0).status_code, status.HTTP_204_NO_CONTENT)
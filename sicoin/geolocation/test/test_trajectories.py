@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from nose.tools import eq_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.models import TrackPoint
+from sicoin.geolocation.trajectories import TrajectoryCompactor
+from sicoin.incident.models import Incident
+from sicoin.incident.test.factories import IncidentFactory, IncidentResourceFactory
+
+
+class TestTrajectoryCompactor(APITestCase):
+
+    def setUp(self):
+        self.incident = IncidentFactory()
+        self.incident_resources = [IncidentResourceFactory(incident=self.incident) for _ in range(2)]
+        self.now = timezone.now().replace(microsecond=0)
+        # Resources reporting in turns
+        TrackPoint.objects.bulk_create([
+            TrackPoint(incident=self.incident, incident_resource=self.incident_resources[index % 2],
+                       location=Point(-31.42, -64.18 + index / 1000), time_created=self.now + timedelta(seconds=index))
+            for index in range(6)
+        ])
+        self.incident.status = Incident.INCIDENT_STATUS_FINALIZED
+        self.incident.save()
+        self.compactor = TrajectoryCompactor(self.incident)
+
+    def test_compact(self):
+        compacted_trajectories = self.compactor.compact()
+
+        eq_(sorted(compacted_trajectory.points_quantity for compacted_trajectory in compacted_trajectories), [3, 3])
+        eq_(self.compactor.is_compacted(), True)
+
+    def test_track_points_merged_by_time(self):
+        self.compactor.compact()
+
+        track_points = list(self.compactor.get_track_points())
+
+        eq_([track_point.time_created for track_point in track_points],
+            [self.now + timedelta(seconds=index) for index in range(6)])
+        eq_([track_point.incident_resource_id for track_point in track_points],
+            [self.incident_resources[index % 2].id for index in range(6)])
+        eq_([round(track_point.location.y, 7) for track_point in track_points],
+            [round(-64.18 + index / 1000, 7) for index in range(6)])
+
+    def test_track_points_created_after(self):
+        self.compactor.compact()
+
+        track_points = list(self.compactor.get_track_points(created_after=self.now + timedelta(seconds=4)))
+
+        eq_([track_point.time_created for track_point in track_points],
+            [self.now + timedelta(seconds=4), self.now + timedelta(seconds=5)])
+
+    def test_streamed_listing_of_compacted_incident(self):
+        self.compactor.compact()
+        TrackPoint.objects.filter(incident=self.incident).delete()
+
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/track-points/?stream=ndjson')
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        eq_(response['Content-Type'], 'application/x-ndjson')
+        eq_(len(b''.join(response.streaming_content).splitlines()), 6)
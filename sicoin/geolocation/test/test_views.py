@@ -0,0 +1,117 @@
+import json
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.test import override_settings
+from django.utils import timezone
+from nose.tools import eq_, ok_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.codecs import COMPACT_BINARY_MEDIA_TYPE, COMPACT_JSON_MEDIA_TYPE, CompactPoints, \
+    to_epoch_milliseconds
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+class TestCompactPointListings(APITestCase):
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident = self.incident_resource.incident
+        self.now = timezone.now().replace(microsecond=0)
+        for model, extra_fields in ((TrackPoint, {}), (MapPoint, {'description_text': 'Comment'})):
+            model.objects.bulk_create([
+                model(incident=self.incident, incident_resource=self.incident_resource,
+                      location=Point(-31.42, -64.18 + index / 1000), time_created=self.now + timedelta(seconds=index),
+                      **extra_fields)
+                for index in range(3)
+            ])
+
+    def _get(self, url, media_type):
+        response = self.client.get(url, HTTP_ACCEPT=media_type)
+        eq_(response.status_code, status.HTTP_200_OK)
+        eq_(response['Content-Type'], media_type)
+        return response
+
+    def _assert_compact_points(self, compact_points: dict):
+        eq_([resource['id'] for resource in compact_points['resources']], [self.incident_resource.resource_id])
+        eq_(compact_points['resource_index'], [0, 0, 0])
+        eq_(compact_points['lat'], [-31.42, -31.42, -31.42])
+        eq_(compact_points['lng'], [-64.18 + index / 1000 for index in range(3)])
+        eq_(compact_points['collected_at'],
+            [to_epoch_milliseconds(self.now + timedelta(seconds=index)) for index in range(3)])
+
+    def test_track_points_compact_json(self):
+        response = self._get(f'/api/v1/incidents/{self.incident.id}/track-points/', COMPACT_JSON_MEDIA_TYPE)
+
+        compact_points = json.loads(response.content)
+        self._assert_compact_points(compact_points)
+        eq_('comments' in compact_points, False)
+
+    def test_track_points_compact_binary(self):
+        response = self._get(f'/api/v1/incidents/{self.incident.id}/track-points/', COMPACT_BINARY_MEDIA_TYPE)
+
+        self._assert_compact_points(CompactPoints.from_binary(response.content).to_dict())
+
+    def test_map_points_compact_json(self):
+        response = self._get(f'/api/v1/incidents/{self.incident.id}/map-points/', COMPACT_JSON_MEDIA_TYPE)
+
+        compact_points = json.loads(response.content)
+        self._assert_compact_points(compact_points)
+        eq_(compact_points['comments'], ['Comment'] * 3)
+
+    def test_map_points_compact_binary(self):
+        response = self._get(f'/api/v1/incidents/{self.incident.id}/map-points/', COMPACT_BINARY_MEDIA_TYPE)
+
+        compact_points = CompactPoints.from_binary(response.content).to_dict()
+        self._assert_compact_points(compact_points)
+        eq_(compact_points['comments'], ['Comment'] * 3)
+
+    def test_json_listing_by_default(self):
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/track-points/')
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        eq_(response['Content-Type'], 'application/json')
+        eq_(len(response.json()), 3)
+
+
+@override_settings(POINTS_STREAM_CHUNK_SIZE=2)
+class TestStreamedPointListings(APITestCase):
+    """
+    Chunks of two points, so listings of five span several chunks
+    """
+
+    def setUp(self):
+        incident_resource = IncidentResourceFactory()
+        self.url = f'/api/v1/incidents/{incident_resource.incident_id}/track-points/'
+        now = timezone.now().replace(microsecond=0)
+        TrackPoint.objects.bulk_create([
+            TrackPoint(incident=incident_resource.incident, incident_resource=incident_resource,
+                       location=Point(-31.42, -64.18), time_created=now + timedelta(seconds=index))
+            for index in range(5)
+        ])
+        self.listing = self.client.get(self.url).json()
+
+    def _get_streamed_content(self, stream_format):
+        response = self.client.get(self.url, {'stream': stream_format})
+        eq_(response.status_code, status.HTTP_200_OK)
+        ok_(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_json_stream(self):
+        response, content = self._get_streamed_content('json')
+
+        eq_(response['Content-Type'], 'application/json')
+        eq_(json.loads(content), self.listing)
+
+    def test_ndjson_stream(self):
+        response, content = self._get_streamed_content('ndjson')
+
+        eq_(response['Content-Type'], 'application/x-ndjson')
+        eq_([json.loads(line) for line in content.splitlines()], self.listing)
+
+    def test_empty_json_stream(self):
+        TrackPoint.objects.all().delete()
+
+        eq_(json.loads(self._get_streamed_content('json')[1]), [])
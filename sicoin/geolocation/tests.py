@@ -1,3 +1,71 @@
-# from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from nose.tools import eq_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.domain_config.models import DomainConfig, IncidentAbstraction, IncidentType, ResourceType
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.incident.models import Incident, IncidentResource
+from sicoin.users.models import ResourceProfile
+from sicoin.users.test.factories import UserFactory
+
+
+class TestPointListingQueries(APITestCase):
+    """
+    Tests the point listings cost the same amount of queries no matter how many points are listed.
+    """
+
+    POINTS_QUANTITY = 10000
+
+    def setUp(self):
+        self.domain = DomainConfig.objects.create(domain_name="Name", domain_code="AABBCCDDEE", parsed_json={})
+        resource_type = ResourceType.objects.create(name="Type", domain_config=self.domain)
+        abstraction = IncidentAbstraction.objects.create(alias="Abstraction", domain_config=self.domain)
+        incident_type = IncidentType.objects.create(name="Incident type", abstraction=abstraction)
+        self.incident = Incident.objects.create(domain_config=self.domain, incident_type=incident_type,
+                                                location_point=Point(-64.18, -31.42))
+        self.incident_resources = [
+            IncidentResource.objects.create(
+                incident=self.incident,
+                resource=ResourceProfile.objects.create(user=UserFactory(), type=resource_type, domain=self.domain))
+            for _ in range(2)
+        ]
+
+    def _create_points(self, model, quantity, first_point_time, **extra_fields):
+        model.objects.bulk_create([
+            model(incident=self.incident, incident_resource=self.incident_resources[index % 2],
+                  location=Point(-31.42, -64.18 + index / 100000),
+                  time_created=first_point_time + timedelta(seconds=index), **extra_fields)
+            for index in range(quantity)
+        ], batch_size=2000)
+
+    def _count_listing_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        eq_(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def _assert_constant_listing_queries(self, model, url, **extra_fields):
+        now = timezone.now()
+        self._create_points(model, 10, now - timedelta(seconds=10), **extra_fields)
+        few_points_queries = self._count_listing_queries(url)
+        self._create_points(model, self.POINTS_QUANTITY, now - timedelta(days=1), **extra_fields)
+        eq_(self._count_listing_queries(url), few_points_queries)
+
+    def test_map_points_listing_queries_do_not_grow_with_points(self):
+        self._assert_constant_listing_queries(MapPoint, f'/api/v1/incidents/{self.incident.id}/map-points/',
+                                              description_text='Comment')
+
+    def test_track_points_listing_queries_do_not_grow_with_points(self):
+        self._assert_constant_listing_queries(TrackPoint, f'/api/v1/incidents/{self.incident.id}/track-points/')
+
+    def test_streamed_track_points_listing_queries_do_not_grow_with_points(self):
+        self._assert_constant_listing_queries(
+            TrackPoint, f'/api/v1/incidents/{self.incident.id}/track-points/?stream=ndjson')
@@ -0,0 +1,81 @@
+import math
+from typing import Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.geolocation.versions import get_incident_points_version
+from sicoin.incident.models import Incident, IncidentResource
+
+# Half the side of the EPSG:3857 square covered by the tile pyramid
+WEB_MERCATOR_HALF_SIDE = math.pi * 6378137
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+
+class InvalidTile(Exception):
+    pass
+
+
+def get_tile_envelope(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Web mercator bounds (xmin, ymin, xmax, ymax) of the XYZ tile, as ST_TileEnvelope of PostGIS 3"""
+    tiles_per_side = 2 ** zoom
+    if not 0 <= zoom <= settings.INCIDENT_TILES_MAX_ZOOM or not 0 <= x < tiles_per_side \
+            or not 0 <= y < tiles_per_side:
+        raise InvalidTile(f'Invalid tile {zoom}/{x}/{y}')
+    tile_side = 2 * WEB_MERCATOR_HALF_SIDE / tiles_per_side
+    xmin = -WEB_MERCATOR_HALF_SIDE + x * tile_side
+    ymax = WEB_MERCATOR_HALF_SIDE - y * tile_side
+    return xmin, ymax - tile_side, xmin + tile_side, ymax
+
+
+class IncidentTileBuilder:
+    """
+    Builds Mapbox Vector Tiles of the track points and map points of an incident with ST_AsMVT, one layer
+    each. Points are stored as Point(lat, lng), so they are flipped to project them, and the tile bounds are
+    flipped instead to filter them by their index. Tiles are cached keyed by the incident points version,
+    which every point insertion bumps.
+    """
+
+    def __init__(self, incident: Incident):
+        self.incident = incident
+
+    def _get_layer_sql(self, layer_name: str, model, extra_columns: str = '') -> str:
+        return f"""
+            (SELECT COALESCE(ST_AsMVT(layer, '{layer_name}', {TILE_EXTENT}, 'geom'), ''::bytea) FROM (
+                SELECT ST_AsMVTGeom(ST_Transform(ST_FlipCoordinates(point.location), 3857), bounds.geom::box2d,
+                                    {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                       incident_resource.resource_id,
+                       (extract(epoch FROM point.time_created) * 1000)::bigint AS collected_at{extra_columns}
+                FROM {model._meta.db_table} point
+                JOIN {IncidentResource._meta.db_table} incident_resource
+                    ON incident_resource.id = point.incident_resource_id, bounds
+                WHERE point.incident_id = %(incident_id)s
+                  AND point.location && bounds.lat_lng_geom
+            ) layer WHERE layer.geom IS NOT NULL)
+        """
+
+    def build(self, zoom: int, x: int, y: int) -> bytes:
+        xmin, ymin, xmax, ymax = get_tile_envelope(zoom, x, y)
+        query = f"""
+            WITH bounds AS (
+                SELECT geom, ST_FlipCoordinates(ST_Transform(geom, 4326)) AS lat_lng_geom
+                FROM (SELECT ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 3857) AS geom) envelope
+            )
+            SELECT {self._get_layer_sql('track_points', TrackPoint)}
+                || {self._get_layer_sql('map_points', MapPoint, ', point.description_text AS comment')}
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(query, {'incident_id': self.incident.id,
+                                   'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax})
+            return bytes(cursor.fetchone()[0])
+
+    def get(self, zoom: int, x: int, y: int) -> bytes:
+        key = f'incident_tile:{self.incident.id}:{get_incident_points_version(self.incident.id)}:{zoom}:{x}:{y}'
+        tile = cache.get(key)
+        if tile is None:
+            tile = self.build(zoom, x, y)
+            cache.set(key, tile, timeout=settings.INCIDENT_TILES_CACHE_TIMEOUT)
+        return tile
@@ -0,0 +1,80 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import transaction
+
+from sicoin.geolocation.codecs import EPOCH, X, Y, decode_trajectory, encode_trajectory, to_epoch_milliseconds
+from sicoin.geolocation.models import CompactedTrajectory, TrackPoint
+from sicoin.geolocation.serializers import RESOURCE_RELATED_FIELDS
+from sicoin.incident.models import Incident
+
+
+class TrajectoryCompactor:
+    """
+    Turns the track points of every resource of a finalized incident into a CompactedTrajectory, from which
+    its tracks are read afterwards. Raw track points are deleted too if TRAJECTORY_COMPACTION_PURGE_RAW_POINTS
+    is set. Points still buffered (see geolocation.streams) must be stored first, see
+    TrackPointStreamDrainer.drain_incident.
+    """
+
+    def __init__(self, incident: Incident):
+        self.incident = incident
+
+    def compact(self) -> List[CompactedTrajectory]:
+        compacted_trajectories = []
+        with transaction.atomic():
+            for incident_resource in self.incident.incidentresource_set.all():
+                rows = TrackPoint.objects.filter(incident_resource=incident_resource).order_by(
+                    'time_created', 'id').annotate(x=X('location'), y=Y('location')).values_list(
+                    'x', 'y', 'time_created')
+                if not rows:
+                    continue
+                xs, ys, times_created = zip(*rows)
+                compacted_trajectories.append(CompactedTrajectory.objects.update_or_create(
+                    incident_resource=incident_resource,
+                    defaults={
+                        'points_quantity': len(times_created),
+                        'first_time_created': times_created[0],
+                        'last_time_created': times_created[-1],
+                        'encoded_points': encode_trajectory(
+                            xs, ys, [to_epoch_milliseconds(time_created) for time_created in times_created]),
+                    })[0])
+
+            if settings.TRAJECTORY_COMPACTION_PURGE_RAW_POINTS:
+                TrackPoint.objects.filter(incident=self.incident).delete()
+        return compacted_trajectories
+
+    def is_compacted(self) -> bool:
+        return self.incident.status == Incident.INCIDENT_STATUS_FINALIZED and \
+            CompactedTrajectory.objects.filter(incident_resource__incident=self.incident).exists()
+
+    def _decode(self, compacted_trajectory: CompactedTrajectory,
+                created_after: Optional[datetime]) -> Iterator[TrackPoint]:
+        xs, ys, times = decode_trajectory(bytes(compacted_trajectory.encoded_points))
+        srid = TrackPoint._meta.get_field('location').srid
+        for x, y, time in zip(xs, ys, times):
+            time_created = EPOCH + timedelta(milliseconds=time)
+            if created_after is not None and time_created < created_after:
+                continue
+            yield TrackPoint(incident=self.incident, incident_resource=compacted_trajectory.incident_resource,
+                             location=Point(x, y, srid=srid), time_created=time_created)
+
+    def get_track_points(self, resource_id=None, created_after: Optional[datetime] = None) -> Iterator[TrackPoint]:
+        """
+        Unsaved track points decoded from the compacted trajectories, ordered by time_created. Trajectories are
+        merged lazily, only their decoded coordinates are kept in memory and points are built as they are read.
+        """
+        compacted_trajectories = CompactedTrajectory.objects.filter(
+            incident_resource__incident=self.incident
+        ).select_related(*(f'incident_resource__{field}' for field in RESOURCE_RELATED_FIELDS))
+        if resource_id is not None:
+            compacted_trajectories = compacted_trajectories.filter(incident_resource__resource_id=resource_id)
+        if created_after is not None:
+            compacted_trajectories = compacted_trajectories.filter(last_time_created__gte=created_after)
+
+        return heapq.merge(*(self._decode(compacted_trajectory, created_after)
+                             for compacted_trajectory in compacted_trajectories),
+                           key=lambda track_point: track_point.time_created)
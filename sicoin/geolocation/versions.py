@@ -0,0 +1,29 @@
+import time
+
+from django.core.cache import cache
+
+
+def _get_incident_points_version_key(incident_id) -> str:
+    return f'incident_points_version:{incident_id}'
+
+
+def get_incident_points_version(incident_id) -> int:
+    """
+    Version of the points stored for the incident, part of the key of anything cached from them (e.g. tiles),
+    so new points make those entries unreachable instead of deleting them one by one
+    """
+    key = _get_incident_points_version_key(incident_id)
+    version = cache.get(key)
+    if version is None:
+        # Seeded from the clock, so a version lost by an eviction never matches entries cached before it
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_incident_points_version(incident_id):
+    key = _get_incident_points_version_key(incident_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
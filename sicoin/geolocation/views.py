@@ -1,16 +1,36 @@
 import json
 import logging
+import math
+from datetime import datetime
+from typing import Iterable, Optional
 
-from django.http import HttpResponse, JsonResponse
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.permissions import AllowAny
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from sicoin.geolocation.models import MapPoint, TrackPoint
-from sicoin.geolocation.serializers import MapPointSerializer, TrackPointSerializer, TrackPointListSerializer
-from sicoin.incident.models import Incident
+from sicoin.geolocation.codecs import COMPACT_BINARY_MEDIA_TYPE, COMPACT_JSON_MEDIA_TYPE, CompactPointRow, \
+    CompactPoints
+from sicoin.geolocation.cursors import InvalidPointsCursor, PointsCursor
+from sicoin.geolocation.heatmap import TrackPointHeatmap
+from sicoin.geolocation.models import MapPoint, ResourceLastPosition, SimplifiedTrack, TrackPoint
+from sicoin.geolocation.renderers import CompactPointsBinaryRenderer, CompactPointsJSONRenderer, \
+    CompactPointsRenderer
+from sicoin.geolocation.serializers import INCIDENT_RESOURCE_RELATED_FIELDS, RESOURCE_RELATED_FIELDS, \
+    MapPointSerializer, ResourceLastPositionSerializer, SimplifiedTrackSerializer, TrackPointSerializer, \
+    TrackPointListSerializer
+from sicoin.geolocation.simplification import TrackSimplifier, get_tolerance_for_zoom_level, \
+    get_zoom_level_for_tolerance
+from sicoin.geolocation.tiles import IncidentTileBuilder, InvalidTile
+from sicoin.geolocation.trajectories import TrajectoryCompactor
+from sicoin.incident.models import Incident, IncidentResource
 from django.utils import timezone
 
 resource_id_query_parameter = openapi.Parameter('resource_id', openapi.IN_QUERY,
@@ -20,28 +40,168 @@ timedelta_in_seconds_query_parameter = openapi.Parameter('timedelta_in_seconds',
                                                          description="filter by created on the last X seconds",
                                                          type=openapi.TYPE_INTEGER)
 
+stream_query_parameter = openapi.Parameter('stream', openapi.IN_QUERY,
+                                           description="Stream the listing, read through a server side cursor, "
+                                                       "as a JSON array ('json') or as one JSON object per line "
+                                                       "('ndjson')",
+                                           type=openapi.TYPE_STRING, enum=['json', 'ndjson'])
 
-class GetMapPointsFromIncident(APIView):
-    permission_classes = (AllowAny,)
+since_query_parameter = openapi.Parameter('since', openapi.IN_QUERY,
+                                          description="Cursor returned on the X-Points-Cursor header of a previous "
+                                                      "response, only points stored after it are listed",
+                                          type=openapi.TYPE_STRING)
 
-    def get_queryset(self, incident: Incident):
-        queryset = MapPoint.objects.filter(incident=incident)
+zoom_query_parameter = openapi.Parameter('zoom', openapi.IN_QUERY,
+                                         description="Web map zoom level, tracks are returned as one simplified "
+                                                     "line per resource with the detail visible at that zoom",
+                                         type=openapi.TYPE_NUMBER)
+
+tolerance_query_parameter = openapi.Parameter('tolerance', openapi.IN_QUERY,
+                                              description="Simplification tolerance in degrees, tracks are "
+                                                          "returned as one simplified line per resource",
+                                              type=openapi.TYPE_NUMBER)
+
+cell_size_query_parameter = openapi.Parameter('cell_size', openapi.IN_QUERY, required=True,
+                                              description="Side of the grid cells in degrees",
+                                              type=openapi.TYPE_NUMBER)
+
+per_resource_query_parameter = openapi.Parameter('per_resource', openapi.IN_QUERY,
+                                                 description="Aggregate every resource on its own cells",
+                                                 type=openapi.TYPE_BOOLEAN)
+
+start_query_parameter = openapi.Parameter('start', openapi.IN_QUERY,
+                                          description="Only points created from this ISO 8601 date",
+                                          type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME)
+
+end_query_parameter = openapi.Parameter('end', openapi.IN_QUERY,
+                                        description="Only points created until this ISO 8601 date",
+                                        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME)
+
+
+class PointListingMixin:
+    STREAM_FORMAT_JSON = 'json'
+    STREAM_FORMAT_NDJSON = 'ndjson'
+    CURSOR_HEADER = 'X-Points-Cursor'
+    # Listings negotiating the compact media types as well
+    LISTING_RENDERER_CLASSES = (*api_settings.DEFAULT_RENDERER_CLASSES, CompactPointsJSONRenderer,
+                                CompactPointsBinaryRenderer)
+
+    def get_since_cursor(self) -> Optional[PointsCursor]:
+        since = self.request.query_params.get('since', None)
+        return PointsCursor.decode(since) if since else None
+
+    def get_created_after(self) -> Optional[datetime]:
+        timedelta_in_seconds = self.request.query_params.get('timedelta_in_seconds', None)
+        if timedelta_in_seconds is None:
+            return None
+        try:
+            return timezone.now() - timezone.timedelta(seconds=int(timedelta_in_seconds))
+        except ValueError as value_error:
+            logging.debug(value_error)
+            return None
+
+    def filter_points_queryset(self, queryset):
         resource_id = self.request.query_params.get('resource_id', None)
         if resource_id is not None:
             queryset = queryset.filter(incident_resource__resource_id=resource_id)
 
-        timedelta_in_seconds = self.request.query_params.get('timedelta_in_seconds', None)
-        if timedelta_in_seconds is not None:
-            now = timezone.datetime.now()
-            try:
-                earlier = now - timezone.timedelta(seconds=int(timedelta_in_seconds))
-                queryset = queryset.filter(time_created__range=(earlier, now))
-            except ValueError as value_error:
-                logging.debug(value_error)
-        return queryset
+        created_after = self.get_created_after()
+        if created_after is not None:
+            queryset = queryset.filter(time_created__range=(created_after, timezone.now()))
+
+        since_cursor = self.get_since_cursor()
+        if since_cursor is not None:
+            queryset = since_cursor.filter_newer(queryset)
+        return queryset.select_related(*INCIDENT_RESOURCE_RELATED_FIELDS).order_by('time_created', 'id')
+
+    def _join_chunk(self, serialized_points, stream_format, is_first_chunk):
+        if stream_format == self.STREAM_FORMAT_NDJSON:
+            return ''.join(f'{serialized_point}\n' for serialized_point in serialized_points)
+        return ('' if is_first_chunk else ',') + ','.join(serialized_points)
+
+    def _stream_chunks(self, points: Iterable, serializer, stream_format):
+        chunk_size = settings.POINTS_STREAM_CHUNK_SIZE
+        if stream_format == self.STREAM_FORMAT_JSON:
+            yield '['
+
+        serialized_points = []
+        is_first_chunk = True
+        for point in points:
+            serialized_points.append(json.dumps(serializer.to_representation(point), cls=DjangoJSONEncoder))
+            if len(serialized_points) == chunk_size:
+                yield self._join_chunk(serialized_points, stream_format, is_first_chunk)
+                serialized_points = []
+                is_first_chunk = False
+        if serialized_points:
+            yield self._join_chunk(serialized_points, stream_format, is_first_chunk)
+
+        if stream_format == self.STREAM_FORMAT_JSON:
+            yield ']'
+
+    def get_compact_renderer(self) -> Optional[CompactPointsRenderer]:
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return renderer if isinstance(renderer, CompactPointsRenderer) else None
+
+    def get_streaming_response(self, points: Iterable, serializer, stream_format) -> StreamingHttpResponse:
+        content_type = 'application/json' if stream_format == self.STREAM_FORMAT_JSON else 'application/x-ndjson'
+        return StreamingHttpResponse(self._stream_chunks(points, serializer, stream_format), content_type=content_type)
+
+    def get_points_response(self, queryset, serializer):
+        """
+        Streams the points if requested, so memory stays flat no matter the size of the incident,
+        otherwise the whole listing is serialized at once. Clients accepting a compact media type get
+        the columnar listing (see geolocation.codecs) instead. The cursor to poll for newer points is
+        returned on the X-Points-Cursor header.
+        """
+        # Taken before the points are read, see PointsCursor
+        cursor = PointsCursor.take(queryset.db)
+        stream_format = self.request.query_params.get('stream')
+        compact_renderer = self.get_compact_renderer()
+        if compact_renderer is not None:
+            response = HttpResponse(compact_renderer.render(CompactPoints.from_queryset(queryset)),
+                                    content_type=compact_renderer.media_type)
+        elif stream_format in (self.STREAM_FORMAT_JSON, self.STREAM_FORMAT_NDJSON):
+            response = self.get_streaming_response(queryset.iterator(chunk_size=settings.POINTS_STREAM_CHUNK_SIZE),
+                                                   serializer, stream_format)
+        else:
+            response = JsonResponse([serializer.to_representation(point) for point in queryset], safe=False)
+
+        response[self.CURSOR_HEADER] = cursor.encode()
+        patch_vary_headers(response, ('Accept',))
+        return response
 
-    @swagger_auto_schema(operation_description="List Map Points for related incident",
-                         manual_parameters=[resource_id_query_parameter, timedelta_in_seconds_query_parameter],
+    def get_decoded_points_response(self, points: Iterable, serializer):
+        """
+        Response for points not read from the database (e.g. compacted trajectories), without a cursor. Points
+        are streamed as they are decoded if requested, as points read from the database.
+        """
+        stream_format = self.request.query_params.get('stream')
+        compact_renderer = self.get_compact_renderer()
+        if compact_renderer is not None:
+            compact_points = CompactPoints.from_rows([
+                CompactPointRow(point.incident_resource_id, point.time_created, point.location.x, point.location.y)
+                for point in points])
+            response = HttpResponse(compact_renderer.render(compact_points), content_type=compact_renderer.media_type)
+        elif stream_format in (self.STREAM_FORMAT_JSON, self.STREAM_FORMAT_NDJSON):
+            response = self.get_streaming_response(points, serializer, stream_format)
+        else:
+            response = JsonResponse([serializer.to_representation(point) for point in points], safe=False)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+class GetMapPointsFromIncident(PointListingMixin, APIView):
+    permission_classes = (AllowAny,)
+    renderer_classes = PointListingMixin.LISTING_RENDERER_CLASSES
+
+    def get_queryset(self, incident: Incident):
+        return self.filter_points_queryset(MapPoint.objects.filter(incident=incident))
+
+    @swagger_auto_schema(operation_description="List Map Points for related incident. Accept "
+                                               f"{COMPACT_JSON_MEDIA_TYPE} or {COMPACT_BINARY_MEDIA_TYPE} "
+                                               "for the compact columnar listing",
+                         manual_parameters=[resource_id_query_parameter, timedelta_in_seconds_query_parameter,
+                                            since_query_parameter, stream_query_parameter],
                          responses={200: "[\n"
                                          "{\n"
                                          "  'location': GeometryField,\n"
@@ -52,7 +212,8 @@ class GetMapPointsFromIncident(APIView):
                                          "}, ...\n"
                                          "]",
                                     400: "{'message': 'Incident with id {ID} does not exists'},\n"
-                                         "{'message': 'Map points for Incident with id {ID} are nonexistent'}"})
+                                         "{'message': 'Map points for Incident with id {ID} are nonexistent'},\n"
+                                         "{'message': 'Invalid points cursor {CURSOR}'}"})
     def get(self, request, incident_id):
         if not incident_id:
             return HttpResponse(json.dumps({'message': 'Incident id invalid or empty'}),
@@ -71,10 +232,10 @@ class GetMapPointsFromIncident(APIView):
             return HttpResponse(json.dumps({'message': f'Map points for Incident with id {incident_id} '
                                                        f'are nonexistent'}),
                                 status=status.HTTP_400_BAD_REQUEST)
-        map_points_from_incident_serialized = []
-        for map_point in map_points_from_incident:
-            map_points_from_incident_serialized.append(MapPointSerializer().to_representation(map_point))
-        return JsonResponse(map_points_from_incident_serialized, safe=False)
+        except InvalidPointsCursor as invalid_cursor:
+            return HttpResponse(json.dumps({'message': str(invalid_cursor)}),
+                                status=status.HTTP_400_BAD_REQUEST)
+        return self.get_points_response(map_points_from_incident, MapPointSerializer())
 
 
 class CreateMapPoint(APIView):
@@ -96,27 +257,56 @@ class CreateMapPoint(APIView):
                                 status=status.HTTP_200_OK)
 
 
-class GetTrackPointsFromIncident(APIView):
+class GetTrackPointsFromIncident(PointListingMixin, APIView):
     permission_classes = (AllowAny,)
+    renderer_classes = PointListingMixin.LISTING_RENDERER_CLASSES
+
+    FILTER_QUERY_PARAMETERS = ('resource_id', 'timedelta_in_seconds', 'since')
 
     def get_queryset(self, incident: Incident):
-        queryset = TrackPoint.objects.filter(incident=incident)
-        resource_id = self.request.query_params.get('resource_id', None)
-        if resource_id is not None:
-            queryset = queryset.filter(incident_resource__resource_id=resource_id)
+        return self.filter_points_queryset(TrackPoint.objects.filter(incident=incident))
 
-        timedelta_in_seconds = self.request.query_params.get('timedelta_in_seconds', None)
-        if timedelta_in_seconds is not None:
-            now = timezone.datetime.now()
-            try:
-                earlier = now - timezone.timedelta(seconds=int(timedelta_in_seconds))
-                queryset = queryset.filter(time_created__range=(earlier, now))
-            except ValueError as value_error:
-                logging.debug(value_error)
-        return queryset
+    def get_simplification_zoom_and_tolerance(self):
+        zoom = self.request.query_params.get('zoom', None)
+        tolerance = self.request.query_params.get('tolerance', None)
+        if zoom is None and tolerance is None:
+            return None
+        if tolerance is not None:
+            tolerance = float(tolerance)
+            if not math.isfinite(tolerance) or tolerance <= 0:
+                raise ValueError('Tolerance must be a finite number greater than 0')
+            return get_zoom_level_for_tolerance(tolerance), tolerance
+        zoom = float(zoom)
+        if not math.isfinite(zoom) or zoom < 0:
+            raise ValueError('Zoom must be a finite, non negative number')
+        return zoom, get_tolerance_for_zoom_level(zoom)
+
+    def get_simplified_tracks(self, incident: Incident, zoom: float, tolerance: float):
+        # Tracks of a finalized incident do not change, the level stored on finalization is served unless the
+        # listing is filtered or that level was not stored yet
+        is_filtered = any(parameter in self.request.query_params for parameter in self.FILTER_QUERY_PARAMETERS)
+        if incident.status == Incident.INCIDENT_STATUS_FINALIZED and not is_filtered:
+            stored_simplified_tracks = list(SimplifiedTrack.objects.filter(
+                incident_resource__incident=incident, zoom_level=TrackSimplifier.get_stored_zoom_level(zoom)
+            ).select_related(*INCIDENT_RESOURCE_RELATED_FIELDS))
+            if stored_simplified_tracks:
+                return stored_simplified_tracks
 
-    @swagger_auto_schema(operation_description="List Track Points for related incident",
-                         manual_parameters=[resource_id_query_parameter, timedelta_in_seconds_query_parameter],
+        simplified_lines = TrackSimplifier(incident).simplify(tolerance, self.get_queryset(incident))
+        incident_resources = IncidentResource.objects.select_related(*RESOURCE_RELATED_FIELDS).in_bulk(
+            [simplified_line.incident_resource_id for simplified_line in simplified_lines])
+        return [SimplifiedTrack(incident_resource=incident_resources[simplified_line.incident_resource_id],
+                                line=simplified_line.line,
+                                points_quantity=simplified_line.points_quantity)
+                for simplified_line in simplified_lines]
+
+    @swagger_auto_schema(operation_description="List Track Points for related incident. Accept "
+                                               f"{COMPACT_JSON_MEDIA_TYPE} or {COMPACT_BINARY_MEDIA_TYPE} "
+                                               "for the compact columnar listing. With zoom or tolerance, "
+                                               "one simplified line per resource is listed instead",
+                         manual_parameters=[resource_id_query_parameter, timedelta_in_seconds_query_parameter,
+                                            since_query_parameter, stream_query_parameter, zoom_query_parameter,
+                                            tolerance_query_parameter],
                          responses={200: "[\n"
                                          "{\n"
                                          "  'location': GeometryField,\n"
@@ -124,9 +314,20 @@ class GetTrackPointsFromIncident(APIView):
                                          "  'internal_type': 'TrackPoint',\n"
                                          "  'resource_id': instance.incident_resource.resource_id,\n"
                                          "}, ...\n"
+                                         "] or, with zoom or tolerance,\n"
+                                         "[\n"
+                                         "{\n"
+                                         "  'location': GeometryField (LineString),\n"
+                                         "  'zoom_level': stored zoom level or null if computed on request,\n"
+                                         "  'points_quantity': instance.points_quantity,\n"
+                                         "  'internal_type': 'SimplifiedTrack',\n"
+                                         "  'resource': ResourceProfile,\n"
+                                         "}, ...\n"
                                          "]",
                                     400: "{'message': 'Incident with id {ID} does not exists'},\n"
-                                         "{'message': 'Track points for Incident with id {ID} are nonexistent'}"})
+                                         "{'message': 'Track points for Incident with id {ID} are nonexistent'},\n"
+                                         "{'message': 'Invalid points cursor {CURSOR}'},\n"
+                                         "{'message': 'Invalid zoom or tolerance'}"})
     def get(self, request, incident_id):
         if not incident_id:
             return HttpResponse(json.dumps({'message': 'Incident id invalid or empty'}),
@@ -139,16 +340,173 @@ class GetTrackPointsFromIncident(APIView):
                                                        f'does not exists'}),
                                 status=status.HTTP_404_NOT_FOUND)
 
+        try:
+            zoom_and_tolerance = self.get_simplification_zoom_and_tolerance()
+        except ValueError as value_error:
+            logging.debug(value_error)
+            return HttpResponse(json.dumps({'message': 'Invalid zoom or tolerance'}),
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        if zoom_and_tolerance is not None:
+            try:
+                simplified_tracks = self.get_simplified_tracks(incident, *zoom_and_tolerance)
+            except InvalidPointsCursor as invalid_cursor:
+                return HttpResponse(json.dumps({'message': str(invalid_cursor)}),
+                                    status=status.HTTP_400_BAD_REQUEST)
+            serializer = SimplifiedTrackSerializer()
+            return JsonResponse([serializer.to_representation(simplified_track)
+                                 for simplified_track in simplified_tracks], safe=False)
+
+        # Tracks of finalized incidents are read from their compacted trajectories, a cursor only matches raw rows
+        trajectory_compactor = TrajectoryCompactor(incident)
+        if 'since' not in request.query_params and trajectory_compactor.is_compacted():
+            return self.get_decoded_points_response(
+                trajectory_compactor.get_track_points(request.query_params.get('resource_id', None),
+                                                      self.get_created_after()),
+                TrackPointSerializer())
+
         try:
             map_points_from_incident = self.get_queryset(incident)
         except TrackPoint.DoesNotExist:
             return HttpResponse(json.dumps({'message': f'Track points for Incident with id {incident_id} '
                                                        f'are nonexistent'}),
                                 status=status.HTTP_400_BAD_REQUEST)
-        map_points_from_incident_serialized = []
-        for map_point in map_points_from_incident:
-            map_points_from_incident_serialized.append(TrackPointSerializer().to_representation(map_point))
-        return JsonResponse(map_points_from_incident_serialized, safe=False)
+        except InvalidPointsCursor as invalid_cursor:
+            return HttpResponse(json.dumps({'message': str(invalid_cursor)}),
+                                status=status.HTTP_400_BAD_REQUEST)
+        return self.get_points_response(map_points_from_incident, TrackPointSerializer())
+
+
+class GetLatestPositionsFromIncident(APIView):
+    permission_classes = (AllowAny,)
+
+    @swagger_auto_schema(operation_description="List the last known position of every resource of the incident",
+                         manual_parameters=[resource_id_query_parameter],
+                         responses={200: "[\n"
+                                         "{\n"
+                                         "  'location': GeometryField,\n"
+                                         "  'collected_at': instance.time_created,\n"
+                                         "  'internal_type': 'ResourceLastPosition',\n"
+                                         "  'resource': ResourceProfile,\n"
+                                         "}, ...\n"
+                                         "]",
+                                    404: "{'message': 'Incident with id {ID} does not exists'}"})
+    def get(self, request, incident_id):
+        if not Incident.objects.filter(id=incident_id).exists():
+            return HttpResponse(json.dumps({'message': f'Incident with id {incident_id} '
+                                                       f'does not exists'}),
+                                status=status.HTTP_404_NOT_FOUND)
+
+        last_positions = ResourceLastPosition.objects.filter(incident_id=incident_id).select_related(
+            *INCIDENT_RESOURCE_RELATED_FIELDS)
+        resource_id = request.query_params.get('resource_id', None)
+        if resource_id is not None:
+            last_positions = last_positions.filter(incident_resource__resource_id=resource_id)
+
+        serializer = ResourceLastPositionSerializer()
+        return JsonResponse([serializer.to_representation(last_position) for last_position in last_positions],
+                            safe=False)
+
+
+class GetIncidentTile(APIView):
+    permission_classes = (AllowAny,)
+    MVT_CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+    @swagger_auto_schema(operation_description="Mapbox Vector Tile of the incident, with a 'track_points' and a "
+                                               "'map_points' layer. Features carry resource_id, collected_at "
+                                               "(epoch milliseconds) and, for map points, comment",
+                         responses={200: "Tile (application/vnd.mapbox-vector-tile)",
+                                    204: "Empty tile",
+                                    400: "{'message': 'Invalid tile {Z}/{X}/{Y}'}",
+                                    404: "{'message': 'Incident with id {ID} does not exists'}"})
+    def get(self, request, incident_id, z, x, y):
+        try:
+            incident = Incident.objects.get(id=incident_id)
+        except Incident.DoesNotExist:
+            return HttpResponse(json.dumps({'message': f'Incident with id {incident_id} '
+                                                       f'does not exists'}),
+                                status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            tile = IncidentTileBuilder(incident).get(z, x, y)
+        except InvalidTile as invalid_tile:
+            return HttpResponse(json.dumps({'message': str(invalid_tile)}),
+                                status=status.HTTP_400_BAD_REQUEST)
+        if not tile:
+            return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+        return HttpResponse(tile, content_type=self.MVT_CONTENT_TYPE)
+
+
+class GetTrackPointsHeatmapFromIncident(PointListingMixin, APIView):
+    permission_classes = (AllowAny,)
+
+    def get_queryset(self, incident: Incident):
+        queryset = self.filter_points_queryset(TrackPoint.objects.filter(incident=incident))
+        for parameter, lookup in (('start', 'time_created__gte'), ('end', 'time_created__lte')):
+            value = self.request.query_params.get(parameter, None)
+            if value is not None:
+                date = parse_datetime(value)
+                if date is None:
+                    raise ValueError(f'Invalid {parameter} date {value}')
+                queryset = queryset.filter(**{lookup: date})
+        return queryset
+
+    def get_cell_size(self) -> float:
+        try:
+            cell_size = float(self.request.query_params.get('cell_size', ''))
+        except ValueError:
+            cell_size = math.nan
+        if not math.isfinite(cell_size) or cell_size < settings.HEATMAP_MIN_CELL_SIZE:
+            raise ValueError(f'Cell size must be at least {settings.HEATMAP_MIN_CELL_SIZE}')
+        return cell_size
+
+    @swagger_auto_schema(operation_description="Track points of the incident aggregated on a grid, with the "
+                                               "points quantity and seconds spent by resources on every cell",
+                         manual_parameters=[cell_size_query_parameter, per_resource_query_parameter,
+                                            resource_id_query_parameter, timedelta_in_seconds_query_parameter,
+                                            start_query_parameter, end_query_parameter],
+                         responses={200: "{\n"
+                                         "  'cell_size': cell_size,\n"
+                                         "  'cells': [\n"
+                                         "    {\n"
+                                         "      'lat': snapped latitude,\n"
+                                         "      'lng': snapped longitude,\n"
+                                         "      'points_quantity': int,\n"
+                                         "      'dwell_seconds': float,\n"
+                                         "      'resource_id': int, only with per_resource\n"
+                                         "    }, ...\n"
+                                         "  ]\n"
+                                         "}",
+                                    400: "{'message': 'Cell size must be at least {MIN}'},\n"
+                                         "{'message': 'Invalid start date {DATE}'},\n"
+                                         "{'message': 'Invalid end date {DATE}'}",
+                                    404: "{'message': 'Incident with id {ID} does not exists'}"})
+    def get(self, request, incident_id):
+        try:
+            incident = Incident.objects.get(id=incident_id)
+        except Incident.DoesNotExist:
+            return HttpResponse(json.dumps({'message': f'Incident with id {incident_id} '
+                                                       f'does not exists'}),
+                                status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            cell_size = self.get_cell_size()
+            track_points = self.get_queryset(incident)
+        except (ValueError, InvalidPointsCursor) as invalid_parameter:
+            return HttpResponse(json.dumps({'message': str(invalid_parameter)}),
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        per_resource = request.query_params.get('per_resource', '').lower() in ('true', '1', 'yes')
+        cells = TrackPointHeatmap(incident).aggregate(cell_size, per_resource, track_points)
+        return JsonResponse({
+            'cell_size': cell_size,
+            'cells': [{'lat': cell.lat,
+                       'lng': cell.lng,
+                       'points_quantity': cell.points_quantity,
+                       'dwell_seconds': cell.dwell_seconds,
+                       **({'resource_id': cell.resource_id} if per_resource else {})}
+                      for cell in cells]
+        })
 
 
 class CreateTrackPoint(APIView):
@@ -156,7 +514,8 @@ class CreateTrackPoint(APIView):
 
     @swagger_auto_schema(operation_description="Create TrackPoint, Only Resource user",
                          request_body=TrackPointSerializer,
-                         responses={200: '{ "message": "TrackPoint successfully created" }',
+                         responses={200: '{ "message": "TrackPoint successfully created", "duplicated": 0, '
+                                         '"filtered": 0, "reporting_interval_seconds": 5 }',
                                     400: "{'incident_id': 'Incident with id: ID does not exist'},\n"
                                          "{'incident_id': 'Incident with id: ID is not at Created state'},\n"
                                          "{'resource_id': 'Resource with id: ID does not exist'},\n"
@@ -166,24 +525,37 @@ class CreateTrackPoint(APIView):
                                           context={'incident_id': incident_id, 'resource_id': resource_id})
         if serializer.is_valid(raise_exception=True):
             serializer.save()
-            return HttpResponse(json.dumps({'message': 'TrackPoint successfully created'}),
+            return HttpResponse(json.dumps({'message': 'TrackPoint successfully created',
+                                            'duplicated': int(serializer.is_duplicated),
+                                            'filtered': int(serializer.is_filtered),
+                                            'reporting_interval_seconds': serializer.reporting_interval_seconds}),
                                 status=status.HTTP_200_OK)
 
 
 class CreateTrackPoints(APIView):
     permission_classes = (AllowAny,)
 
-    @swagger_auto_schema(operation_description="Create TrackPoints, Only Resource user",
+    @swagger_auto_schema(operation_description="Create TrackPoints, Only Resource user. Invalid points are "
+                                               "skipped and reported as rejected, already stored points are "
+                                               "skipped and reported as duplicated, points too close to the "
+                                               "previous one are skipped and reported as filtered. The "
+                                               "resource should report again after reporting_interval_seconds",
                          request_body=TrackPointListSerializer,
-                         responses={200: '{ "message": "TrackPoint successfully created" }',
+                         responses={200: '{ "message": "TrackPoint successfully created", '
+                                         '"accepted": 10, "duplicated": 0, "rejected": 0, "filtered": 0, '
+                                         '"reporting_interval_seconds": 5 }',
                                     400: "{'incident_id': 'Incident with id: ID does not exist'},\n"
-                                         "{'incident_id': 'Incident with id: ID is not at Created state'},\n"
                                          "{'resource_id': 'Resource with id: ID does not exist'},\n"
                                          "{'resource_id': 'User related to Resource with id: ID is not active'}"})
     def post(self, request, incident_id, resource_id):
         serializer = TrackPointListSerializer(data=request.data,
                                               context={'incident_id': incident_id, 'resource_id': resource_id})
         if serializer.is_valid(raise_exception=True):
-            serializer.save()
-            return HttpResponse(json.dumps({'message': 'TrackPoint successfully created'}),
+            track_points = serializer.save()
+            return HttpResponse(json.dumps({'message': 'TrackPoint successfully created',
+                                            'accepted': len(track_points),
+                                            'duplicated': serializer.duplicated_track_points_quantity,
+                                            'rejected': serializer.rejected_track_points_quantity,
+                                            'filtered': serializer.filtered_track_points_quantity,
+                                            'reporting_interval_seconds': serializer.reporting_interval_seconds}),
                                 status=status.HTTP_200_OK)
@@ -1,14 +1,30 @@
+import asyncio
 import json
 import logging
+import math
+import struct
 from enum import Enum
+from typing import List, Tuple
+from urllib.parse import parse_qs
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 
-from sicoin.geolocation.serializers import MapPointSerializer, TrackPointSerializer
+from sicoin.geolocation.frames import TrackPointFrameIngestor
+from sicoin.geolocation.models import MapPoint, ResourceLastPosition
+from sicoin.geolocation.serializers import INCIDENT_RESOURCE_RELATED_FIELDS, MapPointSerializer, \
+    ResourceLastPositionSerializer, TrackPointSerializer
+from sicoin.incident.live_state import IncidentLiveState, IncidentSnapshot
 from sicoin.incident.models import Incident
+from sicoin.incident.throttling import TokenBucket, get_resource_bucket
+from sicoin.metrics import increment_counter
 from sicoin.utils import MetaEnum
 
+THROTTLED_DROPPED_COUNTER = 'incident_ws.throttled.dropped'
+THROTTLED_COALESCED_COUNTER = 'incident_ws.throttled.coalesced'
+
 
 class AvailableIncidentTypes(str, Enum, metaclass=MetaEnum):
     MAP_POINT = 'map_point'
@@ -37,7 +53,9 @@ class IncidentConsumer(AsyncWebsocketConsumer):
             },
             context={
                 'incident_id': data['incidentId'],
-                'resource_id': data['resourceId']
+                'resource_id': data['resourceId'],
+                # Recorded along with the broadcast, see _handle_message
+                'record_live_state': False
             }
         )
 
@@ -46,7 +64,7 @@ class IncidentConsumer(AsyncWebsocketConsumer):
             return map_point_serializer.to_representation(map_point)
 
     @database_sync_to_async
-    def _save_track_point(self, data):
+    def _save_track_point(self, data, skip_duplicated=False):
         assert int(data['incidentId']) == int(self.incident_id)
 
         track_point_serializer = TrackPointSerializer(
@@ -59,14 +77,70 @@ class IncidentConsumer(AsyncWebsocketConsumer):
             },
             context={
                 'incident_id': data['incidentId'],
-                'resource_id': data['resourceId']
+                'resource_id': data['resourceId'],
+                # Recorded along with the broadcast, see _handle_message
+                'record_live_state': False
             }
         )
 
         if track_point_serializer.is_valid(raise_exception=True):
             track_point = track_point_serializer.save()
+            self.reporting_interval_seconds = track_point_serializer.reporting_interval_seconds
+            if skip_duplicated and (track_point_serializer.is_duplicated or track_point_serializer.is_filtered):
+                # Retried fix, already stored and broadcast, or jitter around the previous one
+                return None
             return track_point_serializer.to_representation(track_point)
 
+    @database_sync_to_async
+    def _buffer_track_point(self, data):
+        assert int(data['incidentId']) == int(self.incident_id)
+
+        track_point_serializer = TrackPointSerializer(
+            data={
+                'location': {
+                    'type': 'Point',
+                    'coordinates': [data['lat'], data['lng']]
+                },
+                'time_created': data['timeCreated'],
+            },
+            context={
+                'incident_id': data['incidentId'],
+                'resource_id': data['resourceId']
+            }
+        )
+        if track_point_serializer.is_valid(raise_exception=True):
+            track_point_repr = track_point_serializer.buffer()
+            self.reporting_interval_seconds = track_point_serializer.reporting_interval_seconds
+            return track_point_repr
+
+    @database_sync_to_async
+    def _add_subscriber(self):
+        IncidentLiveState(self.incident_id).add_subscriber()
+
+    @database_sync_to_async
+    def _remove_subscriber(self):
+        IncidentLiveState(self.incident_id).remove_subscriber()
+
+    @database_sync_to_async
+    def _record_live_state(self, **state) -> int:
+        return IncidentLiveState(self.incident_id).record(**state)
+
+    @database_sync_to_async
+    def _get_live_state_snapshot(self) -> IncidentSnapshot:
+        live_state = IncidentLiveState(self.incident_id)
+        if not live_state.is_seeded():
+            incident = Incident.objects.get(id=self.incident_id)
+            last_positions = ResourceLastPosition.objects.filter(incident_id=self.incident_id).select_related(
+                *INCIDENT_RESOURCE_RELATED_FIELDS)
+            map_points = MapPoint.objects.filter(incident_id=self.incident_id).select_related(
+                *INCIDENT_RESOURCE_RELATED_FIELDS).order_by('-time_created')[:settings.INCIDENT_LIVE_STATE_MAP_POINTS]
+            last_position_serializer = ResourceLastPositionSerializer()
+            map_point_serializer = MapPointSerializer()
+            live_state.seed(incident.status,
+                            [last_position_serializer.to_representation(position) for position in last_positions],
+                            [map_point_serializer.to_representation(map_point) for map_point in map_points])
+        return live_state.get_snapshot()
+
     def _generate_tp_data(self, index):
         return {
             "lat": 37.4219284,
@@ -89,6 +163,22 @@ class IncidentConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         self.incident_id = self.scope['url_route']['kwargs']['incident_id']
+        # Messages waiting for the next flush (see _send_message), by coalescing key
+        self.held_messages = {}
+        self.flush_task = None
+        # Rate limits of received messages, see _take_tokens
+        self.connection_bucket = None
+        if settings.INCIDENT_WS_CONNECTION_RATE:
+            self.connection_bucket = TokenBucket(settings.INCIDENT_WS_CONNECTION_BURST,
+                                                 settings.INCIDENT_WS_CONNECTION_RATE)
+        self.is_throttled = False
+        self.throttled_track_point = None
+        self.throttled_track_point_task = None
+        self.dropped_messages_quantity = 0
+        self.coalesced_messages_quantity = 0
+        # Recommended to the resource reporting through this connection, see geolocation.reporting
+        self.reporting_interval_seconds = None
+        self.sent_reporting_interval_seconds = None
         # Assert existing incident
 
         # if not self._get_incident().status_is_started:
@@ -100,6 +190,22 @@ class IncidentConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         await self.accept()
+        # Only connections following the incident (dashboards, supervisors) count as subscribers, see
+        # geolocation.reporting. Reporting phones are told apart by the role query parameter or, when they do
+        # not send it, by the first track point they send
+        self.is_subscriber = parse_qs(self.scope.get('query_string', b'').decode()).get('role') != ['reporter']
+        if self.is_subscriber:
+            await self._add_subscriber()
+
+        # Taken after joining the group, so every message left out of it is received live
+        snapshot = await self._get_live_state_snapshot()
+        self.snapshot_sequence = snapshot.sequence
+        await self.send(text_data=json.dumps({
+            'event_type': 'snapshot',
+            'incident_id': self.incident_id,
+            'data': snapshot.to_dict(),
+            'sequence': snapshot.sequence
+        }))
 
         # if not settings.INCIDENT_WS_DATA_GENERATION:
         #     return
@@ -120,7 +226,29 @@ class IncidentConsumer(AsyncWebsocketConsumer):
         #             }))
         #     await asyncio.sleep(5)
 
+    async def disconnect(self, close_code):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        if self.throttled_track_point_task is not None:
+            self.throttled_track_point_task.cancel()
+        await self._count_throttled_messages()
+        await self._stop_counting_as_subscriber()
+        await self.channel_layer.group_discard(
+            self.incident_id,
+            self.channel_name
+        )
+
+    async def _stop_counting_as_subscriber(self):
+        if self.is_subscriber:
+            self.is_subscriber = False
+            await self._remove_subscriber()
+
     async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            await self._stop_counting_as_subscriber()
+            await self._receive_track_points_frame(bytes_data)
+            return
+
         text_data_json = json.loads(text_data)
         if not text_data_json.get('type'):
             logging.log(logging.INFO, f"Mensaje recibido no tiene una key 'type': {text_data_json}")
@@ -130,46 +258,299 @@ class IncidentConsumer(AsyncWebsocketConsumer):
         if message_type not in AvailableIncidentTypes:
             raise Exception(f'Wrong type of message sent: {message_type}')
 
+        data = text_data_json['data']
+        if message_type == AvailableIncidentTypes.TRACK_POINT:
+            await self._stop_counting_as_subscriber()
+        wait_seconds = await self._take_tokens(message_type, data)
+        if wait_seconds:
+            await self._throttle(message_type, data, wait_seconds)
+            return
+        await self._end_throttling()
+        await self._handle_message(message_type, data)
+
+    async def _receive_track_points_frame(self, bytes_data):
+        """
+        Binary frames carry track points only (see geolocation.codecs.decode_track_points_frame), always stored
+        here and broadcast as a single message. Frames take a single token of the connection bucket, as they
+        are stored at once, and a token of the resource bucket for every point (see TrackPointFrameIngestor).
+        """
+        wait_seconds = self.connection_bucket.take() if self.connection_bucket is not None else 0
+        if wait_seconds:
+            await self._throttle(None, None, wait_seconds)
+            return
+
+        try:
+            track_points_repr, frame_ingestor = await self._save_track_points_frame(bytes_data)
+        except (ValueError, struct.error):
+            logging.log(logging.INFO, f'Invalid track points frame received for incident {self.incident_id}')
+            return
+        if frame_ingestor.throttled_quantity:
+            self.dropped_messages_quantity += frame_ingestor.throttled_quantity
+            await self._notify_throttled(frame_ingestor.throttled_wait_seconds)
+        else:
+            await self._end_throttling()
+        await self._send_reporting_interval()
+        if not track_points_repr:
+            return
+
+        sequence = await self._record_live_state(track_points=track_points_repr)
+        await self.channel_layer.group_send(
+            self.incident_id,
+            {
+                'type': 'track_points',
+                'data': track_points_repr,
+                'sequence': sequence
+            }
+        )
+
+    @database_sync_to_async
+    def _save_track_points_frame(self, bytes_data) -> Tuple[List[dict], TrackPointFrameIngestor]:
+        frame_ingestor = TrackPointFrameIngestor(self.incident_id)
+        track_points_repr = frame_ingestor.ingest(bytes_data)
+        if frame_ingestor.reporting_interval_seconds is not None:
+            self.reporting_interval_seconds = frame_ingestor.reporting_interval_seconds
+        return track_points_repr, frame_ingestor
+
+    async def _take_tokens(self, message_type, data) -> float:
+        """Seconds to wait before the message can be handled, 0 if it can be handled now"""
+        if self.connection_bucket is not None:
+            wait_seconds = self.connection_bucket.take()
+            if wait_seconds:
+                return wait_seconds
+        is_point = message_type in (AvailableIncidentTypes.MAP_POINT, AvailableIncidentTypes.TRACK_POINT)
+        if settings.INCIDENT_WS_RESOURCE_RATE and is_point:
+            return await self._take_resource_token(data['resourceId'])
+        return 0
+
+    @database_sync_to_async
+    def _take_resource_token(self, resource_id) -> float:
+        return get_resource_bucket(resource_id).take()
+
+    async def _throttle(self, message_type, data, wait_seconds):
+        """
+        Excess track points are coalesced: the newest one is held and handled once there are tokens again.
+        Any other excess message is dropped. Clients are told when they start being throttled.
+        """
+        if message_type == AvailableIncidentTypes.TRACK_POINT:
+            if self.throttled_track_point is not None:
+                self.coalesced_messages_quantity += 1
+            self.throttled_track_point = data
+            if self.throttled_track_point_task is None:
+                self.throttled_track_point_task = asyncio.ensure_future(
+                    self._handle_throttled_track_point_after(wait_seconds))
+        else:
+            self.dropped_messages_quantity += 1
+        await self._notify_throttled(wait_seconds)
+
+    async def _notify_throttled(self, wait_seconds):
+        if not self.is_throttled:
+            self.is_throttled = True
+            await self.send(text_data=json.dumps({
+                'event_type': 'throttled',
+                'incident_id': self.incident_id,
+                'retry_after_ms': math.ceil(wait_seconds * 1000)
+            }))
+
+    async def _handle_throttled_track_point_after(self, wait_seconds):
+        await asyncio.sleep(wait_seconds)
+        self.throttled_track_point_task = None
+        data, self.throttled_track_point = self.throttled_track_point, None
+        try:
+            wait_seconds = await self._take_tokens(AvailableIncidentTypes.TRACK_POINT, data)
+            if wait_seconds:
+                await self._throttle(AvailableIncidentTypes.TRACK_POINT, data, wait_seconds)
+            else:
+                await self._end_throttling()
+                await self._handle_message(AvailableIncidentTypes.TRACK_POINT, data)
+        except Exception:
+            logging.exception(f'Error handling a throttled track point of incident {self.incident_id}')
+
+    async def _end_throttling(self):
+        if not self.is_throttled:
+            return
+        self.is_throttled = False
+        await self._count_throttled_messages()
+
+    @database_sync_to_async
+    def _count_throttled_messages(self):
+        increment_counter(THROTTLED_DROPPED_COUNTER, self.dropped_messages_quantity)
+        increment_counter(THROTTLED_COALESCED_COUNTER, self.coalesced_messages_quantity)
+        self.dropped_messages_quantity = self.coalesced_messages_quantity = 0
+
+    async def _handle_message(self, message_type, data):
+        is_persisted = False
+        if settings.INCIDENT_WS_PERSIST_ON_RECEIVE:
+            # Validate and store the point only once, here, so subscribers just forward its representation
+            if message_type == AvailableIncidentTypes.MAP_POINT:
+                data = await self._save_map_point(data)
+                is_persisted = True
+            elif message_type == AvailableIncidentTypes.TRACK_POINT and settings.INCIDENT_WS_TRACK_POINTS_BUFFERED:
+                # Stored later by the drain worker, so it is broadcast as persisted
+                data = await self._buffer_track_point(data)
+                is_persisted = True
+                await self._send_reporting_interval()
+                if data is None:
+                    return
+            elif message_type == AvailableIncidentTypes.TRACK_POINT:
+                data = await self._save_track_point(data, skip_duplicated=True)
+                is_persisted = True
+                await self._send_reporting_interval()
+                if data is None:
+                    return
+
+        state = {}
+        if is_persisted and message_type == AvailableIncidentTypes.MAP_POINT:
+            state['map_point'] = data
+        elif is_persisted and message_type == AvailableIncidentTypes.TRACK_POINT:
+            state['track_point'] = data
+        sequence = await self._record_live_state(**state)
+
         await self.channel_layer.group_send(
             self.incident_id,
             {
                 'type': message_type,
-                'data': text_data_json['data']
+                'data': data,
+                'is_persisted': is_persisted,
+                'sequence': sequence
             }
         )
 
+    async def _send_reporting_interval(self):
+        """Tells the client of this connection (the phone reporting) how often to report, when it changes"""
+        if self.reporting_interval_seconds == self.sent_reporting_interval_seconds:
+            return
+        self.sent_reporting_interval_seconds = self.reporting_interval_seconds
+        await self.send(text_data=json.dumps({
+            'event_type': 'reporting_interval',
+            'incident_id': self.incident_id,
+            'interval_seconds': self.reporting_interval_seconds
+        }))
+
+    @staticmethod
+    def _get_collected_at(message: dict):
+        return parse_datetime(message['data']['collected_at'])
+
+    async def _send_message(self, message: dict, coalescing_key=None, flush=False):
+        """
+        Sends the message right away, unless INCIDENT_WS_FLUSH_INTERVAL_MS is set: then messages are held and
+        sent together in a single 'batch' frame once per interval. A held message is replaced by a newer one
+        with the same coalescing key (the position of a resource), so only the newest one is sent.
+        """
+        if not settings.INCIDENT_WS_FLUSH_INTERVAL_MS:
+            await self.send(text_data=json.dumps(message))
+            return
+
+        if coalescing_key is None:
+            coalescing_key = object()
+        held_message = self.held_messages.pop(coalescing_key, None)
+        if held_message is not None and self._get_collected_at(held_message) > self._get_collected_at(message):
+            # Late fix, older than the one held
+            message = held_message
+        self.held_messages[coalescing_key] = message
+
+        if flush:
+            await self._flush_held_messages()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self._flush_after_interval())
+
+    async def _flush_after_interval(self):
+        await asyncio.sleep(settings.INCIDENT_WS_FLUSH_INTERVAL_MS / 1000)
+        self.flush_task = None
+        await self._flush_held_messages()
+
+    async def _flush_held_messages(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        messages = list(self.held_messages.values())
+        self.held_messages = {}
+        if messages:
+            await self.send(text_data=json.dumps({
+                'event_type': 'batch',
+                'incident_id': self.incident_id,
+                'messages': messages
+            }))
+
+    def _is_in_snapshot(self, event) -> bool:
+        # Recorded before the snapshot sent on connect was taken, so already part of it
+        return event.get('sequence') is not None and event['sequence'] <= self.snapshot_sequence
+
     async def map_point(self, event):
-        data = event['data']
-        # Validate data here
-        map_point_repr = await self._save_map_point(data)
+        if self._is_in_snapshot(event):
+            return
+        map_point_repr = event['data']
+        if not event.get('is_persisted'):
+            map_point_repr = await self._save_map_point(map_point_repr)
 
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self._send_message({
             'incident_type': AvailableIncidentTypes.MAP_POINT,
-            'data': map_point_repr
-        }))
+            'data': map_point_repr,
+            'sequence': event.get('sequence')
+        })
 
     async def track_point(self, event):
-        data = event['data']
-        # Validate data here
-        track_point_repr = await self._save_track_point(data)
+        if self._is_in_snapshot(event):
+            return
+        track_point_repr = event['data']
+        if not event.get('is_persisted'):
+            track_point_repr = await self._save_track_point(track_point_repr)
 
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self._send_message({
             'incident_type': AvailableIncidentTypes.TRACK_POINT,
-            'data': track_point_repr
-        }))
+            'data': track_point_repr,
+            'sequence': event.get('sequence')
+        }, coalescing_key=('position', track_point_repr['resource']['id']))
+
+    async def track_points(self, event):
+        if self._is_in_snapshot(event):
+            return
+        if settings.INCIDENT_WS_FLUSH_INTERVAL_MS:
+            # Held and coalesced as the positions received one by one
+            for track_point_repr in event['data']:
+                await self._send_message({
+                    'incident_type': AvailableIncidentTypes.TRACK_POINT,
+                    'data': track_point_repr,
+                    'sequence': event.get('sequence')
+                }, coalescing_key=('position', track_point_repr['resource']['id']))
+            return
 
-    async def incident_finalized(self, event):
         # Send message to WebSocket
         await self.send(text_data=json.dumps({
-            'event_type': 'incident_finalized',
-            'incident_id': self.incident_id
+            'event_type': 'track_points',
+            'incident_id': self.incident_id,
+            'data': event['data'],
+            'sequence': event.get('sequence')
         }))
 
-    async def incident_cancelled(self, event):
+    async def geofence_transition(self, event):
+        if self._is_in_snapshot(event):
+            return
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self._send_message({
+            'event_type': 'geofence_transition',
+            'incident_id': self.incident_id,
+            'data': event['data'],
+            'sequence': event.get('sequence')
+        })
+
+    async def incident_finalized(self, event):
+        if self._is_in_snapshot(event):
+            return
+        # Send message to WebSocket, along with the ones held
+        await self._send_message({
+            'event_type': 'incident_finalized',
+            'incident_id': self.incident_id,
+            'sequence': event.get('sequence')
+        }, flush=True)
+
+    async def incident_cancelled(self, event):
+        if self._is_in_snapshot(event):
+            return
+        # Send message to WebSocket, along with the ones held
+        await self._send_message({
             'event_type': 'incident_cancelled',
-            'incident_id': self.incident_id
-        }))
+            'incident_id': self.incident_id,
+            'sequence': event.get('sequence')
+        }, flush=True)
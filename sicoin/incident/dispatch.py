@@ -0,0 +1,46 @@
+from typing import Optional
+
+from django.db.models import Exists, OuterRef
+from django.db.models.expressions import RawSQL
+
+from sicoin.incident.models import Incident, IncidentResource
+from sicoin.users.models import ResourceProfile
+
+
+class NearestResourcesFinder:
+    """
+    Ranks the available resources of the incident domain (active users, with a known location and not
+    working on another started incident) by distance from the incident location. Ordering by the KNN
+    operator (<->) on ResourceProfile.last_known_location lets PostgreSQL walk its GiST index nearest first
+    and stop after the k rows callers slice, instead of computing and sorting the distance of the whole
+    fleet. The index ranks by planar distance in degrees, only the k resources returned get their distance
+    in meters.
+    """
+
+    def __init__(self, incident: Incident):
+        self.incident = incident
+
+    def _get_incident_location_sql(self):
+        return 'ST_SetSRID(ST_GeomFromText(%s), 4326)', (self.incident.location_point.wkt,)
+
+    def get_queryset(self, resource_type_name: Optional[str] = None):
+        location_sql, location_params = self._get_incident_location_sql()
+        last_known_location = f'"{ResourceProfile._meta.db_table}"."last_known_location"'
+        working_on_started_incident = IncidentResource.objects.filter(
+            resource=OuterRef('pk'),
+            incident__status=Incident.INCIDENT_STATUS_STARTED,
+            exited_from_incident_at__isnull=True,
+        ).exclude(incident=self.incident)
+
+        resources = ResourceProfile.objects.filter(
+            domain_id=self.incident.domain_config_id,
+            user__is_active=True,
+            last_known_location__isnull=False,
+        ).exclude(Exists(working_on_started_incident))
+        if resource_type_name is not None:
+            resources = resources.filter(type__name=resource_type_name)
+
+        return resources.select_related('user', 'domain', 'type').annotate(
+            distance_meters=RawSQL(f'ST_Distance({last_known_location}::geography, ({location_sql})::geography)',
+                                   location_params),
+        ).order_by(RawSQL(f'{last_known_location} <-> {location_sql}', location_params))
@@ -0,0 +1,166 @@
+import json
+from typing import List, NamedTuple, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+
+# Increments the sequence of the incident and applies the message to its state, atomically: any snapshot
+# taken after a sequence number was assigned already contains the message it was assigned to
+RECORD_SCRIPT = """
+local sequence = redis.call('INCR', KEYS[1])
+if ARGV[2] == 'positions' then
+    for index = 4, #ARGV, 3 do
+        local current_time = redis.call('HGET', KEYS[3], ARGV[index])
+        if not current_time or tonumber(current_time) <= tonumber(ARGV[index + 1]) then
+            redis.call('HSET', KEYS[2], ARGV[index], ARGV[index + 2])
+            redis.call('HSET', KEYS[3], ARGV[index], ARGV[index + 1])
+        end
+    end
+elseif ARGV[2] == 'map_point' then
+    redis.call('LPUSH', KEYS[4], ARGV[4])
+    redis.call('LTRIM', KEYS[4], 0, tonumber(ARGV[3]) - 1)
+elseif ARGV[2] == 'status' then
+    redis.call('SET', KEYS[5], ARGV[4])
+end
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[1])
+end
+return sequence
+"""
+
+# Fills the state of an incident from the database the first time it is read. Messages recorded meanwhile are
+# newer than the stored rows, so they are kept: positions are only set when newer, map points only if none
+# were recorded and the status only if not set
+SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[6]) == 1 then
+    return 0
+end
+redis.call('SET', KEYS[5], ARGV[2], 'NX')
+local index = 4
+for _ = 1, tonumber(ARGV[3]) do
+    local current_time = redis.call('HGET', KEYS[3], ARGV[index])
+    if not current_time or tonumber(current_time) < tonumber(ARGV[index + 1]) then
+        redis.call('HSET', KEYS[2], ARGV[index], ARGV[index + 2])
+        redis.call('HSET', KEYS[3], ARGV[index], ARGV[index + 1])
+    end
+    index = index + 3
+end
+if redis.call('LLEN', KEYS[4]) == 0 and index <= #ARGV then
+    redis.call('RPUSH', KEYS[4], unpack(ARGV, index))
+end
+redis.call('SET', KEYS[6], 1)
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[1])
+end
+return 1
+"""
+
+
+def _to_epoch_milliseconds(collected_at: str) -> int:
+    return int(parse_datetime(collected_at).timestamp() * 1000)
+
+
+def _dumps(representation: dict) -> str:
+    return json.dumps(representation, cls=DjangoJSONEncoder)
+
+
+def _get_positions_arguments(positions: List[dict]) -> list:
+    """Resource id, epoch milliseconds and representation of every position"""
+    arguments = []
+    for position in positions:
+        arguments += [position['resource']['id'], _to_epoch_milliseconds(position['collected_at']), _dumps(position)]
+    return arguments
+
+
+class IncidentSnapshot(NamedTuple):
+    sequence: int
+    status: Optional[str]
+    latest_positions: List[dict]
+    map_points: List[dict]
+
+    def to_dict(self) -> dict:
+        return {'status': self.status, 'latest_positions': self.latest_positions, 'map_points': self.map_points}
+
+
+class IncidentLiveState:
+    """
+    State of an incident kept in Redis for WebSocket subscribers: newest position of every resource, last
+    INCIDENT_LIVE_STATE_MAP_POINTS map points and status, along with a sequence number assigned to every
+    message broadcast to the incident group. Subscribers are sent a snapshot on connect and skip live
+    messages numbered up to its sequence, already part of it.
+    """
+
+    def __init__(self, incident_id):
+        self.incident_id = incident_id
+        self.redis = get_redis_connection('default')
+
+    def _get_keys(self) -> List[str]:
+        prefix = f'incident_live_state:{self.incident_id}'
+        return [f'{prefix}:sequence', f'{prefix}:positions', f'{prefix}:positions_time', f'{prefix}:map_points',
+                f'{prefix}:status', f'{prefix}:seeded']
+
+    def record(self, track_point: Optional[dict] = None, map_point: Optional[dict] = None,
+               status: Optional[str] = None, track_points: Optional[List[dict]] = None) -> int:
+        """
+        Applies the representation of the stored point (or points, received together), or a status change, if
+        any. Returns the sequence assigned.
+        """
+        kind, arguments = '', []
+        if track_point is not None or track_points:
+            kind, arguments = 'positions', _get_positions_arguments([track_point] if track_point else track_points)
+        elif map_point is not None:
+            kind, arguments = 'map_point', [_dumps(map_point)]
+        elif status is not None:
+            kind, arguments = 'status', [status]
+        return self.redis.eval(RECORD_SCRIPT, len(self._get_keys()), *self._get_keys(),
+                               settings.INCIDENT_LIVE_STATE_TIMEOUT, kind, settings.INCIDENT_LIVE_STATE_MAP_POINTS,
+                               *arguments)
+
+    def publish(self, message: dict, **state) -> int:
+        """Records the message (see record) and broadcasts it, numbered, to the incident group"""
+        sequence = self.record(**state)
+        async_to_sync(get_channel_layer().group_send)(str(self.incident_id), {**message, 'sequence': sequence})
+        return sequence
+
+    def _get_subscribers_key(self) -> str:
+        return f'incident_live_state:{self.incident_id}:subscribers'
+
+    def add_subscriber(self):
+        key = self._get_subscribers_key()
+        self.redis.incr(key)
+        self.redis.expire(key, settings.INCIDENT_LIVE_STATE_TIMEOUT)
+
+    def remove_subscriber(self):
+        if self.redis.decr(self._get_subscribers_key()) < 0:
+            # Subscribers of a process that died without disconnecting are never removed, the count is
+            # approximate and must not go below zero
+            self.redis.set(self._get_subscribers_key(), 0)
+
+    def get_subscribers_quantity(self) -> int:
+        return int(self.redis.get(self._get_subscribers_key()) or 0)
+
+    def is_seeded(self) -> bool:
+        return bool(self.redis.exists(self._get_keys()[5]))
+
+    def seed(self, status: str, latest_positions: List[dict], map_points: List[dict]):
+        """Map points newest first"""
+        self.redis.eval(SEED_SCRIPT, len(self._get_keys()), *self._get_keys(),
+                        settings.INCIDENT_LIVE_STATE_TIMEOUT, status, len(latest_positions),
+                        *_get_positions_arguments(latest_positions), *[_dumps(map_point) for map_point in map_points])
+
+    def get_snapshot(self) -> IncidentSnapshot:
+        sequence_key, positions_key, _, map_points_key, status_key, _ = self._get_keys()
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.get(sequence_key)
+        pipeline.get(status_key)
+        pipeline.hvals(positions_key)
+        pipeline.lrange(map_points_key, 0, -1)
+        sequence, status, positions, map_points = pipeline.execute()
+        return IncidentSnapshot(sequence=int(sequence or 0),
+                                status=status.decode() if status is not None else None,
+                                latest_positions=[json.loads(position) for position in positions],
+                                map_points=[json.loads(map_point) for map_point in map_points])
@@ -0,0 +1,23 @@
+import django.contrib.postgres.fields.jsonb
+import django.core.serializers.json
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incident', '0013_incident_status_type_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalincidentresource',
+            name='movement_stats',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AddField(
+            model_name='incidentresource',
+            name='movement_stats',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+    ]
@@ -90,6 +90,11 @@ class Incident(BaseModel):
                f"created: {self.created_at}, " \
                f"domain: {self.domain_config.domain_name}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'incident_type'], name='incident_status_type_idx'),
+        ]
+
 
 class IncidentResource(BaseModel):
     incident = models.ForeignKey("Incident", on_delete=models.PROTECT)
@@ -97,6 +102,8 @@ class IncidentResource(BaseModel):
     container_resource = models.ForeignKey(ResourceProfile, related_name="incident_resource_as_container",
                                            on_delete=models.PROTECT, blank=True, null=True)
     exited_from_incident_at = models.DateTimeField(null=True, blank=True)
+    # Distance (meters), speeds (meters per second), idle and on scene seconds, see geolocation.analytics
+    movement_stats = JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
 
     def __str__(self):
         return f"Incident Resource ({self.id})"
@@ -0,0 +1,72 @@
+import factory
+from django.contrib.gis.geos import Point
+
+from sicoin.users.test.factories import UserFactory
+
+
+class DomainConfigFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = 'domain_config.DomainConfig'
+        django_get_or_create = ('domain_name',)
+
+    domain_name = factory.Sequence(lambda n: f'Domain {n}')
+    domain_code = factory.Sequence(lambda n: f'AABBCC{n:04d}')
+    parsed_json = {}
+
+
+class ResourceTypeFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = 'domain_config.ResourceType'
+
+    name = factory.Sequence(lambda n: f'Resource type {n}')
+    domain_config = factory.SubFactory(DomainConfigFactory)
+
+
+class IncidentAbstractionFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = 'domain_config.IncidentAbstraction'
+
+    alias = factory.Sequence(lambda n: f'Abstraction {n}')
+    domain_config = factory.SubFactory(DomainConfigFactory)
+
+
+class IncidentTypeFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = 'domain_config.IncidentType'
+
+    name = factory.Sequence(lambda n: f'Incident type {n}')
+    abstraction = factory.SubFactory(IncidentAbstractionFactory)
+
+
+class IncidentFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = 'incident.Incident'
+
+    domain_config = factory.SubFactory(DomainConfigFactory)
+    incident_type = factory.SubFactory(IncidentTypeFactory,
+                                       abstraction__domain_config=factory.SelfAttribute('...domain_config'))
+    location_point = Point(-64.18, -31.42)
+
+
+class ResourceProfileFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = 'users.ResourceProfile'
+
+    user = factory.SubFactory(UserFactory)
+    domain = factory.SubFactory(DomainConfigFactory)
+    type = factory.SubFactory(ResourceTypeFactory, domain_config=factory.SelfAttribute('..domain'))
+
+
+class IncidentResourceFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = 'incident.IncidentResource'
+
+    incident = factory.SubFactory(IncidentFactory)
+    resource = factory.SubFactory(ResourceProfileFactory, domain=factory.SelfAttribute('..incident.domain_config'))
@@ -0,0 +1,211 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from nose.tools import eq_
+
+from sicoin.geolocation.models import MapPoint, TrackPoint
+from sicoin.incident.consumers import AvailableIncidentTypes, IncidentConsumer
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+def _get_position(resource_id, collected_at):
+    return {'location': {'type': 'Point', 'coordinates': [-31.42, -64.18]}, 'collected_at': collected_at,
+            'resource': {'id': resource_id}}
+
+
+def _get_track_point_event(resource_id, collected_at, sequence):
+    return {'type': AvailableIncidentTypes.TRACK_POINT, 'data': _get_position(resource_id, collected_at),
+            'is_persisted': True, 'sequence': sequence}
+
+
+class TestIncidentConsumerBatching(SimpleTestCase):
+    """
+    Broadcast events are handled as the channel layer delivers them, frames sent to the client are collected
+    """
+
+    def setUp(self):
+        self.consumer = IncidentConsumer({'type': 'websocket', 'url_route': {'kwargs': {'incident_id': '1'}}})
+        self.consumer.incident_id = '1'
+        self.consumer.held_messages = {}
+        self.consumer.flush_task = None
+        self.consumer.snapshot_sequence = 0
+        self.sent_frames = []
+
+        async def send(text_data=None, bytes_data=None, close=False):
+            self.sent_frames.append(json.loads(text_data))
+        self.consumer.send = send
+
+    def _handle_events(self, events, wait_seconds=0.0):
+        async def handle_events():
+            for event in events:
+                await getattr(self.consumer, event['type'])(event)
+            await asyncio.sleep(wait_seconds)
+        async_to_sync(handle_events)()
+
+    @override_settings(INCIDENT_WS_FLUSH_INTERVAL_MS=0)
+    def test_sent_right_away_without_flush_interval(self):
+        self._handle_events([_get_track_point_event(1, '2021-03-24T22:12:20+00:00', 1),
+                             _get_track_point_event(1, '2021-03-24T22:12:30+00:00', 2)])
+
+        eq_([frame['sequence'] for frame in self.sent_frames], [1, 2])
+
+    @override_settings(INCIDENT_WS_FLUSH_INTERVAL_MS=20)
+    def test_newest_position_of_every_resource_batched(self):
+        self._handle_events([_get_track_point_event(1, '2021-03-24T22:12:20+00:00', 1),
+                             _get_track_point_event(2, '2021-03-24T22:12:20+00:00', 2),
+                             _get_track_point_event(1, '2021-03-24T22:12:30+00:00', 3),
+                             # Late fix, older than the one held
+                             _get_track_point_event(1, '2021-03-24T22:12:25+00:00', 4)], wait_seconds=0.1)
+
+        eq_(len(self.sent_frames), 1)
+        eq_(self.sent_frames[0]['event_type'], 'batch')
+        eq_(sorted(message['sequence'] for message in self.sent_frames[0]['messages']), [2, 3])
+
+    @override_settings(INCIDENT_WS_FLUSH_INTERVAL_MS=20)
+    def test_track_points_coalesced_as_single_positions(self):
+        self._handle_events([{'type': 'track_points', 'sequence': 1, 'data': [
+            _get_position(1, '2021-03-24T22:12:20+00:00'), _get_position(1, '2021-03-24T22:12:30+00:00'),
+            _get_position(2, '2021-03-24T22:12:20+00:00')]}], wait_seconds=0.1)
+
+        eq_(sorted((message['data']['resource']['id'], message['data']['collected_at'])
+                   for message in self.sent_frames[0]['messages']),
+            [(1, '2021-03-24T22:12:30+00:00'), (2, '2021-03-24T22:12:20+00:00')])
+
+    @override_settings(INCIDENT_WS_FLUSH_INTERVAL_MS=60000)
+    def test_held_messages_flushed_with_incident_end(self):
+        self._handle_events([_get_track_point_event(1, '2021-03-24T22:12:20+00:00', 1),
+                             {'type': 'incident_finalized', 'sequence': 2}])
+
+        eq_(len(self.sent_frames), 1)
+        eq_([message.get('event_type') for message in self.sent_frames[0]['messages']], [None, 'incident_finalized'])
+        eq_(self.consumer.flush_task, None)
+
+    @override_settings(INCIDENT_WS_FLUSH_INTERVAL_MS=0)
+    def test_messages_in_snapshot_skipped(self):
+        self.consumer.snapshot_sequence = 1
+
+        self._handle_events([_get_track_point_event(1, '2021-03-24T22:12:20+00:00', 1),
+                             _get_track_point_event(1, '2021-03-24T22:12:30+00:00', 2)])
+
+        eq_([frame['sequence'] for frame in self.sent_frames], [2])
+
+
+@override_settings(INCIDENT_WS_RESOURCE_RATE=0)
+class TestIncidentConsumerSubscribers(SimpleTestCase):
+    """
+    Connections count as subscribers of the incident until they report track points
+    """
+
+    def setUp(self):
+        self.consumer = IncidentConsumer({'type': 'websocket', 'url_route': {'kwargs': {'incident_id': '1'}}})
+        self.consumer.incident_id = '1'
+        self.consumer.connection_bucket = None
+        self.consumer.is_throttled = False
+        self.consumer.is_subscriber = True
+        self.removed_subscribers_quantity = 0
+
+        async def remove_subscriber():
+            self.removed_subscribers_quantity += 1
+
+        async def handle_message(message_type, data):
+            pass
+
+        self.consumer._remove_subscriber = remove_subscriber
+        self.consumer._handle_message = handle_message
+
+    def _receive(self, message_types):
+        async def receive():
+            for message_type in message_types:
+                await self.consumer.receive(text_data=json.dumps({
+                    'type': message_type, 'data': {'resourceId': 1, 'timeCreated': '2021-03-24T22:12:20+00:00'}}))
+        async_to_sync(receive)()
+
+    def test_reporting_connection_not_counted(self):
+        self._receive([AvailableIncidentTypes.MAP_POINT, AvailableIncidentTypes.TRACK_POINT,
+                       AvailableIncidentTypes.TRACK_POINT])
+
+        eq_((self.consumer.is_subscriber, self.removed_subscribers_quantity), (False, 1))
+
+    def test_watching_connection_counted(self):
+        self._receive([AvailableIncidentTypes.MAP_POINT])
+
+        eq_((self.consumer.is_subscriber, self.removed_subscribers_quantity), (True, 0))
+
+
+class FakeChannelLayer:
+
+    def __init__(self):
+        self.sent_events = []
+
+    async def group_send(self, group, event):
+        self.sent_events.append(event)
+
+
+@override_settings(INCIDENT_WS_PERSIST_ON_RECEIVE=True)
+class TestIncidentConsumerPersistence(TransactionTestCase):
+    """
+    Points are stored by the consumer receiving them and broadcast stored, subscribers only forward them.
+    Consumers save from other threads, so every write commits on its own.
+    """
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident_id = str(self.incident_resource.incident_id)
+        self.channel_layer = FakeChannelLayer()
+        self.receiving_consumer = self._get_consumer()
+        self.subscriber_consumer = self._get_consumer()
+        self.sent_frames = []
+
+        async def send(text_data=None, bytes_data=None, close=False):
+            self.sent_frames.append(json.loads(text_data))
+        self.subscriber_consumer.send = send
+
+    def _get_consumer(self):
+        consumer = IncidentConsumer({'type': 'websocket', 'url_route': {'kwargs': {'incident_id': self.incident_id}}})
+        consumer.incident_id = self.incident_id
+        consumer.channel_layer = self.channel_layer
+        consumer.snapshot_sequence = 0
+        consumer.reporting_interval_seconds = consumer.sent_reporting_interval_seconds = None
+
+        async def record_live_state(**state):
+            return len(self.channel_layer.sent_events) + 1
+
+        async def send_reporting_interval():
+            pass
+
+        consumer._record_live_state = record_live_state
+        consumer._send_reporting_interval = send_reporting_interval
+        return consumer
+
+    def _get_data(self, time_created='2021-03-24T22:12:27.469Z'):
+        return {'lat': -31.42, 'lng': -64.18, 'message': 'Comment', 'incidentId': self.incident_id,
+                'resourceId': self.incident_resource.resource_id, 'timeCreated': time_created}
+
+    def _receive_and_broadcast(self, message_type, data):
+        async def receive_and_broadcast():
+            await self.receiving_consumer._handle_message(message_type, data)
+            for event in self.channel_layer.sent_events:
+                await getattr(self.subscriber_consumer, event['type'])(event)
+        async_to_sync(receive_and_broadcast)()
+
+    def test_map_point_stored_once(self):
+        self._receive_and_broadcast(AvailableIncidentTypes.MAP_POINT, self._get_data())
+
+        eq_(MapPoint.objects.filter(incident_resource=self.incident_resource).count(), 1)
+        eq_(self.channel_layer.sent_events[0]['is_persisted'], True)
+        eq_([frame['data']['comment'] for frame in self.sent_frames], ['Comment'])
+
+    def test_track_point_stored_once(self):
+        self._receive_and_broadcast(AvailableIncidentTypes.TRACK_POINT, self._get_data())
+
+        eq_(TrackPoint.objects.filter(incident_resource=self.incident_resource).count(), 1)
+        eq_([frame['data']['resource']['id'] for frame in self.sent_frames], [self.incident_resource.resource_id])
+
+    def test_retried_track_point_not_broadcast_again(self):
+        self._receive_and_broadcast(AvailableIncidentTypes.TRACK_POINT, self._get_data())
+        self._receive_and_broadcast(AvailableIncidentTypes.TRACK_POINT, self._get_data())
+
+        eq_(TrackPoint.objects.filter(incident_resource=self.incident_resource).count(), 1)
+        eq_(len(self.channel_layer.sent_events), 1)
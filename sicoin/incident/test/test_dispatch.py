@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.test import override_settings
+from django.utils import timezone
+from nose.tools import eq_, ok_
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sicoin.geolocation.authorization import invalidate_ingestion_authorization
+from sicoin.incident.dispatch import NearestResourcesFinder
+from sicoin.incident.test.factories import IncidentFactory, IncidentResourceFactory, ResourceProfileFactory
+
+
+class TestNearestResourcesFinder(APITestCase):
+
+    def setUp(self):
+        self.incident = IncidentFactory()
+        self.now = timezone.now().replace(microsecond=0)
+        # Cached checks are only invalidated once committed, never within a test case
+        invalidate_ingestion_authorization(incident_id=self.incident.id)
+        self.near_resource = ResourceProfileFactory(domain=self.incident.domain_config)
+        self.far_resource = ResourceProfileFactory(domain=self.incident.domain_config)
+        self._upload_track_point(self.near_resource, 0.01)
+        self._upload_track_point(self.far_resource, 0.02)
+
+    def _upload_track_point(self, resource, lng_offset, seconds=0):
+        """East of the incident location, uploaded as clients send coordinates, [lat, lng]"""
+        location = self.incident.location_point
+        response = self.client.post(f'/api/v1/incidents/{self.incident.id}/resources/{resource.id}/track-points/', {
+            'track_points': [{'location': {'type': 'Point', 'coordinates': [location.y, location.x + lng_offset]},
+                              'time_created': (self.now + timedelta(seconds=seconds)).isoformat()}]
+        }, format='json')
+        eq_(response.status_code, status.HTTP_200_OK)
+
+    def _create_resource(self, lng_offset, **kwargs):
+        """A resource of the incident domain east of the incident location, last known as Point(lng, lat)"""
+        kwargs.setdefault('domain', self.incident.domain_config)
+        location = self.incident.location_point
+        return ResourceProfileFactory(last_known_location=Point(location.x + lng_offset, location.y),
+                                      last_known_location_at=self.now, **kwargs)
+
+    def _get_nearest_ids(self, resource_type_name=None):
+        return [resource.id for resource in NearestResourcesFinder(self.incident).get_queryset(resource_type_name)]
+
+    def test_ranked_by_distance(self):
+        eq_(self._get_nearest_ids(), [self.near_resource.id, self.far_resource.id])
+
+    def test_unavailable_resources_excluded(self):
+        self._create_resource(0.001, user__is_active=False)
+        self._create_resource(0.001, domain=IncidentFactory().domain_config)
+        ResourceProfileFactory(domain=self.incident.domain_config)
+        busy_resource = self._create_resource(0.001)
+        IncidentResourceFactory(incident=IncidentFactory(domain_config=self.incident.domain_config),
+                                resource=busy_resource)
+
+        eq_(self._get_nearest_ids(), [self.near_resource.id, self.far_resource.id])
+
+    def test_by_resource_type(self):
+        eq_(self._get_nearest_ids(self.far_resource.type.name), [self.far_resource.id])
+
+    def test_listing(self):
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id}/nearest-resources/', {'k': 1})
+
+        eq_(response.status_code, status.HTTP_200_OK)
+        nearest_resources = response.json()
+        eq_([nearest_resource['resource']['id'] for nearest_resource in nearest_resources], [self.near_resource.id])
+        # 0.01 degrees of longitude at a latitude of -31.42
+        ok_(945 < nearest_resources[0]['distance_meters'] < 955)
+        lng, lat = nearest_resources[0]['last_known_location']['coordinates']
+        eq_((round(lng, 6), round(lat, 6)), (-64.17, -31.42))
+
+    @override_settings(DISPATCH_NEAREST_RESOURCES_MAX_K=10)
+    def test_invalid_k(self):
+        for k in ('0', '11', 'many'):
+            response = self.client.get(f'/api/v1/incidents/{self.incident.id}/nearest-resources/', {'k': k})
+
+            eq_(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_incident(self):
+        response = self.client.get(f'/api/v1/incidents/{self.incident.id + 1}/nearest-resources/')
+
+        eq_(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_last_known_location_moved_by_track_points(self):
+        self._upload_track_point(self.far_resource, 0, seconds=10)
+
+        eq_(self._get_nearest_ids(), [self.far_resource.id, self.near_resource.id])
+        self.far_resource.refresh_from_db()
+        eq_(self.far_resource.last_known_location_at, self.now + timedelta(seconds=10))
+
+    def test_last_known_location_not_rewound_by_late_track_points(self):
+        self._upload_track_point(self.far_resource, 0, seconds=-10)
+
+        eq_(self._get_nearest_ids(), [self.near_resource.id, self.far_resource.id])
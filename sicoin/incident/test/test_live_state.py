@@ -0,0 +1,120 @@
+from django.test import SimpleTestCase
+from nose.tools import eq_
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from sicoin.incident.live_state import IncidentLiveState
+from sicoin.incident.test.factories import IncidentResourceFactory
+
+
+def _get_position(resource_id, collected_at, lng=-64.18):
+    return {'location': {'type': 'Point', 'coordinates': [-31.42, lng]}, 'collected_at': collected_at,
+            'resource': {'id': resource_id}}
+
+
+def _clear_live_state(incident_id):
+    live_state = IncidentLiveState(incident_id)
+    live_state.redis.delete(*live_state._get_keys(), live_state._get_subscribers_key())
+
+
+class TestIncidentLiveState(SimpleTestCase):
+    INCIDENT_ID = 'test-live-state'
+
+    def setUp(self):
+        _clear_live_state(self.INCIDENT_ID)
+        self.live_state = IncidentLiveState(self.INCIDENT_ID)
+
+    def test_sequence_assigned_to_every_record(self):
+        eq_(self.live_state.record(), 1)
+        eq_(self.live_state.record(status='Started'), 2)
+        eq_(self.live_state.get_snapshot().sequence, 2)
+
+    def test_newest_position_kept(self):
+        self.live_state.record(track_point=_get_position(1, '2021-03-24T22:12:30+00:00', lng=-64.1))
+        self.live_state.record(track_points=[_get_position(1, '2021-03-24T22:12:20+00:00', lng=-64.2),
+                                             _get_position(2, '2021-03-24T22:12:20+00:00')])
+
+        latest_positions = sorted(self.live_state.get_snapshot().latest_positions,
+                                  key=lambda position: position['resource']['id'])
+        eq_([(position['resource']['id'], position['location']['coordinates'][1]) for position in latest_positions],
+            [(1, -64.1), (2, -64.18)])
+
+    def test_seed_keeps_newer_records(self):
+        self.live_state.record(track_point=_get_position(1, '2021-03-24T22:12:30+00:00', lng=-64.1))
+        self.live_state.record(map_point={'comment': 'Recorded'})
+        self.live_state.record(status='Finalized')
+
+        self.live_state.seed('Started', [_get_position(1, '2021-03-24T22:12:20+00:00', lng=-64.2),
+                                         _get_position(2, '2021-03-24T22:12:20+00:00')],
+                             [{'comment': 'Stored'}])
+
+        snapshot = self.live_state.get_snapshot()
+        eq_(snapshot.sequence, 3)
+        eq_(snapshot.status, 'Finalized')
+        eq_(snapshot.map_points, [{'comment': 'Recorded'}])
+        eq_(sorted((position['resource']['id'], position['location']['coordinates'][1])
+                   for position in snapshot.latest_positions), [(1, -64.1), (2, -64.18)])
+
+    def test_seeded_once(self):
+        self.live_state.seed('Started', [], [{'comment': 'First'}])
+        self.live_state.seed('Finalized', [], [{'comment': 'Second'}])
+
+        snapshot = self.live_state.get_snapshot()
+        eq_(self.live_state.is_seeded(), True)
+        eq_((snapshot.status, snapshot.map_points), ('Started', [{'comment': 'First'}]))
+
+    def test_map_points_newest_first_and_trimmed(self):
+        with self.settings(INCIDENT_LIVE_STATE_MAP_POINTS=2):
+            for index in range(3):
+                self.live_state.record(map_point={'comment': str(index)})
+
+        eq_(self.live_state.get_snapshot().map_points, [{'comment': '2'}, {'comment': '1'}])
+
+    def test_subscribers_not_below_zero(self):
+        self.live_state.add_subscriber()
+        self.live_state.remove_subscriber()
+        self.live_state.remove_subscriber()
+
+        eq_(self.live_state.get_subscribers_quantity(), 0)
+
+
+class TestHttpIngestionLiveState(APITransactionTestCase):
+    """
+    Points uploaded over HTTP are recorded once committed, every request commits on its own here.
+    """
+
+    def setUp(self):
+        self.incident_resource = IncidentResourceFactory()
+        self.incident_id = self.incident_resource.incident_id
+        self.url = f'/api/v1/incidents/{self.incident_id}/resources/{self.incident_resource.resource_id}/'
+        _clear_live_state(self.incident_id)
+
+    def _get_snapshot(self):
+        return IncidentLiveState(self.incident_id).get_snapshot()
+
+    def test_track_points_recorded(self):
+        response = self.client.post(f'{self.url}track-points/', {'track_points': [
+            {'location': {'type': 'Point', 'coordinates': [-30, -60]}, 'time_created': '2021-03-24T22:12:20Z'},
+            {'location': {'type': 'Point', 'coordinates': [-30, -61]}, 'time_created': '2021-03-24T22:12:30Z'},
+        ]}, format='json')
+        eq_(response.status_code, status.HTTP_200_OK)
+
+        latest_positions = self._get_snapshot().latest_positions
+        eq_([(position['resource']['id'], position['location']['coordinates']) for position in latest_positions],
+            [(self.incident_resource.resource_id, [-30, -61])])
+
+    def test_duplicated_track_point_recorded_once(self):
+        track_point = {'location': {'type': 'Point', 'coordinates': [-30, -60]}, 'time_created': '2021-03-24T22:12:20Z'}
+        for _ in range(2):
+            eq_(self.client.post(f'{self.url}track-point/', track_point, format='json').status_code,
+                status.HTTP_200_OK)
+
+        eq_(self._get_snapshot().sequence, 1)
+
+    def test_map_point_recorded(self):
+        response = self.client.post(f'{self.url}map-point/', {
+            'location': {'type': 'Point', 'coordinates': [-30, -60]}, 'comment': 'Comment',
+            'time_created': '2021-03-24T22:12:20Z'}, format='json')
+        eq_(response.status_code, status.HTTP_200_OK)
+
+        eq_([map_point['comment'] for map_point in self._get_snapshot().map_points], ['Comment'])
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+from nose.tools import eq_
+
+from sicoin.incident.consumers import AvailableIncidentTypes, IncidentConsumer
+from sicoin.incident.throttling import TokenBucket
+
+
+class TestTokenBucket(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('sicoin.incident.throttling.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_up_to_capacity(self):
+        token_bucket = TokenBucket(capacity=3, rate=1)
+
+        eq_([token_bucket.take() for _ in range(4)], [0, 0, 0, 1])
+
+    def test_refilled_at_rate(self):
+        token_bucket = TokenBucket(capacity=2, rate=4)
+        token_bucket.take()
+        token_bucket.take()
+
+        eq_(token_bucket.take(), 0.25)
+        self.now += 0.25
+        eq_(token_bucket.take(), 0)
+        eq_(token_bucket.take(), 0.25)
+
+    def test_refilled_up_to_capacity(self):
+        token_bucket = TokenBucket(capacity=2, rate=1)
+        token_bucket.take()
+        self.now += 100
+
+        eq_([token_bucket.take() for _ in range(3)], [0, 0, 1])
+
+
+@override_settings(INCIDENT_WS_RESOURCE_RATE=0)
+class TestIncidentConsumerThrottling(SimpleTestCase):
+    """
+    Messages are received one after another on a connection allowed a single message every 50 milliseconds,
+    handled messages and frames sent to the client are collected
+    """
+
+    def setUp(self):
+        self.consumer = IncidentConsumer({'type': 'websocket', 'url_route': {'kwargs': {'incident_id': '1'}}})
+        self.consumer.incident_id = '1'
+        self.consumer.connection_bucket = TokenBucket(capacity=1, rate=20)
+        self.consumer.is_throttled = False
+        self.consumer.throttled_track_point = None
+        self.consumer.throttled_track_point_task = None
+        self.consumer.dropped_messages_quantity = 0
+        self.consumer.coalesced_messages_quantity = 0
+        self.consumer.is_subscriber = False
+        self.handled_messages = []
+        self.sent_frames = []
+
+        async def handle_message(message_type, data):
+            self.handled_messages.append((message_type, data['timeCreated']))
+
+        async def send(text_data=None, bytes_data=None, close=False):
+            self.sent_frames.append(json.loads(text_data))
+
+        async def count_throttled_messages():
+            self.consumer.dropped_messages_quantity = self.consumer.coalesced_messages_quantity = 0
+
+        self.consumer._handle_message = handle_message
+        self.consumer.send = send
+        self.consumer._count_throttled_messages = count_throttled_messages
+
+    def _receive(self, messages, wait_seconds=0.0):
+        async def receive():
+            for message_type, time_created in messages:
+                await self.consumer.receive(text_data=json.dumps({
+                    'type': message_type, 'data': {'resourceId': 1, 'timeCreated': time_created}}))
+            await asyncio.sleep(wait_seconds)
+        async_to_sync(receive)()
+
+    def test_excess_track_points_coalesced(self):
+        self._receive([(AvailableIncidentTypes.TRACK_POINT, '1'), (AvailableIncidentTypes.TRACK_POINT, '2'),
+                       (AvailableIncidentTypes.TRACK_POINT, '3')], wait_seconds=0.2)
+
+        eq_(self.handled_messages, [(AvailableIncidentTypes.TRACK_POINT, '1'),
+                                    (AvailableIncidentTypes.TRACK_POINT, '3')])
+        eq_([frame['event_type'] for frame in self.sent_frames], ['throttled'])
+
+    def test_excess_map_points_dropped(self):
+        self._receive([(AvailableIncidentTypes.MAP_POINT, '1'), (AvailableIncidentTypes.MAP_POINT, '2')])
+
+        eq_(self.handled_messages, [(AvailableIncidentTypes.MAP_POINT, '1')])
+        eq_(self.consumer.dropped_messages_quantity, 1)
+
+    def test_throttling_ended_by_held_track_point(self):
+        self._receive([(AvailableIncidentTypes.TRACK_POINT, '1'), (AvailableIncidentTypes.TRACK_POINT, '2')],
+                      wait_seconds=0.2)
+        eq_(self.consumer.is_throttled, False)
+
+        self._receive([(AvailableIncidentTypes.TRACK_POINT, '3'), (AvailableIncidentTypes.TRACK_POINT, '4')],
+                      wait_seconds=0.2)
+
+        eq_([frame['event_type'] for frame in self.sent_frames], ['throttled', 'throttled'])
@@ -0,0 +1,80 @@
+import logging
+import time
+from typing import Dict
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+# Refills the bucket for the time elapsed since it was last used and takes a token if there is one.
+# Returns the milliseconds until the next token if there is none, 0 otherwise
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait_milliseconds = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_milliseconds = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return wait_milliseconds
+"""
+
+
+class TokenBucket:
+    """Allows bursts of up to capacity messages, refilled at rate tokens per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Takes a token if there is one. Returns the seconds until the next token if there is none, 0 otherwise"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class SharedTokenBucket:
+    """
+    Token bucket kept in Redis, shared by every connection and process. While Redis fails, a bucket of the
+    process is used instead, so limits keep working (per process) rather than letting everything through.
+    """
+
+    _fallback_buckets: Dict[str, TokenBucket] = {}
+
+    def __init__(self, key: str, capacity: float, rate: float):
+        self.key = key
+        self.capacity = capacity
+        self.rate = rate
+
+    def take(self) -> float:
+        """See TokenBucket.take"""
+        try:
+            wait_milliseconds = get_redis_connection('default').eval(TAKE_TOKEN_SCRIPT, 1, self.key, self.capacity,
+                                                                     self.rate, time.time())
+            return wait_milliseconds / 1000
+        except RedisError:
+            logging.exception(f'Error taking a token from {self.key}, using the bucket of the process')
+            if self.key not in self._fallback_buckets:
+                self._fallback_buckets[self.key] = TokenBucket(self.capacity, self.rate)
+            return self._fallback_buckets[self.key].take()
+
+
+def get_resource_bucket(resource_id) -> SharedTokenBucket:
+    """Bucket of the messages of a resource across every connection, see INCIDENT_WS_RESOURCE_RATE"""
+    return SharedTokenBucket(f'incident_ws_resource_bucket:{resource_id}', settings.INCIDENT_WS_RESOURCE_BURST,
+                             settings.INCIDENT_WS_RESOURCE_RATE)
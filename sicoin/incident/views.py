@@ -2,8 +2,10 @@ import json
 from datetime import datetime
 
 import django_filters
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django_filters import rest_framework as filters
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status, mixins, viewsets, generics
 from rest_framework.pagination import PageNumberPagination
@@ -11,15 +13,20 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from rest_framework_gis.fields import GeometryField
+from celery import chain
 
+from sicoin.geolocation.tasks import compact_incident_trajectories, drain_incident_track_points, \
+    store_incident_movement_stats, store_simplified_incident_tracks
 from sicoin.incident import models, serializers
+from sicoin.incident.dispatch import NearestResourcesFinder
+from sicoin.incident.live_state import IncidentLiveState
 from sicoin.incident.consumers import AvailableIncidentTypes
 from sicoin.incident.models import Incident, IncidentResource
 from sicoin.incident.serializers import IncidentResourceSerializer
 from sicoin.users.models import ResourceProfile
 from sicoin.users.notify_user_manager import IncidentCreationNotificationManager
+from sicoin.users.serializers import ListRetrieveResourceProfileSerializer
 
 
 class IncidentCreateListViewSet(mixins.CreateModelMixin,
@@ -116,6 +123,7 @@ class ChangeIncidentStatusAPIView(APIView):
             incident.status = self.get_incident_status_change_to()
             incident = self.make_changes_to_incident_according_to_status_change(incident)
             incident.save()
+            self.after_status_changed(incident)
             return HttpResponse(json.dumps({'message': 'Changed incident status successfully'}))
         else:
             return HttpResponse(json.dumps({'message': f'Incident with id {incident_id} '
@@ -132,6 +140,9 @@ class ChangeIncidentStatusAPIView(APIView):
     def make_changes_to_incident_according_to_status_change(self, incident: Incident) -> Incident:
         raise NotImplementedError()
 
+    def after_status_changed(self, incident: Incident):
+        pass
+
 
 class IncidentStatusFinalizeAPIView(ChangeIncidentStatusAPIView):
     def get_incident_status_change_to(self) -> str:
@@ -149,10 +160,17 @@ class IncidentStatusFinalizeAPIView(ChangeIncidentStatusAPIView):
         incident.incidentresource_set.all().update(exited_from_incident_at=datetime.now())
         incident_creation_notification_manager = IncidentCreationNotificationManager(incident)
         incident_creation_notification_manager.notify_incident_finalization()
-        async_to_sync(get_channel_layer().group_send)(str(incident.id),
-                                                      {"type": AvailableIncidentTypes.INCIDENT_FINALIZED})
+        IncidentLiveState(incident.id).publish({"type": AvailableIncidentTypes.INCIDENT_FINALIZED},
+                                               status=Incident.INCIDENT_STATUS_FINALIZED)
         return incident
 
+    def after_status_changed(self, incident: Incident):
+        # Tracks of a finalized incident no longer change: once the points still buffered are stored, movement
+        # stats and coarse levels are computed only once, then tracks are compacted (which may purge the raw
+        # points the previous tasks read)
+        chain(drain_incident_track_points.si(incident.id), store_incident_movement_stats.si(incident.id),
+              store_simplified_incident_tracks.si(incident.id), compact_incident_trajectories.si(incident.id)).delay()
+
 
 class IncidentStatusCancelAPIView(ChangeIncidentStatusAPIView):
     def get_incident_status_change_to(self) -> str:
@@ -170,8 +188,8 @@ class IncidentStatusCancelAPIView(ChangeIncidentStatusAPIView):
         incident.incidentresource_set.all().update(exited_from_incident_at=datetime.now())
         incident_creation_notification_manager = IncidentCreationNotificationManager(incident)
         incident_creation_notification_manager.notify_incident_cancellation()
-        async_to_sync(get_channel_layer().group_send)(str(incident.id),
-                                                      {"type": AvailableIncidentTypes.INCIDENT_CANCELLED})
+        IncidentLiveState(incident.id).publish({"type": AvailableIncidentTypes.INCIDENT_CANCELLED},
+                                               status=Incident.INCIDENT_STATUS_CANCELED)
         return incident
 
 
@@ -298,9 +316,16 @@ class LargeResultsSetPagination(PageNumberPagination):
     max_page_size = 10000
 
 
+# Relations walked by IncidentResourceSerializer, fetched along with the incident resources
+INCIDENT_RESOURCE_RELATED_FIELDS = ('incident__domain_config', 'incident__incident_type',
+                                    'resource__user', 'resource__domain', 'resource__type',
+                                    'container_resource__user', 'container_resource__domain',
+                                    'container_resource__type')
+
+
 class IncidentResourceViewSet(GenericViewSet):
     permission_classes = (AllowAny,)
-    queryset = IncidentResource.objects.all()
+    queryset = IncidentResource.objects.select_related(*INCIDENT_RESOURCE_RELATED_FIELDS)
     serializer_class = IncidentResourceSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = IncidentResourceFilter
@@ -333,4 +358,52 @@ class IncidentResourceFromResourceListView(generics.ListAPIView):
     filterset_class = IncidentResourceFilter
 
     def get_queryset(self):
-        return IncidentResource.objects.filter(resource_id=self.kwargs['resource_id'])
+        return IncidentResource.objects.filter(resource_id=self.kwargs['resource_id']).select_related(
+            *INCIDENT_RESOURCE_RELATED_FIELDS)
+
+
+class NearestResourcesToIncidentAPIView(APIView):
+    permission_classes = (AllowAny,)
+
+    @swagger_auto_schema(operation_description="List the k available resources nearest to the incident location, "
+                                               "by their last known location",
+                         manual_parameters=[
+                             openapi.Parameter('k', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                                               description="Quantity of resources to list"),
+                             openapi.Parameter('resource_type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                                               description="Only list resources of this type name"),
+                         ],
+                         responses={200: "[\n"
+                                         "{\n"
+                                         "  'resource': ResourceProfile,\n"
+                                         "  'distance_meters': distance,\n"
+                                         "  'last_known_location': GeometryField,\n"
+                                         "  'last_known_location_at': date,\n"
+                                         "}, ...\n"
+                                         "]",
+                                    400: "{'message': 'k must be an integer between 1 and {MAX}'}",
+                                    404: "{'message': 'Incident with id {ID} does not exists'}"})
+    def get(self, request, incident_id):
+        try:
+            incident = Incident.objects.get(id=incident_id)
+        except Incident.DoesNotExist:
+            return HttpResponse(json.dumps({'message': f'Incident with id {incident_id} does not exists'}),
+                                status=status.HTTP_404_NOT_FOUND)
+
+        k = request.query_params.get('k', settings.DISPATCH_NEAREST_RESOURCES_DEFAULT_K)
+        try:
+            k = int(k)
+        except ValueError:
+            k = 0
+        if not 1 <= k <= settings.DISPATCH_NEAREST_RESOURCES_MAX_K:
+            return HttpResponse(json.dumps({'message': f'k must be an integer between 1 and '
+                                                       f'{settings.DISPATCH_NEAREST_RESOURCES_MAX_K}'}),
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        resources = NearestResourcesFinder(incident).get_queryset(request.query_params.get('resource_type'))[:k]
+        return JsonResponse([{
+            'resource': ListRetrieveResourceProfileSerializer().to_representation(resource),
+            'distance_meters': resource.distance_meters,
+            'last_known_location': GeometryField().to_representation(resource.last_known_location),
+            'last_known_location_at': resource.last_known_location_at.isoformat(),
+        } for resource in resources], safe=False)
@@ -0,0 +1,24 @@
+from typing import Dict
+
+from django.core.cache import cache
+
+
+def _get_counter_key(name: str) -> str:
+    return f'metrics:{name}'
+
+
+def increment_counter(name: str, amount: int = 1):
+    """Counters live in the cache shared by every process, without expiration"""
+    if not amount:
+        return
+    key = _get_counter_key(name)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+
+
+def get_counters(*names: str) -> Dict[str, int]:
+    values = cache.get_many([_get_counter_key(name) for name in names])
+    return {name: values.get(_get_counter_key(name), 0) for name in names}
@@ -6,11 +6,12 @@ from django.views.generic.base import RedirectView
 from rest_framework.routers import DefaultRouter
 
 from .geolocation.views import GetMapPointsFromIncident, CreateMapPoint, CreateTrackPoint, GetTrackPointsFromIncident, \
-    CreateTrackPoints
+    CreateTrackPoints, GetLatestPositionsFromIncident, GetIncidentTile, GetTrackPointsHeatmapFromIncident
 from .incident.views import AddIncidentResourceToIncidentAPIView, IncidentCreateListViewSet, \
     ValidateIncidentDetailsAPIView, IncidentAssistanceWithExternalSupportAPIView, \
     IncidentAssistanceWithoutExternalSupportAPIView, IncidentStatusFinalizeAPIView, \
-    IncidentStatusCancelAPIView, IncidentResourceViewSet, IncidentResourceFromResourceListView
+    IncidentStatusCancelAPIView, IncidentResourceViewSet, IncidentResourceFromResourceListView, \
+    NearestResourcesToIncidentAPIView
 from .users import views
 from .domain_config.views import DomainConfigAPIView, GenerateNewDomainCodeAPIView, \
     GetCurrentDomainCodeAPIView, CheckCurrentDomainCodeAPIView, StatisticsByIncidentType
@@ -69,6 +70,7 @@ urlpatterns = [
     path('api/v1/incidents/<int:incident_id>/without-external-support/',
          IncidentAssistanceWithoutExternalSupportAPIView.as_view()),
     path('api/v1/incidents/<int:incident_id>/details/', ValidateIncidentDetailsAPIView.as_view()),
+    path('api/v1/incidents/<int:incident_id>/nearest-resources/', NearestResourcesToIncidentAPIView.as_view()),
     path('api/v1/incidents/<int:incident_id>/resources/<int:resource_id>/',
          AddIncidentResourceToIncidentAPIView.as_view()),
     path('api/v1/incidents/<int:incident_id>/resources/<int:resource_id>/map-point/',
@@ -77,6 +79,9 @@ urlpatterns = [
     path('api/v1/incidents/<int:incident_id>/resources/<int:resource_id>/track-point/', CreateTrackPoint.as_view()),
     path('api/v1/incidents/<int:incident_id>/resources/<int:resource_id>/track-points/', CreateTrackPoints.as_view()),
     path('api/v1/incidents/<int:incident_id>/track-points/', GetTrackPointsFromIncident.as_view()),
+    path('api/v1/incidents/<int:incident_id>/track-points/heatmap/', GetTrackPointsHeatmapFromIncident.as_view()),
+    path('api/v1/incidents/<int:incident_id>/positions/latest/', GetLatestPositionsFromIncident.as_view()),
+    path('api/v1/incidents/<int:incident_id>/tiles/<int:z>/<int:x>/<int:y>.mvt', GetIncidentTile.as_view()),
 
     path('api/v1/incident-types/<str:incident_type_name>/statistics/', StatisticsByIncidentType.as_view()),  # REVISAR
 
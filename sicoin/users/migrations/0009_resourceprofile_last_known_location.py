@@ -0,0 +1,40 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_resourceprofile_stats_by_incident'),
+        ('geolocation', '0010_resourcelastposition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourceprofile',
+            name='last_known_location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='resourceprofile',
+            name='last_known_location_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE users_resourceprofile resource
+                SET last_known_location = ST_FlipCoordinates(last_position.location),
+                    last_known_location_at = last_position.time_created
+                FROM (
+                    SELECT DISTINCT ON (incident_resource.resource_id) incident_resource.resource_id,
+                           resource_last_position.location, resource_last_position.time_created
+                    FROM geolocation_resourcelastposition resource_last_position
+                    JOIN incident_incidentresource incident_resource
+                        ON incident_resource.id = resource_last_position.incident_resource_id
+                    ORDER BY incident_resource.resource_id, resource_last_position.time_created DESC
+                ) last_position
+                WHERE resource.id = last_position.resource_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 
+from django.contrib.gis.db.models import PointField
 from django.contrib.postgres.fields import JSONField
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
@@ -53,6 +54,11 @@ class ResourceProfile(models.Model):
     domain = models.ForeignKey(DomainConfig, on_delete=models.PROTECT)
     device = models.OneToOneField(FCMDevice, on_delete=models.PROTECT, null=True, blank=True)
     stats_by_incident = JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    # Newest track point of the resource in any incident, kept up to date on track point insertion. Stored as
+    # Point(lng, lat) like Incident.location_point, unlike track points. Spatially indexed (GiST), see
+    # incident.dispatch
+    last_known_location = PointField(null=True, blank=True)
+    last_known_location_at = models.DateTimeField(null=True, blank=True)
 
     @property
     def role(self):
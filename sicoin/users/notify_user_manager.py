@@ -1,5 +1,8 @@
 import logging
 
+from django.conf import settings
+
+from sicoin.incident.dispatch import NearestResourcesFinder
 from sicoin.incident.models import Incident
 from sicoin.users.models import User
 
@@ -8,9 +11,20 @@ class IncidentCreationNotificationManager:
     def __init__(self, incident: Incident):
         self.incident = incident
 
-    def notify_incident_creation(self):
+    def _get_resources_to_notify_of_creation(self):
         active_resources = self.incident.domain_config.resourceprofile_set.filter(user__is_active=True,
                                                                                   device__isnull=False)
+        nearest_resources_quantity = settings.INCIDENT_CREATION_NOTIFY_NEAREST_RESOURCES
+        if nearest_resources_quantity > 0:
+            nearest_resources = NearestResourcesFinder(self.incident).get_queryset() \
+                .filter(device__isnull=False).select_related('device')[:nearest_resources_quantity]
+            # Without any known location yet (e.g. a new domain), nobody would be notified
+            if nearest_resources:
+                return nearest_resources
+        return active_resources
+
+    def notify_incident_creation(self):
+        active_resources = self._get_resources_to_notify_of_creation()
         for resource in active_resources:
             title = 'Incidente creado!'
             body = 'Revisa la lista de incidentes para más información'